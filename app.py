@@ -1,37 +1,109 @@
+import time
+process_start = time.perf_counter()  # The startup report measures every phase from here
+
 from model.hand_detector import HandDetector
+from model.gesture_classifier import GestureClassifier
+from model.inference_pool import create_hand_detector
+from model.inference_scheduler import InferenceScheduler
+from model.session_recorder import SessionRecorder
 from model.window_manager import WindowManager
+from model.actuation_backend import MacOSBackend
+from controller.calibration import load_profile
 from controller.gesture_controller import GestureController
+from controller.multi_stream import MultiStreamRunner
+from controller.pipeline import ActuationQueue, GesturePipeline
+from controller.startup import StartupLoader
 from view.main_view import MainView
+from utils.instrumentation import configure_logging, get_logger, instrumentation, StartupTimer, StatsFlusher
+import argparse
+import functools
 import cv2
 
-# Initialize instances
-hand_detector = HandDetector()  # Hand detector instance from model/hand_detector.py
-window_manager = WindowManager()  # Window manager instance from model/window_manager.py
-gesture_controller = GestureController(hand_detector, window_manager)  # Gesture controller instance from controller/gesture_controller.py
-main_view = MainView(hand_detector, window_manager, gesture_controller)  # Main view instance from view/main_view.py
-
-# Initializes the webcam
-webcam = cv2.VideoCapture(0)
-
-try:
-    while True:
-        ret, frame = webcam.read()  # Capture a frame from the webcam (ret: return boolean value, frame: actual frame captured from webcam)
-        if not ret:  # If capturing the frame fails
-            print("Failed to capture image. Exiting...")  # Debug: log failure
-            break
-        
-        frame = cv2.flip(frame, 1)  # Flip the image horizontally for a mirror effect
-        print("Processing new frame...")  # Debug: log frame processing
-        
-        gesture_controller.process_gestures(frame)  # Process gestures using the controller
-        main_view.display_frame(frame)  # Display the frame with hand gesture information
-
-        key = cv2.waitKey(10)  # Wait for a key press for 10 milliseconds
-        if key == 27:  # Check if the pressed key is the 'Escape' key (27)
-            print("'Escape' key pressed. Exiting...")  # Debug: log when 'Escape' key is pressed
-            break  # Exit the loop if 'Escape' key is pressed
-
-finally:
-    webcam.release()  # Release the webcam resources
-    cv2.destroyAllWindows()  # Close all OpenCV windows
-    print("Webcam and OpenCV windows closed.")  # Debug: log resource cleanup
+def parse_args():
+    '''Parses the command line options'''
+    parser = argparse.ArgumentParser(description="Control windows with hand gestures")
+    parser.add_argument("--record", metavar="SESSION_DIR", help="Record the detected landmarks of every frame to a session directory")
+    parser.add_argument("--record-frames", action="store_true", help="Also store JPEG-compressed frames in the recorded session")
+    parser.add_argument("--log-level", default="WARNING", help="Minimum level of the log messages: DEBUG, INFO, WARNING or ERROR")
+    parser.add_argument("--stats-json", metavar="PATH", help="Periodically write per-stage timings and counters as a JSON snapshot")
+    parser.add_argument("--stats-prometheus", metavar="PATH", help="Periodically write per-stage timings and counters in Prometheus text format")
+    parser.add_argument("--stats-interval", type=float, default=5.0, help="Time in seconds between two statistics snapshots")
+    parser.add_argument("--hands", type=int, default=1, help="Maximum number of hands tracked, each with its own gestures; 1 tracks a single hand on a cropped region")
+    parser.add_argument("--headless", action="store_true", help="Run without a preview window, e.g. as a background service; stop with SIGINT or SIGTERM")
+    parser.add_argument("--preview-every", type=int, default=0, metavar="N", help="With --headless, still preview one processed frame out of N")
+    parser.add_argument("--profile", help="Calibration profile written by tools.calibrate, with per-user gesture thresholds")
+    parser.add_argument("--classifier", help="Gesture classifier trained by tools.train_classifier, used instead of the threshold rules")
+    parser.add_argument("--sources", nargs="+", metavar="SOURCE", help="Run one headless stream per camera index, video file or session directory recorded with frames, with hand detection on a pool of worker processes")
+    parser.add_argument("--workers", type=int, help="With --sources, number of hand detection worker processes; defaults to one per stream up to the number of cores")
+    parser.add_argument("--startup-report", action="store_true", help="Print the time taken by each startup phase")
+    return parser.parse_args()
+
+def run_multi_stream(args, profile, classifier):
+    '''Runs one headless stream per source; every stream gets its own controller and actuation queue, and their frames are detected on worker processes'''
+    detector_factory = functools.partial(create_hand_detector, max_num_hands=max(args.hands, 2), roi_tracking=args.hands == 1)  # Multi-hand detection never uses the crop model
+    runner = MultiStreamRunner(args.sources, MacOSBackend, workers=args.workers, detector_factory=detector_factory, multi_hand=args.hands > 1, profile=profile, classifier=classifier)
+    runner.run()
+
+def run_single_stream(args, profile, classifier, startup_timer):
+    '''Runs the webcam stream, with a preview window unless headless'''
+    logger = get_logger("app")
+
+    def load_hand_detector():
+        '''Loads mediapipe and runs the hand models once, so the first frame is processed at full speed'''
+        hand_detector = HandDetector(max_num_hands=max(args.hands, 2), roi_tracking=args.hands == 1)  # Single-hand mode keeps mediapipe's default of 2; only it uses the crop model
+        hand_detector.warm_up()
+        return hand_detector
+
+    # Open the webcam, load the hand model and the macOS backend in parallel while the preview window already shows the camera
+    main_view = None if args.headless and not args.preview_every else MainView()  # Main view instance from view/main_view.py, none when headless
+    preview_every = args.preview_every if args.headless and args.preview_every else 1  # Only a headless run thins out the preview
+    loaded = StartupLoader(main_view, startup_timer).run(lambda: cv2.VideoCapture(0), {'model': load_hand_detector, 'actuation': MacOSBackend})
+    if not loaded:
+        return
+    webcam, components = loaded
+
+    # Initialize instances
+    hand_detector = InferenceScheduler(components['model'])  # Hand detector instance from model/hand_detector.py, run at a lower rate while the scene is idle
+    actuation_queue = ActuationQueue(components['actuation'])  # macOS window commands from model/actuation_backend.py, executed by the actuation worker
+    window_manager = WindowManager(backend=actuation_queue, geometry_refresh_interval=0.1)  # Window manager instance from model/window_manager.py, window geometry refreshed off the hot path
+    gesture_controller = GestureController(hand_detector, window_manager, profile=profile, classifier=classifier)  # Gesture controller instance from controller/gesture_controller.py
+    if main_view:
+        main_view.hand_detector, main_view.window_manager, main_view.gesture_controller = hand_detector, window_manager, gesture_controller
+    recorder = SessionRecorder(args.record, save_frames=args.record_frames) if args.record else None  # Session recorder instance from model/session_recorder.py
+    startup_timer.mark('ready')
+
+    if args.startup_report:
+        print(startup_timer.report())
+
+    # Run capture, inference and actuation on separate threads until 'Escape' is pressed or a SIGINT/SIGTERM arrives; the pipeline releases the webcam and windows on exit
+    pipeline = GesturePipeline(webcam, hand_detector, gesture_controller, actuation_queue, main_view, recorder, multi_hand=args.hands > 1, preview_every=preview_every)
+    pipeline.run()
+    logger.info("Detection skip ratio: %.2f", hand_detector.skip_ratio)  # Log how many frames skipped inference
+
+def main():
+    startup_timer = StartupTimer(process_start)
+    startup_timer.record('imports', process_start, time.perf_counter())
+    args = parse_args()
+    configure_logging(args.log_level)
+
+    # Per-user thresholds, used by the gesture controllers instead of the defaults
+    profile = load_profile(args.profile) if args.profile else None
+    classifier = GestureClassifier.load(args.classifier) if args.classifier else None
+
+    # Instrumentation is only enabled when statistics are exported, otherwise timers and counters are no-ops
+    stats_flusher = None
+    if args.stats_json or args.stats_prometheus:
+        stats_flusher = StatsFlusher(instrumentation, args.stats_json, args.stats_prometheus, args.stats_interval)
+        stats_flusher.start()
+
+    if args.sources:
+        run_multi_stream(args, profile, classifier)
+    else:
+        run_single_stream(args, profile, classifier, startup_timer)
+
+    if stats_flusher:
+        stats_flusher.stop()  # Writes a last snapshot
+
+# Inference workers are spawned processes that import this module, so nothing may run on import
+if __name__ == "__main__":
+    main()
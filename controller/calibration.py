@@ -0,0 +1,182 @@
+# Fits per-user gesture thresholds from labeled landmark samples and stores them as a profile.
+# Distances are measured in palm units (wrist to middle finger MCP), so a profile holds across hand
+# sizes and camera distances. Every fit runs on the whole sample set at once with NumPy
+# A profile is a JSON file:
+#   version           format version
+#   palm_size         median palm size of the samples, in image units
+#   rules             gesture name -> {'distances': [[landmark_a, landmark_b, operator, threshold], ...], 'exit_margin': ...}
+#   angle_thresholds  [min_degrees, max_degrees] of the middle finger and thumb angles of the hand position check
+#   samples           number of samples of each label
+# Components: fit_distance_threshold, fit_profile, save_profile, load_profile, profile_rules, profile_angle_thresholds
+
+import json
+import numpy as np
+from controller.gesture_rules import DEFAULT_GESTURE_RULES
+from utils.gesture_checks import ANGLE_THRESHOLDS, ANGLE_TRIPLETS, as_points, calculate_angle, palm_size
+
+PROFILE_FORMAT_VERSION = 1
+OPEN_HAND_LABEL = ''  # Label of the samples where the hand is open, performing no gesture
+MIN_SAMPLES = 10  # Fewer samples of a class keep the default threshold
+EDGE_QUANTILE = 0.05  # Share of each class allowed beyond its edge, so outliers do not move the threshold
+# Position of a threshold between the edge of the close class (0) and the edge of the apart class (1):
+# pinches fire a third of the way, so they need a clear pinch, while releases fire half way, leaving a
+# gap between them so a pickup and a drop cannot alternate on the same hand pose
+THRESHOLD_POSITIONS = {'<': 1 / 3, '>': 1 / 2}
+ANGLE_MARGIN = 10.0  # Degrees of slack below the smallest open hand angle
+
+def fit_distance_threshold(close, apart, position):
+    '''
+    Places a threshold between the distances of samples where two landmarks are close and where they are apart
+
+    Params:
+        close (numpy.ndarray): Distances of the samples where the landmarks should be close
+        apart (numpy.ndarray): Distances of the samples where the landmarks should be apart
+        position (float): Where to place the threshold between the two class edges, from 0 (close) to 1 (apart)
+
+    Returns:
+        float: The threshold
+    '''
+    close_edge = np.quantile(close, 1 - EDGE_QUANTILE)
+    apart_edge = np.quantile(apart, EDGE_QUANTILE)
+    if close_edge < apart_edge:
+        return float(close_edge + position * (apart_edge - close_edge))
+
+    # The classes overlap: pick the candidate with the lowest balanced error rate
+    candidates = np.sort(np.concatenate([close, apart]))
+    close_errors = 1 - np.searchsorted(np.sort(close), candidates, side='left') / len(close)  # Share of close samples at or past the candidate
+    apart_errors = np.searchsorted(np.sort(apart), candidates, side='left') / len(apart)  # Share of apart samples below the candidate
+    return float(candidates[np.argmin(close_errors + apart_errors)])
+
+def fit_profile(landmarks, labels, rules=None):
+    '''
+    Fits the distance thresholds of the gesture rules and the angle ranges of the hand position check
+
+    A '<' constraint of a rule separates the samples of that gesture from every other sample. A '>'
+    constraint separates the samples of that gesture and the open hand from the samples of the gestures
+    that bring the same landmarks close, e.g. a drop from a pickup
+
+    Params:
+        landmarks (numpy.ndarray): Samples of shape (N, 21, 3)
+        labels (array-like): Gesture name of each sample, OPEN_HAND_LABEL for an open hand
+        rules (list): Gesture rules to calibrate, defaults to DEFAULT_GESTURE_RULES
+
+    Returns:
+        dict: The profile
+    '''
+    rules = DEFAULT_GESTURE_RULES if rules is None else rules
+    points = as_points(landmarks)
+    labels = np.asarray(labels, dtype=object)
+    sizes = palm_size(points)
+    usable = np.isfinite(sizes) & (sizes > 0)  # Frames without a hand are NaN
+    points, labels, sizes = points[usable], labels[usable], sizes[usable]
+    if not len(points):
+        raise ValueError("No usable calibration samples")
+    median_palm_size = float(np.median(sizes))
+
+    # Every distance used by a rule, for every sample at once, in palm units
+    pairs = sorted({(landmark_a, landmark_b) for rule in rules for landmark_a, landmark_b, _, _ in rule.distances})
+    pair_table = np.array(pairs, dtype=np.intp).reshape(-1, 2)
+    distances = np.linalg.norm(points[:, pair_table[:, 0], :2] - points[:, pair_table[:, 1], :2], axis=-1) / sizes[:, None]
+    columns = {pair: column for column, pair in enumerate(pairs)}
+    closing_labels = {}  # (landmark_a, landmark_b) -> gestures that bring the pair close
+    for rule in rules:
+        for landmark_a, landmark_b, operator, _ in rule.distances:
+            if operator == '<':
+                closing_labels.setdefault((landmark_a, landmark_b), set()).add(rule.name)
+
+    profile_rules = {}
+    for rule in rules:
+        fitted = []
+        for landmark_a, landmark_b, operator, threshold in rule.distances:
+            values = distances[:, columns[(landmark_a, landmark_b)]]
+            if operator == '<':
+                close_mask = labels == rule.name
+                apart_mask = ~close_mask
+            else:
+                close_mask = np.isin(labels, list(closing_labels.get((landmark_a, landmark_b), ())))
+                apart_mask = (labels == rule.name) | (labels == OPEN_HAND_LABEL)
+            if close_mask.sum() >= MIN_SAMPLES and apart_mask.sum() >= MIN_SAMPLES:
+                threshold = fit_distance_threshold(values[close_mask], values[apart_mask], THRESHOLD_POSITIONS[operator])
+            else:
+                threshold = threshold / median_palm_size  # Not enough samples: the default threshold, in palm units
+            fitted.append([landmark_a, landmark_b, operator, round(threshold, 4)])
+        profile_rules[rule.name] = {'distances': fitted, 'exit_margin': round(rule.exit_margin / median_palm_size, 4)}
+
+    # The hand position check must accept every open hand sample, with some slack
+    angle_thresholds = np.array(ANGLE_THRESHOLDS, dtype=np.float64)
+    open_hand = points[labels == OPEN_HAND_LABEL]
+    if len(open_hand) >= MIN_SAMPLES:
+        angles = calculate_angle(
+            open_hand[:, ANGLE_TRIPLETS[:, 0], :],
+            open_hand[:, ANGLE_TRIPLETS[:, 1], :],
+            open_hand[:, ANGLE_TRIPLETS[:, 2], :]
+        )  # (N, 2)
+        angle_thresholds[:, 0] = np.clip(np.nanquantile(angles, 0.01, axis=0) - ANGLE_MARGIN, 0.0, 180.0)
+
+    label_names, counts = np.unique(labels.astype(str), return_counts=True)
+    return {
+        'version': PROFILE_FORMAT_VERSION,
+        'palm_size': round(median_palm_size, 4),
+        'rules': profile_rules,
+        'angle_thresholds': np.round(angle_thresholds, 1).tolist(),
+        'samples': {str(label): int(count) for label, count in zip(label_names, counts)},
+    }
+
+def save_profile(profile, path):
+    '''Writes a profile as JSON'''
+    with open(path, 'w') as file:
+        json.dump(profile, file, indent=2)
+
+def load_profile(path):
+    '''
+    Reads a profile
+
+    Params:
+        path (str): Path of the profile JSON file
+
+    Returns:
+        dict: The profile
+    '''
+    with open(path) as file:
+        profile = json.load(file)
+    if profile.get('version') != PROFILE_FORMAT_VERSION:
+        raise ValueError(f"Unsupported profile format version: {profile.get('version')}")
+    return profile
+
+def profile_rules(profile, rules=None):
+    '''
+    Builds the gesture rules of a profile: copies of the rules with the profile thresholds, in palm units
+
+    Params:
+        profile (dict): The profile
+        rules (list): Gesture rules the profile was fitted for, defaults to DEFAULT_GESTURE_RULES
+
+    Returns:
+        list: GestureRule objects to evaluate with palm normalized distances
+    '''
+    rules = DEFAULT_GESTURE_RULES if rules is None else rules
+    calibrated = []
+    for rule in rules:
+        fitted = profile['rules'].get(rule.name)
+        if fitted is None:
+            raise ValueError(f"Profile has no thresholds for gesture rule '{rule.name}'")
+        calibrated.append(rule.copy(distances=[tuple(constraint) for constraint in fitted['distances']], exit_margin=fitted['exit_margin']))
+    return calibrated
+
+def profile_angle_thresholds(profile):
+    '''
+    Reads the hand position angle ranges of a profile, passed by the controller to the hand position checks
+
+    Params:
+        profile (dict): The profile
+
+    Returns:
+        numpy.ndarray: [min_degrees, max_degrees] of each ANGLE_TRIPLETS angle, of shape (2, 2)
+
+    Raises:
+        ValueError: If the profile ranges do not have that shape
+    '''
+    thresholds = np.asarray(profile['angle_thresholds'], dtype=np.float64)
+    if thresholds.shape != ANGLE_TRIPLETS.shape[:1] + (2,):
+        raise ValueError(f"Expected angle thresholds of shape {(len(ANGLE_TRIPLETS), 2)}, got {thresholds.shape}")
+    return thresholds
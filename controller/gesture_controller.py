@@ -2,108 +2,174 @@
 # processes it (using the model if necessary), and updates the view accordingly.
 # Components: GestureController
 
-import mediapipe as mp
-from utils.gesture_checks import additional_landmark_checks, pips_above_mcps, hand_angle_validation
 import time
+import numpy as np
+from controller.calibration import profile_angle_thresholds, profile_rules
+from controller.gesture_rules import DEFAULT_GESTURE_RULES, GestureRuleEngine
+from controller.gesture_state import HandGestureState
+from utils.instrumentation import get_logger, instrumentation
+
+logger = get_logger(__name__)
 
 
 class GestureController:
-    def __init__(self, hand_detector, window_manager):
+    def __init__(self, hand_detector, window_manager, rules=None, validation_timeout=1.0, profile=None, classifier=None):
         self.hand_detector = hand_detector  # Instance of HandDetector for detecting hands
         self.window_manager = window_manager  # Instance of WindowManager for managing windows
-        self.drawing_utils = mp.solutions.drawing_utils  # Utility for drawing hand landmarks
-        self.valid_gesture_flag = False  # Initialize flag to indicate if initial validation is passed
-        self.last_valid_time = None  # Initialize timestamp of the last valid gesture
+        if profile is not None:
+            rules = profile_rules(profile, rules)  # Calibrated thresholds, in palm units
+        if classifier is not None:
+            rules = [rule.copy(exit_margin=classifier.exit_margin) for rule in (DEFAULT_GESTURE_RULES if rules is None else rules)]  # Hysteresis in confidence units
+        self.angle_thresholds = profile_angle_thresholds(profile) if profile is not None else None  # Hand position angle ranges, None for the defaults
+        self.rule_engine = GestureRuleEngine(rules, palm_normalized=profile is not None)  # Compiled gesture rules, evaluated once per frame
+        self.classifier = classifier  # GestureClassifier whose confidences replace the rule thresholds, None to use the rules
+        self.classifier_columns = classifier.rule_columns(self.rule_engine.rules) if classifier is not None else None  # Class of each rule
+        self.actions = {rule.action: getattr(window_manager, rule.action) for rule in self.rule_engine.rules}  # Dispatch table from action name to WindowManager method
+        self.validation_timeout = validation_timeout  # Time in seconds a hand out of view keeps its validation and gesture state
+        self.hands = {}  # Track id -> HandGestureState of every hand in view or recently seen
         self.dragging = False  # Initialize dragging flag as false
+        self.drag_hand = None  # Track id of the hand dragging the window, None if it left the view
         self.previous_position = None  # Initialize previous position
     
-    def process_gestures(self, image):
-        '''Processes the gestures detected in the image'''
-        hand_landmark = self.hand_detector.detect_single_hand(image)
-        # Draw landmarks on detected hand in 'image' by using the 'drawing_utils' object
-        if hand_landmark:
-            print("Hand detected")  # Debug: log when a hand is detected
-            self.drawing_utils.draw_landmarks(image, hand_landmark, mp.solutions.hands.HAND_CONNECTIONS)
-
-            if self.valid_gesture_flag or (
-                pips_above_mcps(hand_landmark) and 
-                additional_landmark_checks(hand_landmark) and 
-                hand_angle_validation(hand_landmark)
-            ):
-                self.valid_gesture_flag = True  # Change state to True if all checks passed
-                print(f"Valid gesture flag: {self.valid_gesture_flag}")  # Debug: log Flag status change from False to True
-                self.last_valid_time = time.time()  # Store the time that all checks passed
-
-                # Detect and handle close gesture
-                if self.detect_close_gesture(hand_landmark):
-                    self.window_manager.close_frontmost_window()
-                    return
-
-                # Detect and handle minimize gesture
-                if self.detect_minimize_gesture(hand_landmark):
-                    self.window_manager.minimize_frontmost_window()
-                    return
-
-                # Detect and handle full screen gesture
-                if self.detect_full_screen_gesture(hand_landmark):
-                    self.window_manager.full_screen_frontmost_window()
-                    return
-
-                # Detect and handle pickup gesture
-                if self.detect_pickup_gesture(hand_landmark):
-                    try:
-                        self.window_manager.pickup_window()
-                        self.dragging = True  # Set dragging flag to true
-                        self.previous_position = (hand_landmark.landmark[8].x, hand_landmark.landmark[8].y)
-                        
-                        self.detect_drag_gesture(hand_landmark)  # Check for drag gesture
-                        self.window_manager.drag_window(hand_landmark)
-                        
-                    except Exception as e:
-                        print(f"Error Dragging Window: {e}")  # Debug: log any error during dragging
-                        
-                # Detect and handle drop gesture
-                elif self.detect_drop_gesture(hand_landmark):
-                    self.window_manager.drop_window()
-                    self.dragging = False  # Reset dragging flag
-                    return
+    def process_gestures(self, detection, timestamp=None):
+        '''
+        Processes the gestures of the hand detected in the current frame
+
+        Params:
+            detection (HandDetection): Detection result shared with the view for this frame, or None if no hand was found
+            timestamp (float): Time of the frame in seconds, defaults to the current time. Replayed sessions pass
+                their recorded timestamps so that hold and cooldown timings are deterministic
+        '''
+        self.process_hands([detection] if detection else [], timestamp)
+
+    def process_hands(self, detections, timestamp=None):
+        '''
+        Processes the gestures of every hand detected in the current frame. Each hand, identified by its track
+        id, has its own validation and gesture state machines; the rules of all validated hands are evaluated
+        in one batch, so the cost per frame grows linearly with the number of hands
+
+        Params:
+            detections (list): HandDetection of every hand in the frame. Detections without a track id count as hand 0
+            timestamp (float): Time of the frame in seconds, defaults to the current time
+        '''
+        now = time.time() if timestamp is None else timestamp
+        seen = set()  # Track ids of the hands in this frame
+        valid_hands = []  # (track id, hand state, landmarks) of the hands whose gestures are evaluated
+        for detection in detections:
+            track_id = detection.track_id if detection.track_id is not None else 0
+            seen.add(track_id)
+            hand = self.hands.get(track_id)
+            if hand is None:
+                hand = self.hands[track_id] = HandGestureState(self.rule_engine.rules)
+            logger.debug("Hand %s detected", track_id)  # Debug: log when a hand is detected
+
+            is_valid_position = detection.validate(self.angle_thresholds)  # Once per frame, the view shows the same outcome
+            if hand.valid_gesture_flag or is_valid_position:
+                hand.valid_gesture_flag = True  # Change state to True if all checks passed
+                hand.last_valid_time = now  # Store the time that all checks passed
+                valid_hands.append((track_id, hand, detection.landmarks))  # (21, 3) landmark array converted once by the detector
+            else:
+                self.release_gestures(hand, now)  # No gesture can be held without a valid hand
+
+        if valid_hands:
+            # Evaluate every gesture rule (or classify) every valid hand in one pass and advance their gesture state machines
+            points = np.stack([landmarks.points for _, _, landmarks in valid_hands])
+            if self.classifier is not None:
+                margins = self.classifier.margins(points, self.classifier_columns)
             else:
-                self.valid_gesture_flag = False  # Reset flag if validation checks fail
-        else:
-            self.valid_gesture_flag = False  # Reset flag if no hand is detected
-
-        # Reset the flag if no valid gesture is detected for a certain time in seconds
-        if self.valid_gesture_flag and (time.time() - self.last_valid_time > 1):  # When flag is True and current time minus last valid time is greater than 1 second
-            self.valid_gesture_flag = False  # Reset flag to False so that a hand position check validation need to be executed again 
-            print(f"Valid gesture flag: {self.valid_gesture_flag} (reset due to timeout)")  # Debug: log flag reset from True to False
-
-    def calculate_landmarks_distance(self, point1, point2):
-        '''Calculates the distance between two landmarks'''
-        return ((point2.x - point1.x) ** 2 + (point2.y - point1.y) ** 2) ** 0.5
-
-    def detect_close_gesture(self, hand):
-        '''Detects the gesture to close the frontmost window'''
-        return self.calculate_landmarks_distance(hand.landmark[4], hand.landmark[20]) < 0.05  # Return True if the distance is below a threshold
-
-    def detect_minimize_gesture(self, hand):
-        '''Detects the gesture to minimize the frontmost window'''
-        return self.calculate_landmarks_distance(hand.landmark[4], hand.landmark[16]) < 0.05  # Return True if the distance is below a threshold
-
-    def detect_full_screen_gesture(self, hand):
-        '''Detects the gesture to make the frontmost window full screen'''
-        return self.calculate_landmarks_distance(hand.landmark[4], hand.landmark[12]) < 0.05  # Return True if the distance is below a threshold
-
-    def detect_pickup_gesture(self, hand):
-        '''Detects the gesture to pick up a window'''
-        print("Checking for pickup gesture...")
-        return self.calculate_landmarks_distance(hand.landmark[4], hand.landmark[8]) < 0.05  # Return True if the distance is below a threshold
-
-    def detect_drag_gesture(self, hand):
-        '''Detects the gesture to drag a window'''
-        print("Checking for drag gesture...")
-        return self.detect_pickup_gesture(hand)  # Reuse pickup gesture detection for dragging
-
-    def detect_drop_gesture(self, hand):
-        '''Detects the gesture to drop a window'''
-        print("Checking for drop gesture...")
-        return self.calculate_landmarks_distance(hand.landmark[4], hand.landmark[8]) > 0.1  # Return True if the distance is above a threshold
+                margins = self.rule_engine.evaluate(points)
+            for (track_id, hand, landmarks), hand_margins in zip(valid_hands, margins):
+                self.update_gestures(track_id, hand, hand_margins, landmarks, now)
+
+        for track_id, hand in list(self.hands.items()):
+            if track_id in seen:
+                continue
+            self.release_gestures(hand, now)  # No gesture can be held by a hand out of view
+            # Forget the hand if it stayed out of view for a certain time in seconds, so its position is checked again when it returns
+            if hand.last_valid_time is None or now - hand.last_valid_time > self.validation_timeout:
+                del self.hands[track_id]
+                logger.debug("Hand %s forgotten (validation timeout)", track_id)  # Debug: log validation reset
+                if track_id == self.drag_hand:
+                    self.drag_hand = None  # Any hand may now continue or end the drag
+
+    def update_gestures(self, track_id, hand, margins, hand_landmarks, now):
+        '''
+        Advances the gesture state machines of a hand by one frame and runs the actions of the gestures that fired.
+        While a window is being dragged, every frame of the dragging hand only moves it
+
+        Params:
+            track_id (int): Track id of the hand
+            hand (HandGestureState): Gesture state of the hand
+            margins (numpy.ndarray): Rule margins of the hand for this frame, ordered like the rule engine rules
+            hand_landmarks (HandLandmarks): Landmarks of the hand performing the gestures
+            now (float): Time of the frame in seconds
+        '''
+        if self.dragging and self.drag_hand is None:
+            self.drag_hand = track_id  # The dragging hand left the view, the first hand back takes over the drag
+        eligible = np.array([self.is_eligible(state.rule, track_id) for state in hand.gesture_states])
+        margins = np.where(eligible, margins, -np.inf)  # Ineligible gestures count as released
+
+        # Only the highest priority matching gesture may progress; lower priority ones are capped at 0 so they
+        # can neither arm nor count hold frames, but are only released once their own margin drops
+        matches = margins > 0
+        if matches.any():
+            winner = int(np.argmax(matches))
+            winner_margin = margins[winner]
+            margins = np.minimum(margins, 0)
+            margins[winner] = winner_margin
+        for state, margin in zip(hand.gesture_states, margins):
+            if state.update(margin, now):
+                self.dispatch_gesture(state.rule, hand_landmarks, track_id)
+
+        if self.dragging and self.drag_hand == track_id:
+            self.window_manager.drag_window(hand_landmarks)  # Drag frames only issue moves
+
+    def release_gestures(self, hand, now):
+        '''Advances the gesture state machines of a hand by one frame in which no gesture holds'''
+        for state in hand.gesture_states:
+            state.update(-np.inf, now)
+
+    def is_eligible(self, rule, track_id):
+        '''
+        Returns True if the rule can currently fire for a hand: a window can only be picked up while none is
+        dragged, and only dropped by the hand dragging it
+        '''
+        if rule.drag == 'start':
+            return not self.dragging
+        if rule.drag == 'stop':
+            return self.dragging and self.drag_hand == track_id
+        return True
+
+    def release_drag(self):
+        '''
+        Drops the window being dragged, e.g. when the pipeline stops mid-drag, so the mouse button is not left held down
+        '''
+        if not self.dragging:
+            return
+        logger.info("Dropping the dragged window on shutdown")  # Log the forced drop
+        self.window_manager.drop_window()
+        self.dragging = False
+        self.drag_hand = None
+
+    def dispatch_gesture(self, gesture, hand_landmarks, track_id=0):
+        '''
+        Runs the WindowManager action of a detected gesture through the dispatch table
+
+        Params:
+            gesture (GestureRule): The detected gesture
+            hand_landmarks (HandLandmarks): Landmarks of the hand performing the gesture
+            track_id (int): Track id of the hand performing the gesture
+        '''
+        logger.info("%s gesture fired by hand %s", gesture.name, track_id)  # Log the gesture whose action runs
+        instrumentation.count('gestures_fired')
+        try:
+            self.actions[gesture.action]()  # Look up and call the WindowManager method for this gesture
+            if gesture.drag == 'start':
+                self.dragging = True  # Set dragging flag to true
+                self.drag_hand = track_id  # Only this hand moves and drops the window
+                self.previous_position = tuple(hand_landmarks.points[8, :2])
+            elif gesture.drag == 'stop':
+                self.dragging = False  # Reset dragging flag
+                self.drag_hand = None
+        except Exception as e:
+            logger.error("Error Handling %s Gesture: %s", gesture.name, e)  # Log any error during the gesture action
@@ -0,0 +1,177 @@
+# Declares gestures as data and evaluates all of them with one vectorized pass per frame
+# Components: GestureRule, GestureRuleEngine, DEFAULT_GESTURE_RULES
+
+import numpy as np
+from utils.gesture_checks import as_points, calculate_angle, palm_size
+
+
+class GestureRule:
+    def __init__(self, name, action, distances=(), angles=(), priority=0, drag=None, hold_frames=3, exit_margin=0.02, cooldown=0.5):
+        '''
+        Initializes a GestureRule. A rule matches when every one of its constraints holds
+
+        Params:
+            name (str): Name of the gesture
+            action (str): Name of the WindowManager method to call when the gesture is detected
+            distances (iterable): Distance constraints as (landmark_a, landmark_b, operator, threshold) tuples,
+                where operator is '<' or '>' and the distance uses the x and y coordinates
+            angles (iterable): Angle constraints as (landmark_a, vertex, landmark_c, min_degrees, max_degrees) tuples
+            priority (int): Rules with a higher priority win when several gestures match the same frame
+            drag (str): 'start' if the gesture starts dragging a window, 'stop' if it ends dragging, else None
+            hold_frames (int): Consecutive frames the gesture must hold before its action fires
+            exit_margin (float): How far past its thresholds the gesture must go to count as released (hysteresis)
+            cooldown (float): Time in seconds after a release before the gesture can fire again
+        '''
+        self.name = name
+        self.action = action
+        self.distances = tuple(distances)
+        self.angles = tuple(angles)
+        self.priority = priority
+        self.drag = drag
+        self.hold_frames = hold_frames
+        self.exit_margin = exit_margin
+        self.cooldown = cooldown
+
+    def copy(self, **changes):
+        '''
+        Returns a copy of the rule with some of its fields replaced, e.g. calibrated thresholds
+
+        Params:
+            changes: GestureRule arguments to replace
+        '''
+        fields = dict(
+            name=self.name, action=self.action, distances=self.distances, angles=self.angles, priority=self.priority,
+            drag=self.drag, hold_frames=self.hold_frames, exit_margin=self.exit_margin, cooldown=self.cooldown
+        )
+        fields.update(changes)
+        return GestureRule(**fields)
+
+    def __repr__(self):
+        return f"GestureRule({self.name!r}, action={self.action!r}, priority={self.priority})"
+
+
+# Thumb tip (4) pinching a fingertip triggers an action; pulling it away from the index tip (8) drops a window
+DEFAULT_GESTURE_RULES = [
+    GestureRule('close', 'close_frontmost_window', distances=[(4, 20, '<', 0.05)], priority=4),  # Thumb tip to pinky tip
+    GestureRule('minimize', 'minimize_frontmost_window', distances=[(4, 16, '<', 0.05)], priority=3),  # Thumb tip to ring tip
+    GestureRule('full_screen', 'full_screen_frontmost_window', distances=[(4, 12, '<', 0.05)], priority=2),  # Thumb tip to middle tip
+    GestureRule('pickup', 'pickup_window', distances=[(4, 8, '<', 0.05)], priority=1, drag='start'),  # Thumb tip to index tip
+    GestureRule('drop', 'drop_window', distances=[(4, 8, '>', 0.1)], priority=0, drag='stop'),  # Thumb tip away from index tip
+]
+
+
+class GestureRuleEngine:
+    def __init__(self, rules=None, palm_normalized=False):
+        '''
+        Initializes the GestureRuleEngine and compiles the rules into lookup arrays, so that each frame
+        computes every distinct landmark distance and angle exactly once no matter how many rules use it
+
+        Params:
+            rules (list): GestureRule objects to evaluate, defaults to DEFAULT_GESTURE_RULES
+            palm_normalized (bool): Whether distances are divided by the palm size, so thresholds are in palm
+                units instead of image units, as in calibrated profiles
+        '''
+        rules = DEFAULT_GESTURE_RULES if rules is None else rules
+        self.palm_normalized = palm_normalized
+        self.rules = sorted(rules, key=lambda rule: rule.priority, reverse=True)  # Highest priority first
+        self.names = [rule.name for rule in self.rules]
+        self._compile()
+
+    def _compile(self):
+        '''Builds the pair and triplet tables and the per-constraint sign, offset and source index arrays'''
+        pairs = {}  # (landmark_a, landmark_b) -> column of the distance table
+        triplets = {}  # (landmark_a, vertex, landmark_c) -> column of the angle table
+        columns, is_angle, signs, offsets, rule_starts = [], [], [], [], []
+
+        # Every constraint is turned into a margin = sign * measurement + offset, which is positive when it holds
+        for rule in self.rules:
+            if not rule.distances and not rule.angles:
+                raise ValueError(f"Gesture rule '{rule.name}' has no constraints")
+            rule_starts.append(len(columns))
+            for landmark_a, landmark_b, operator, threshold in rule.distances:
+                if operator not in ('<', '>'):
+                    raise ValueError(f"Unknown operator '{operator}' in gesture rule '{rule.name}'")
+                columns.append(pairs.setdefault((landmark_a, landmark_b), len(pairs)))
+                is_angle.append(False)
+                sign = -1.0 if operator == '<' else 1.0
+                signs.append(sign)
+                offsets.append(-sign * threshold)
+            for landmark_a, vertex, landmark_c, min_degrees, max_degrees in rule.angles:
+                column = triplets.setdefault((landmark_a, vertex, landmark_c), len(triplets))
+                columns += [column, column]
+                is_angle += [True, True]
+                signs += [1.0, -1.0]
+                offsets += [-min_degrees, max_degrees]  # angle - min_degrees and max_degrees - angle
+
+        # Angles are stored after the distances in the measurement vector
+        self.pair_table = np.array(list(pairs), dtype=np.intp).reshape(-1, 2)
+        self.triplet_table = np.array(list(triplets), dtype=np.intp).reshape(-1, 3)
+        self.sources = np.array(columns, dtype=np.intp) + len(pairs) * np.array(is_angle, dtype=np.intp)  # Column of each constraint in the measurement vector
+        self.signs = np.array(signs, dtype=np.float32)
+        self.offsets = np.array(offsets, dtype=np.float32)
+        self.rule_starts = np.array(rule_starts, dtype=np.intp)
+
+    def measure(self, hand):
+        '''
+        Computes every distinct distance and angle used by the rules in one pass
+
+        Params:
+            hand (HandLandmarks or numpy.ndarray): A single hand or an (N, 21, 3) batch of hands
+
+        Returns:
+            numpy.ndarray: Distances followed by angles in degrees, of shape (M,) or (N, M)
+        '''
+        points = as_points(hand)
+        distances = np.linalg.norm(points[..., self.pair_table[:, 0], :2] - points[..., self.pair_table[:, 1], :2], axis=-1)
+        if self.palm_normalized:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                distances = distances / palm_size(points)[..., None]  # A collapsed palm gives non-finite distances, which never match
+        measurements = [distances]
+        if len(self.triplet_table):
+            measurements.append(calculate_angle(
+                points[..., self.triplet_table[:, 0], :],
+                points[..., self.triplet_table[:, 1], :],
+                points[..., self.triplet_table[:, 2], :]
+            ).astype(np.float32))
+        return np.concatenate(measurements, axis=-1)
+
+    def evaluate(self, hand):
+        '''
+        Computes how strongly each rule holds. A rule's margin is the margin of its weakest constraint
+
+        Params:
+            hand (HandLandmarks or numpy.ndarray): A single hand or an (N, 21, 3) batch of hands
+
+        Returns:
+            numpy.ndarray: Margins of shape (R,) or (N, R) ordered like self.rules, positive where the rule matches
+        '''
+        margins = self.signs * self.measure(hand)[..., self.sources] + self.offsets
+        margins = np.where(np.isnan(margins), -np.inf, margins)  # Undefined angles never match
+        return np.minimum.reduceat(margins, self.rule_starts, axis=-1)
+
+    def match(self, hand):
+        '''
+        Finds the highest priority gesture that matches a single hand
+
+        Params:
+            hand (HandLandmarks or numpy.ndarray): A single hand
+
+        Returns:
+            GestureRule: The matching rule, or None if no gesture matches
+        '''
+        matches = self.evaluate(hand) > 0
+        index = int(np.argmax(matches))
+        return self.rules[index] if matches[index] else None
+
+    def match_batch(self, hands):
+        '''
+        Finds the highest priority gesture for every hand of a batch
+
+        Params:
+            hands (numpy.ndarray): An (N, 21, 3) batch of hands
+
+        Returns:
+            numpy.ndarray: Index into self.rules of the matching rule for each hand, or -1 where no gesture matches
+        '''
+        matches = self.evaluate(hands) > 0
+        return np.where(matches.any(axis=-1), np.argmax(matches, axis=-1), -1)
@@ -0,0 +1,80 @@
+# Tracks each gesture over time so that holding a gesture triggers its action exactly once
+# Components: GestureStateMachine, HandGestureState
+
+IDLE = 'idle'  # Gesture not present
+ARMED = 'armed'  # Gesture present, waiting to be held for enough frames
+FIRED = 'fired'  # Action triggered, waiting for the gesture to be released
+COOLDOWN = 'cooldown'  # Gesture released, waiting before it can be armed again
+
+
+class GestureStateMachine:
+    def __init__(self, rule):
+        '''
+        Initializes the GestureStateMachine of a gesture rule
+
+        The machine moves idle -> armed when the rule margin becomes positive, armed -> fired once the
+        margin stayed positive for rule.hold_frames frames, fired -> cooldown once the margin falls to
+        -rule.exit_margin or below, and cooldown -> idle after rule.cooldown seconds. Requiring the margin to
+        fall below -exit_margin rather than 0 adds hysteresis, so jitter around the threshold does not
+        release and re-trigger the gesture
+
+        Params:
+            rule (GestureRule): The gesture rule this machine tracks
+        '''
+        self.rule = rule
+        self.state = IDLE  # Current state of the gesture
+        self.held_frames = 0  # Consecutive frames the gesture has been held while armed
+        self.cooldown_until = 0.0  # Time at which the cooldown ends
+
+    def update(self, margin, now):
+        '''
+        Advances the state machine by one frame
+
+        Params:
+            margin (float): Rule margin for this frame, positive while the gesture holds
+            now (float): Current time in seconds
+
+        Returns:
+            bool: True if the gesture fired on this frame and its action should run, False otherwise
+        '''
+        released = margin <= -self.rule.exit_margin
+        if self.state == COOLDOWN:
+            if now < self.cooldown_until:
+                return False
+            self.state = IDLE
+        if self.state == IDLE:
+            if margin > 0:
+                self.state = ARMED
+                self.held_frames = 0
+        if self.state == ARMED:
+            if released:
+                self.state = IDLE
+            elif margin > 0:
+                self.held_frames += 1
+                if self.held_frames >= self.rule.hold_frames:
+                    self.state = FIRED
+                    return True
+        elif self.state == FIRED and released:
+            self.state = COOLDOWN
+            self.cooldown_until = now + self.rule.cooldown
+        return False
+
+    def reset(self):
+        '''Returns the machine to idle, dropping any pending hold or cooldown'''
+        self.state = IDLE
+        self.held_frames = 0
+        self.cooldown_until = 0.0
+
+
+class HandGestureState:
+    def __init__(self, rules):
+        '''
+        Initializes the gesture state of one tracked hand: its own state machine per rule and its own
+        hand position validation
+
+        Params:
+            rules (list): Gesture rules, in rule engine order
+        '''
+        self.gesture_states = [GestureStateMachine(rule) for rule in rules]  # One state machine per rule, in rule engine order
+        self.valid_gesture_flag = False  # Whether the hand passed the hand position checks
+        self.last_valid_time = None  # Time the hand was last seen with a passed validation
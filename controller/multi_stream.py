@@ -0,0 +1,142 @@
+# Runs one gesture pipeline per video stream (cameras, video files or recorded sessions with frames), each
+# with its own controller, window manager and actuation queue, while hand detection for every stream runs
+# on a shared pool of worker processes
+# Components: open_source, MultiStreamRunner
+
+import functools
+import os
+import signal
+import threading
+import time
+import cv2
+from controller.gesture_controller import GestureController
+from controller.pipeline import ActuationQueue, GesturePipeline, install_stop_handlers
+from model.inference_pool import InferencePool, RemoteHandDetector, create_hand_detector
+from model.inference_scheduler import InferenceScheduler
+from model.session_recorder import Session
+from model.session_replay import SessionCapture
+from model.window_manager import WindowManager
+from utils.instrumentation import get_logger
+
+logger = get_logger(__name__)
+
+
+def open_source(source):
+    '''
+    Opens a video stream
+
+    Params:
+        source (int or str): Camera index, path of a video file or directory of a session recorded with frames.
+            Objects with a read() method, like an opened cv2.VideoCapture, are used as they are
+
+    Returns:
+        tuple: (capture with read() and release() methods, whether its frames need mirroring)
+
+    Raises:
+        ValueError: If the source cannot be opened
+    '''
+    if hasattr(source, 'read'):
+        return source, True
+    if isinstance(source, int) or str(source).isdigit():
+        capture = cv2.VideoCapture(int(source))  # Camera index
+    elif os.path.isdir(source):
+        return SessionCapture(Session(source)), False  # Stored frames were mirrored when recorded
+    else:
+        capture = cv2.VideoCapture(source)  # Video file
+    if not capture.isOpened():
+        raise ValueError(f"Cannot open video source: {source}")
+    return capture, True
+
+
+class MultiStreamRunner:
+    def __init__(self, sources, backend_factory, workers=None, detector_factory=None, multi_hand=False, profile=None, classifier=None, poll_interval=0.1):
+        '''
+        Initializes the MultiStreamRunner. Every stream runs headless; the runner stops on SIGINT or SIGTERM,
+        or once every stream has ended
+
+        Params:
+            sources (list): Sources of the streams, see open_source
+            backend_factory (callable): Builds the actuation backend of a stream, e.g. MacOSBackend
+            workers (int): Number of inference worker processes, defaults to one per stream up to the number of cores
+            detector_factory (callable): Picklable callable building the HandDetector of a stream in a worker,
+                defaults to create_hand_detector, without the region of interest model in multi-hand mode
+            multi_hand (bool): Whether to detect and track every hand in view of each stream
+            profile (dict): Calibration profile shared by every stream, None for the default thresholds
+            classifier (GestureClassifier): Gesture classifier shared by every stream, None to use the threshold rules
+            poll_interval (float): Time in seconds between two checks for ended streams
+        '''
+        self.sources = list(sources)
+        self.backend_factory = backend_factory
+        self.multi_hand = multi_hand
+        self.profile = profile
+        self.classifier = classifier
+        self.poll_interval = poll_interval
+        if detector_factory is None:
+            detector_factory = functools.partial(create_hand_detector, roi_tracking=not multi_hand)  # Multi-hand detection never uses the crop model
+        self.pool = InferencePool(len(self.sources), workers, detector_factory=detector_factory)
+        self.stop_event = threading.Event()  # Set by SIGINT or SIGTERM
+        self.pipelines = []  # GesturePipeline of each stream
+        self.remote_detectors = []  # RemoteHandDetector of each stream, holding its shared frame buffer
+
+    def create_pipeline(self, stream_id, source):
+        '''
+        Builds the pipeline of a stream, with its own detector proxy, controller and actuation queue
+
+        Params:
+            stream_id (int): Index of the stream in the inference pool
+            source: Source of the stream, see open_source
+
+        Returns:
+            GesturePipeline: The pipeline, not started
+        '''
+        capture, mirror = open_source(source)
+        remote_detector = RemoteHandDetector(self.pool, stream_id)
+        self.remote_detectors.append(remote_detector)
+        hand_detector = InferenceScheduler(remote_detector)  # Idle streams send fewer frames to the pool
+        actuation_queue = ActuationQueue(self.backend_factory())
+        window_manager = WindowManager(backend=actuation_queue, geometry_refresh_interval=0.1)  # Window geometry is refreshed off the hot path
+        gesture_controller = GestureController(hand_detector, window_manager, profile=self.profile, classifier=self.classifier)
+        return GesturePipeline(capture, hand_detector, gesture_controller, actuation_queue, None, multi_hand=self.multi_hand, mirror=mirror)
+
+    def run(self):
+        '''
+        Starts the inference workers and every stream, and waits until all streams have ended or a signal arrives
+
+        Returns:
+            list: Frames processed per second by each stream
+        '''
+        self.pool.start()
+        previous_handlers = install_stop_handlers(self.stop_event)
+        start_time = time.perf_counter()
+        try:
+            for stream_id, source in enumerate(self.sources):
+                self.pipelines.append(self.create_pipeline(stream_id, source))
+            for pipeline in self.pipelines:
+                pipeline.start()
+            while not self.stop_event.wait(self.poll_interval):
+                if all(pipeline.stop_event.is_set() for pipeline in self.pipelines):
+                    logger.info("Every stream has ended. Exiting...")  # Log the end of the last stream
+                    break
+        except KeyboardInterrupt:
+            logger.info("Interrupted. Exiting...")  # Log interruption
+        finally:
+            self.stop()
+            for signal_number, handler in previous_handlers.items():
+                signal.signal(signal_number, handler)
+
+        elapsed = time.perf_counter() - start_time
+        rates = [pipeline.processed_frames / elapsed for pipeline in self.pipelines]
+        for stream_id, rate in enumerate(rates):
+            logger.info("Stream %d (%s): %.1f frames per second", stream_id, self.sources[stream_id], rate)  # Log the throughput of each stream
+        logger.info("Aggregate: %.1f frames per second", sum(rates))  # Log the throughput of every stream together
+        return rates
+
+    def stop(self):
+        '''
+        Stops every stream, then the inference workers, and frees the shared frame buffers
+        '''
+        for pipeline in self.pipelines:
+            pipeline.stop()  # Waits for the stream's in-flight detection
+        self.pool.close()
+        for remote_detector in self.remote_detectors:
+            remote_detector.close()
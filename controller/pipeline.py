@@ -0,0 +1,326 @@
+# Runs capture, inference and actuation on separate threads connected by bounded queues,
+# so a slow stage (e.g. a blocking window action) never stalls the camera
+# Components: ActuationQueue, GesturePipeline, install_stop_handlers
+
+from collections import deque
+import signal
+import threading
+import time
+import cv2
+from utils.frame_ring import FrameRing
+from utils.instrumentation import get_logger, instrumentation
+from utils.latest_queue import LatestQueue
+
+logger = get_logger(__name__)
+
+
+def install_stop_handlers(stop_event):
+    '''
+    Makes SIGINT and SIGTERM set a stop event, e.g. when running as a background service
+
+    Params:
+        stop_event (threading.Event): Event set when a signal arrives
+
+    Returns:
+        dict: Previous handler of each signal, to restore once stopped
+    '''
+    if threading.current_thread() is not threading.main_thread():
+        return {}  # Signal handlers can only be installed from the main thread
+
+    def handle_signal(signal_number, frame):
+        logger.info("Received signal %d. Exiting...", signal_number)  # Log the shutdown request
+        stop_event.set()
+
+    return {signal_number: signal.signal(signal_number, handle_signal) for signal_number in (signal.SIGINT, signal.SIGTERM)}
+
+
+class ActuationQueue:
+    # Commands where only the latest matters: consecutive ones are merged into the newest
+    COALESCED_COMMANDS = frozenset(['drag'])
+
+    def __init__(self, backend):
+        '''
+        Wraps an actuation backend so that commands are queued by the caller and executed later by the
+        actuation worker. Consecutive drags are coalesced, so the queue only grows with discrete commands
+        (pickup, drop, minimize, close, full screen) and never holds a backlog of stale moves
+
+        Params:
+            backend (ActuationBackend): Backend that performs the commands
+        '''
+        self.backend = backend
+        self.window_server = backend.window_server  # Read by the WindowManager's geometry cache, which the app refreshes on a background thread so pickups never scan on the caller
+        self.commands = deque()  # Pending (command name, args) tuples
+        self.condition = threading.Condition()  # Wakes up the worker waiting for a command
+        self.closed = False  # Set once the queue is shut down
+        self.coalesced = 0  # Number of commands merged into a newer one
+
+    def screen_size(self):
+        return self.backend.screen_size()
+
+    def put(self, command, *args):
+        '''
+        Queues a command, replacing the last pending command if both are the same coalesced command
+
+        Params:
+            command (str): Name of the backend method, e.g. 'drag'
+            args: Arguments of the backend method
+        '''
+        with self.condition:
+            if command in self.COALESCED_COMMANDS and self.commands and self.commands[-1][0] == command:
+                self.commands[-1] = (command, args)  # Only the newest position matters
+                self.coalesced += 1
+                instrumentation.count('actions_coalesced')
+            else:
+                self.commands.append((command, args))
+            self.condition.notify()
+
+    def pickup(self, x, y):
+        self.put('pickup', x, y)
+
+    def drag(self, x, y):
+        self.put('drag', x, y)
+
+    def drop(self):
+        self.put('drop')
+
+    def minimize(self):
+        self.put('minimize')
+
+    def close(self):
+        self.put('close')
+
+    def full_screen(self):
+        self.put('full_screen')
+
+    def execute_next(self, timeout=None):
+        '''
+        Executes the oldest pending command on the backend
+
+        Params:
+            timeout (float): Maximum time to wait for a command in seconds, or None to wait until one arrives or the queue is shut down
+
+        Returns:
+            str: Name of the executed command, or None if none arrived before the timeout
+        '''
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.commands or self.closed, timeout) or not self.commands:
+                return None
+            command, args = self.commands.popleft()
+        with instrumentation.timer('actuation'):
+            getattr(self.backend, command)(*args)
+        instrumentation.count('actions')
+        return command
+
+    def is_finished(self):
+        '''Returns True once the queue is shut down and every pending command was executed'''
+        with self.condition:
+            return self.closed and not self.commands
+
+    def shutdown(self):
+        '''
+        Shuts the queue down and wakes up the waiting worker, which still executes the pending commands
+        '''
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+
+class GesturePipeline:
+    def __init__(self, webcam, hand_detector, gesture_controller, actuation_queue, main_view, recorder=None, poll_interval=0.1, multi_hand=False, preview_every=1, mirror=True):
+        '''
+        Initializes the pipeline. Frames flow capture -> inference -> display through single-slot queues
+        where the newest frame wins, and window commands flow inference -> actuation through the ActuationQueue
+
+        Params:
+            webcam (cv2.VideoCapture): Opened webcam to capture frames from
+            hand_detector (HandDetector): Instance of HandDetector for detecting hands
+            gesture_controller (GestureController): Instance of GestureController, whose window manager sends its commands to the actuation queue
+            actuation_queue (ActuationQueue): Queue whose commands the actuation worker executes
+            main_view (MainView): Instance of MainView for displaying frames, or None to run headless: nothing is drawn
+                or displayed, and the pipeline stops on SIGINT or SIGTERM
+            recorder (SessionRecorder): Records every processed frame when set, saved when the pipeline stops
+            poll_interval (float): Time in seconds workers wait on an empty queue before checking for shutdown
+            multi_hand (bool): Whether to detect and track every hand in view instead of a single one
+            preview_every (int): Display only one processed frame out of this many, e.g. for a low-rate preview of a background run
+            mirror (bool): Whether to mirror the frames, False for sources that are already mirrored. Pixels are only flipped
+                when frames are displayed or recorded; otherwise the landmarks are mirrored after detection
+        '''
+        self.webcam = webcam
+        self.hand_detector = hand_detector
+        self.gesture_controller = gesture_controller
+        self.actuation_queue = actuation_queue
+        self.main_view = main_view
+        self.recorder = recorder
+        self.poll_interval = poll_interval
+        self.multi_hand = multi_hand
+        self.preview_every = max(1, preview_every)
+        self.mirror = mirror
+        self.mirror_pixels = mirror and (main_view is not None or bool(recorder and recorder.save_frames))  # Someone looks at the pixels
+        self.mirror_landmarks = mirror and not self.mirror_pixels  # Mirroring 21 landmarks is cheaper than flipping every pixel
+        self.frame_ring = FrameRing()  # Reused frame buffers, each owned by one stage at a time
+        self.raw_frame = None  # Buffer the webcam writes into before the flip, only used by the capture thread
+        self.frame_shape = None  # Shape of the captured frames, known after the first one
+        self.processed_frames = 0  # Frames processed by the inference worker
+
+        self.stop_event = threading.Event()  # Set to request every stage to stop
+        self.frame_queue = LatestQueue(1, on_drop=lambda item: self.frame_ring.release(item[1]))  # Captured frames waiting for inference
+        self.display_queue = LatestQueue(1, on_drop=lambda item: self.frame_ring.release(item[0]))  # Processed frames waiting for display
+        self.threads = [
+            threading.Thread(target=self._capture_loop, name="capture", daemon=True),
+            threading.Thread(target=self._inference_loop, name="inference", daemon=True),
+            threading.Thread(target=self._actuation_loop, name="actuation", daemon=True),
+        ]
+
+    def read_frame(self):
+        '''
+        Reads the next frame into a buffer of the frame ring, flipping it horizontally if its pixels are mirrored
+
+        Returns:
+            tuple: (whether a frame was read, the frame owned by the caller until released)
+        '''
+        if self.mirror_pixels:
+            ret, raw_frame = self.webcam.read(image=self.raw_frame)  # The webcam writes into the same buffer every frame
+            if not ret:
+                return False, None
+            if raw_frame is not self.raw_frame:
+                self.raw_frame = raw_frame  # First frame or new resolution
+                instrumentation.count('frame_allocations')
+            buffer = self.frame_ring.acquire(raw_frame.shape)
+            frame = cv2.flip(raw_frame, 1, dst=buffer)  # Flip the image horizontally for a mirror effect
+        else:
+            buffer = self.frame_ring.acquire(self.frame_shape) if self.frame_shape else None
+            ret, frame = self.webcam.read(image=buffer)
+            if not ret:
+                if buffer is not None:
+                    self.frame_ring.release(buffer)
+                return False, None
+        if frame is not buffer:  # The buffer did not match the frame size
+            self.frame_shape = frame.shape
+            instrumentation.count('frame_allocations')
+        return True, frame
+
+    def _capture_loop(self):
+        '''Captures frames from the webcam as fast as it delivers them'''
+        while not self.stop_event.is_set():
+            with instrumentation.timer('capture'):
+                ret, frame = self.read_frame()  # Capture a frame from the webcam
+                if not ret:  # If capturing the frame fails
+                    logger.error("Failed to capture image. Exiting...")  # Log failure
+                    self.stop_event.set()
+                    break
+            instrumentation.count('frames')
+            if self.frame_queue.put((time.time(), frame)):  # Drops the previous frame if inference has not picked it up yet
+                instrumentation.count('frames_dropped')
+
+    def _inference_loop(self):
+        '''Detects the hands on the newest frame and lets the controller queue the resulting actions'''
+        while not self.stop_event.is_set():
+            item = self.frame_queue.get(self.poll_interval)
+            if item is None:
+                continue
+            timestamp, frame = item
+            with instrumentation.timer('detect'):
+                if self.multi_hand:
+                    detections = self.hand_detector.detect_hands(frame)  # Detect and track every hand once per frame
+                else:
+                    detection = self.hand_detector.detect_single_hand(frame)  # Detect the hand once per frame
+                    detections = [detection] if detection else []
+            if self.mirror_landmarks:
+                detections = [detection.mirrored() for detection in detections]  # Same result as detecting on the flipped frame
+            if detections:
+                instrumentation.count('detections', len(detections))
+            with instrumentation.timer('controller'):
+                self.gesture_controller.process_hands(detections, timestamp)  # Queues window commands on the actuation queue
+            if self.recorder:
+                self.recorder.add(timestamp, detections[0] if detections else None, frame)  # Sessions hold a single hand
+            self.processed_frames += 1
+            if self.main_view and self.processed_frames % self.preview_every == 0:
+                self.display_queue.put((frame, detections))  # Drawing happens on the main thread, off the hot path
+            else:
+                self.frame_ring.release(frame)  # No stage uses the frame anymore
+
+    def _actuation_loop(self):
+        '''
+        Executes queued window commands, so slow OS calls never stall capture or inference. Runs until the queue
+        is shut down and drained, so commands queued before shutdown, like a drop, are still executed
+        '''
+        while not self.actuation_queue.is_finished():
+            try:
+                self.actuation_queue.execute_next(self.poll_interval)
+            except Exception as e:
+                logger.error("Error Executing Window Action: %s", e)  # Log any error raised by a window action
+
+    def run(self):
+        '''
+        Starts the worker threads and displays processed frames on the calling thread until the
+        'Escape' key is pressed, capture fails or the process receives SIGINT or SIGTERM. OpenCV windows
+        must be handled on the main thread, so display stays here. Headless, the calling thread only
+        waits for shutdown: no GUI events are pumped
+        '''
+        previous_handlers = self.install_signal_handlers()
+        self.start()
+        try:
+            if self.main_view is None:
+                self.stop_event.wait()  # Set by a signal or a failing capture
+            while not self.stop_event.is_set():
+                item = self.display_queue.get(self.poll_interval)
+                if item is not None:
+                    frame, detections = item
+                    with instrumentation.timer('display'):
+                        self.main_view.display_hands(frame, detections)  # Display the frame with hand gesture information
+                    self.frame_ring.release(frame)
+
+                key = cv2.waitKey(1)  # Pump GUI events; the workers keep running meanwhile
+                if key == 27:  # Check if the pressed key is the 'Escape' key (27)
+                    logger.info("'Escape' key pressed. Exiting...")  # Log when 'Escape' key is pressed
+                    break
+        except KeyboardInterrupt:
+            logger.info("Interrupted. Exiting...")  # Log interruption
+        finally:
+            self.stop()
+            for signal_number, handler in previous_handlers.items():
+                signal.signal(signal_number, handler)
+
+    def start(self):
+        '''
+        Starts the capture, inference and actuation workers without blocking, e.g. to run several pipelines
+        side by side. run() starts them itself
+        '''
+        for thread in self.threads:
+            thread.start()
+
+    def install_signal_handlers(self):
+        '''
+        Makes SIGINT and SIGTERM stop the pipeline, e.g. when it runs as a background service
+
+        Returns:
+            dict: Previous handler of each signal, restored when the pipeline stops
+        '''
+        return install_stop_handlers(self.stop_event)
+
+    def stop(self):
+        '''
+        Stops every stage, waits for the workers to finish and releases the webcam and windows.
+        Capture and inference stop first; a window still being dragged is dropped, and the actuation
+        worker executes every pending command before it stops. Safe to call more than once
+        '''
+        self.stop_event.set()
+        for queue in (self.frame_queue, self.display_queue):
+            queue.close()  # Wake up workers blocked on an empty queue
+        capture_thread, inference_thread, actuation_thread = self.threads
+        for thread in (capture_thread, inference_thread):
+            if thread.is_alive():
+                thread.join()
+        self.gesture_controller.release_drag()  # Never leave the mouse button held down
+        self.actuation_queue.shutdown()  # The worker drains the queue, then exits
+        if actuation_thread.is_alive():
+            actuation_thread.join()
+        self.gesture_controller.window_manager.close()  # Stops the window geometry refresh
+        if self.recorder:
+            self.recorder.save()
+            self.recorder = None  # Save only once
+        self.webcam.release()  # Release the webcam resources
+        if self.main_view:
+            cv2.destroyAllWindows()  # Close all OpenCV windows
+        logger.info("Dropped frames: %d, coalesced drags: %d, frame buffers allocated: %d", self.frame_queue.dropped, self.actuation_queue.coalesced, self.frame_ring.allocations)  # Log dropped and merged items
+        logger.info("Webcam and OpenCV windows closed.")  # Log resource cleanup
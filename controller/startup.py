@@ -0,0 +1,86 @@
+# Starts the app without waiting on its slowest parts: the webcam and the heavy components (hand model,
+# actuation backend) are loaded on worker threads while the main thread opens the preview window and
+# shows camera frames as soon as they arrive
+# Components: StartupLoader
+
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import cv2
+from utils.instrumentation import get_logger
+
+logger = get_logger(__name__)
+
+
+class StartupLoader:
+    def __init__(self, main_view, startup_timer, message="Loading hand model..."):
+        '''
+        Initializes the StartupLoader
+
+        Params:
+            main_view (MainView): Instance of MainView that shows the preview while loading, or None when running headless
+            startup_timer (StartupTimer): Records the time taken by each phase
+            message (str): Status message shown on the preview until loading is done
+        '''
+        self.main_view = main_view
+        self.startup_timer = startup_timer
+        self.message = message
+
+    def timed(self, name, loader):
+        '''Runs a loader inside a startup phase'''
+        with self.startup_timer.phase(name):
+            return loader()
+
+    def run(self, open_webcam, loaders):
+        '''
+        Opens the webcam and runs the loaders in parallel, previewing the webcam on the calling thread until
+        every loader is done. OpenCV windows must be handled on the main thread, so this must be called from it
+
+        Params:
+            open_webcam (callable): Returns the opened cv2.VideoCapture
+            loaders (dict): Phase name -> callable building a component, e.g. {'model': load_hand_detector}
+
+        Returns:
+            tuple: (webcam, dict of phase name -> component), or None if 'Escape' was pressed during startup
+        '''
+        executor = ThreadPoolExecutor(max_workers=len(loaders) + 1, thread_name_prefix="startup")
+        webcam_future = executor.submit(self.timed, 'camera', open_webcam)
+        aborted = threading.Event()  # Set when 'Escape' is pressed during startup
+
+        def release_if_aborted(future):
+            if aborted.is_set() and not future.cancelled() and future.exception() is None:
+                future.result().release()  # The webcam opened after startup was aborted
+
+        webcam_future.add_done_callback(release_if_aborted)
+        futures = {name: executor.submit(self.timed, name, loader) for name, loader in loaders.items()}
+        try:
+            if self.main_view is None:  # Headless: nothing to show, just wait for every component
+                return webcam_future.result(), {name: future.result() for name, future in futures.items()}
+
+            with self.startup_timer.phase('window'):
+                self.main_view.show_message(self.message)  # The window opens before anything has loaded
+                cv2.waitKey(1)
+
+            webcam = None
+            first_frame_shown = False
+            while webcam is None or not all(future.done() for future in futures.values()):
+                if webcam is None and webcam_future.done():
+                    webcam = webcam_future.result()  # Raises if opening the webcam failed
+                    if not webcam.isOpened():
+                        logger.error("Could not open webcam")  # Log failure; capture fails once the pipeline starts
+                if webcam is not None and webcam.isOpened():
+                    ret, frame = webcam.read()
+                    if ret:
+                        self.main_view.show_message(self.message, cv2.flip(frame, 1))  # Mirrored like the pipeline frames
+                        if not first_frame_shown:
+                            self.startup_timer.mark('first_frame')
+                            first_frame_shown = True
+                if cv2.waitKey(1 if webcam is not None else 10) == 27:  # Waits longer while there is nothing to show
+                    logger.info("'Escape' key pressed during startup. Exiting...")  # Log early exit
+                    aborted.set()
+                    if webcam_future.done():
+                        release_if_aborted(webcam_future)  # Opened before the abort; releasing twice is harmless
+                    cv2.destroyAllWindows()
+                    return None
+            return webcam, {name: future.result() for name, future in futures.items()}
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)  # Loaders that have not started yet never run
@@ -0,0 +1,132 @@
+# Performs the OS-level window actions in screen coordinates. WindowManager decides what to do and the
+# backend does it: with pyautogui and AppKit on macOS, or by recording the commands in memory so actuation
+# can be checked on machines without a window server
+# Components: ActuationBackend, MacOSBackend, InMemoryBackend
+
+import time
+from model.window_geometry import FakeWindowServer, QuartzWindowServer
+
+class ActuationBackend:
+    '''
+    Interface of the actuation backends. Each backend also exposes the window server its window geometry is read from
+    '''
+    window_server = None  # WindowServer the window geometry is read from
+
+    def screen_size(self):
+        '''Returns the screen (width, height) in pixels'''
+        raise NotImplementedError
+
+    def pickup(self, x, y):
+        '''Presses the mouse button at a screen position, e.g. on a window title bar'''
+        raise NotImplementedError
+
+    def drag(self, x, y):
+        '''Moves the cursor, and the window held by it, to a screen position'''
+        raise NotImplementedError
+
+    def drop(self):
+        '''Releases the mouse button'''
+        raise NotImplementedError
+
+    def minimize(self):
+        '''Minimizes the frontmost application'''
+        raise NotImplementedError
+
+    def close(self):
+        '''Closes the frontmost window'''
+        raise NotImplementedError
+
+    def full_screen(self):
+        '''Toggles the frontmost window to full screen'''
+        raise NotImplementedError
+
+
+class MacOSBackend(ActuationBackend):
+    def __init__(self, close_hotkey=('command', 'w'), full_screen_hotkey=('fn', 'f'), pickup_settle_time=0.1):
+        '''
+        Initializes the MacOSBackend. pyautogui and AppKit are imported here, so that importing this
+        module does not require them
+
+        Args:
+            close_hotkey (tuple): Keys pressed to close the frontmost window
+            full_screen_hotkey (tuple): Keys pressed to toggle full screen
+            pickup_settle_time (float): Time in seconds between moving the cursor onto the title bar and pressing, so
+                the window server sees the move before the press. Only blocks the actuation worker
+        '''
+        import pyautogui
+        from AppKit import NSRunningApplication, NSWorkspace
+        self.pyautogui = pyautogui
+        self.running_application = NSRunningApplication
+        self.workspace = NSWorkspace.sharedWorkspace()
+        self.window_server = QuartzWindowServer()
+        self.close_hotkey = tuple(close_hotkey)
+        self.full_screen_hotkey = tuple(full_screen_hotkey)
+        self.pickup_settle_time = pickup_settle_time
+
+    def screen_size(self):
+        return tuple(self.pyautogui.size())
+
+    def pickup(self, x, y):
+        self.pyautogui.moveTo(x, y, _pause=False)  # Move the mouse to the center of the title bar
+        time.sleep(self.pickup_settle_time)  # Brief pause to ensure the move action completes, or the press may not start a drag
+        self.pyautogui.mouseDown(_pause=False)  # Press to pick up the window
+
+    def drag(self, x, y):
+        self.pyautogui.moveTo(x, y, _pause=False)  # Skip pyautogui's default pause after each call
+
+    def drop(self):
+        self.pyautogui.mouseUp(_pause=False)
+
+    def minimize(self):
+        active_application = self.workspace.frontmostApplication()  # Get the currently active (frontmost) application
+        if not active_application:
+            return  # Exit if there is no active application
+        application_reference = self.running_application.runningApplicationWithProcessIdentifier_(active_application.processIdentifier())  # Get a reference to the active application using its process identifier (PID)
+        application_reference.hide()  # Hide (minimize) the active application
+
+    def close(self):
+        self.pyautogui.hotkey(*self.close_hotkey, _pause=False)
+
+    def full_screen(self):
+        self.pyautogui.hotkey(*self.full_screen_hotkey, _pause=False)
+
+
+class InMemoryBackend(ActuationBackend):
+    def __init__(self, screen_size=(1920, 1080), window_server=None, clock=time.monotonic):
+        '''
+        Initializes the InMemoryBackend, which records every command instead of performing it
+
+        Args:
+            screen_size (tuple): Screen (width, height) in pixels reported to the window manager
+            window_server (WindowServer): Window server the window geometry is read from, defaults to an empty FakeWindowServer
+            clock (callable): Returns the time recorded with each command; pass a fake clock for deterministic timestamps
+        '''
+        self.size = tuple(screen_size)
+        self.window_server = window_server or FakeWindowServer()
+        self.clock = clock
+        self.commands = []  # Recorded (time, command name, arguments) tuples, in execution order
+
+    def record(self, command, *args):
+        '''Records a command with the current time'''
+        self.commands.append((self.clock(), command, args))
+
+    def screen_size(self):
+        return self.size
+
+    def pickup(self, x, y):
+        self.record('pickup', x, y)
+
+    def drag(self, x, y):
+        self.record('drag', x, y)
+
+    def drop(self):
+        self.record('drop')
+
+    def minimize(self):
+        self.record('minimize')
+
+    def close(self):
+        self.record('close')
+
+    def full_screen(self):
+        self.record('full_screen')
@@ -0,0 +1,58 @@
+# Turns the stream of index fingertip positions into a smooth, rate-limited stream of cursor moves
+# Components: DragMotion
+
+import numpy as np
+from utils.one_euro_filter import OneEuroFilter
+
+class DragMotion:
+    def __init__(self, screen_size, max_rate=60.0, dead_zone=3.0, min_cutoff=1.0, beta=0.007):
+        '''
+        Initializes the DragMotion
+
+        Args:
+            screen_size (tuple): Screen (width, height) in pixels, measured once by the caller
+            max_rate (float): Maximum number of cursor moves per second, None for no limit
+            dead_zone (float): Minimum distance in pixels from the last move for a new move to be issued
+            min_cutoff (float): One-Euro filter cutoff frequency in Hz when the hand is still
+            beta (float): One-Euro filter speed coefficient
+        '''
+        self.screen_size = np.asarray(screen_size, dtype=np.float64)
+        self.min_interval = 1.0 / max_rate if max_rate else 0.0  # Minimum time between two moves
+        self.dead_zone = dead_zone
+        self.filter = OneEuroFilter(min_cutoff=min_cutoff, beta=beta)
+        self.reset()
+
+    def reset(self):
+        '''Starts a new drag, forgetting the filter history and the last move'''
+        self.filter.reset()
+        self.last_position = None  # Last position sent to the cursor, in pixels
+        self.last_time = None  # Time of the last move
+        self.moves = 0  # Moves issued since the drag started
+        self.suppressed = 0  # Samples that did not produce a move since the drag started
+
+    def update(self, position, timestamp):
+        '''
+        Feeds a new fingertip position
+
+        Args:
+            position (numpy.ndarray): Normalized (x, y) fingertip position in the frame
+            timestamp (float): Time of the frame in seconds
+
+        Returns:
+            tuple: The (x, y) pixel position to move the cursor to, or None if no move is needed
+        '''
+        filtered = self.filter(np.asarray(position[:2], dtype=np.float64) * self.screen_size, timestamp)  # Filter in pixels
+
+        # Rate limit: skip samples that come sooner than the configured output rate allows
+        if self.last_time is not None and timestamp - self.last_time < self.min_interval:
+            self.suppressed += 1
+            return None
+        # Dead zone: skip moves smaller than the threshold, they are jitter rather than motion
+        if self.last_position is not None and np.hypot(*(filtered - self.last_position)) < self.dead_zone:
+            self.suppressed += 1
+            return None
+
+        self.last_position = filtered
+        self.last_time = timestamp
+        self.moves += 1
+        return int(round(filtered[0])), int(round(filtered[1]))
@@ -0,0 +1,238 @@
+# Learned alternative to the gesture threshold rules: a tiny NumPy multilayer perceptron over the 21 x 3
+# landmarks, translated to the wrist and divided by the palm size so that it does not depend on where the
+# hand is or how large it appears. Trained offline with tools/train_classifier.py, it returns a confidence
+# per gesture for a single hand or a batch of hands in one matrix product per layer
+# A classifier is stored as an .npz file:
+#   version                     format version
+#   classes                     (K,) class names, NO_GESTURE for an open hand performing no gesture
+#   feature_mean, feature_std   (63,) feature standardization, one shared scale
+#   hidden_weights, hidden_bias (63, H), (H,) first layer
+#   output_weights, output_bias (H, K), (K,) output layer
+#   min_confidence, exit_margin confidence a gesture needs to hold, and how far below it it must fall to be released
+# Components: GestureClassifier, landmark_features
+
+import numpy as np
+from model.hand_landmarks import NUM_LANDMARKS
+from utils.gesture_checks import PALM_LANDMARKS, as_points
+
+CLASSIFIER_FORMAT_VERSION = 1
+NO_GESTURE = ''  # Class of an open hand performing no gesture
+FEATURE_COUNT = NUM_LANDMARKS * 3  # x, y and z of every landmark
+
+def landmark_features(hand):
+    '''
+    Turns landmarks into classifier features: coordinates relative to the wrist, in palm units
+
+    Params:
+        hand (HandLandmarks or numpy.ndarray): A single hand or an (N, 21, 3) batch of hands
+
+    Returns:
+        numpy.ndarray: Features of shape (63,) or (N, 63), non-finite where the palm size is 0 or the hand is missing
+    '''
+    points = as_points(hand)
+    relative = points - points[..., PALM_LANDMARKS[0]:PALM_LANDMARKS[0] + 1, :]
+    palm = relative[..., PALM_LANDMARKS[1]:PALM_LANDMARKS[1] + 1, :]
+    palm_sizes = np.hypot(palm[..., 0:1], palm[..., 1:2])  # Same as palm_size, at a fraction of its overhead on a single hand
+    with np.errstate(divide='ignore', invalid='ignore'):
+        relative /= palm_sizes
+    return relative.reshape(points.shape[:-2] + (FEATURE_COUNT,))
+
+
+class GestureClassifier:
+    def __init__(self, classes, feature_mean, feature_std, hidden_weights, hidden_bias, output_weights, output_bias, min_confidence=0.6, exit_margin=0.2):
+        '''
+        Initializes the GestureClassifier from trained parameters
+
+        Params:
+            classes (list): Class names, NO_GESTURE for an open hand
+            feature_mean (numpy.ndarray): Mean of each feature over the training samples, of shape (63,)
+            feature_std (numpy.ndarray): Standard deviation of each feature over the training samples, of shape (63,)
+            hidden_weights (numpy.ndarray): First layer weights, of shape (63, H)
+            hidden_bias (numpy.ndarray): First layer bias, of shape (H,)
+            output_weights (numpy.ndarray): Output layer weights, of shape (H, K)
+            output_bias (numpy.ndarray): Output layer bias, of shape (K,)
+            min_confidence (float): Confidence above which a gesture holds
+            exit_margin (float): How far below min_confidence the confidence must fall for a held gesture to be released
+        '''
+        self.classes = [str(name) for name in classes]
+        # Standardization is folded into the first layer, so inference is two matrix products
+        scale = 1.0 / np.asarray(feature_std, dtype=np.float32)
+        self.feature_mean = np.asarray(feature_mean, dtype=np.float32)
+        self.feature_std = np.asarray(feature_std, dtype=np.float32)
+        self.hidden_weights = np.asarray(hidden_weights, dtype=np.float32)
+        self.hidden_bias = np.asarray(hidden_bias, dtype=np.float32)
+        self.output_weights = np.asarray(output_weights, dtype=np.float32)
+        self.output_bias = np.asarray(output_bias, dtype=np.float32)
+        self.folded_weights = self.hidden_weights * scale[:, None]
+        self.folded_bias = self.hidden_bias - (self.feature_mean * scale) @ self.hidden_weights
+        self.min_confidence = float(min_confidence)
+        self.exit_margin = float(exit_margin)
+
+    def predict_proba(self, hand):
+        '''
+        Computes the confidence of every class
+
+        Params:
+            hand (HandLandmarks or numpy.ndarray): A single hand or an (N, 21, 3) batch of hands
+
+        Returns:
+            numpy.ndarray: Confidences of shape (K,) or (N, K) ordered like self.classes, summing to 1. NaN for missing hands
+        '''
+        hidden = np.maximum(landmark_features(hand) @ self.folded_weights + self.folded_bias, 0.0)
+        logits = hidden @ self.output_weights + self.output_bias
+        logits -= logits.max(axis=-1, keepdims=True)  # Stable softmax
+        exponentials = np.exp(logits)
+        return exponentials / exponentials.sum(axis=-1, keepdims=True)
+
+    def predict(self, hand):
+        '''
+        Finds the most likely class of each hand
+
+        Params:
+            hand (HandLandmarks or numpy.ndarray): A single hand or an (N, 21, 3) batch of hands
+
+        Returns:
+            numpy.ndarray: Index into self.classes of the most likely class, a scalar or an array of N indices
+        '''
+        return np.argmax(self.predict_proba(hand), axis=-1)
+
+    def rule_columns(self, rules):
+        '''
+        Maps gesture rules to classes. A rule uses the class of its name; a rule that stops a drag uses the
+        open hand class, since opening the hand is what releases the window
+
+        Params:
+            rules (list): Gesture rules, in rule engine order
+
+        Returns:
+            numpy.ndarray: Index into self.classes of each rule
+
+        Raises:
+            ValueError: If the classifier was not trained on a gesture of the rules
+        '''
+        columns = []
+        for rule in rules:
+            name = NO_GESTURE if rule.drag == 'stop' else rule.name
+            if name not in self.classes:
+                raise ValueError(f"Gesture classifier has no class for gesture rule '{rule.name}'")
+            columns.append(self.classes.index(name))
+        return np.array(columns, dtype=np.intp)
+
+    def margins(self, hand, columns):
+        '''
+        Computes rule margins from the confidences, positive where a gesture holds, in the form the gesture
+        state machines take from GestureRuleEngine.evaluate
+
+        Params:
+            hand (HandLandmarks or numpy.ndarray): A single hand or an (N, 21, 3) batch of hands
+            columns (numpy.ndarray): Class of each rule, from rule_columns
+
+        Returns:
+            numpy.ndarray: Margins of shape (R,) or (N, R) ordered like the rules
+        '''
+        margins = self.predict_proba(hand)[..., columns] - self.min_confidence
+        return np.where(np.isnan(margins), -np.inf, margins)  # Missing hands never match
+
+    @classmethod
+    def train(cls, landmarks, labels, hidden_size=32, epochs=400, learning_rate=0.01, weight_decay=1e-4, mirror=True, seed=0, **options):
+        '''
+        Trains a classifier with full-batch Adam on a softmax cross entropy, weighting each class equally
+
+        Params:
+            landmarks (numpy.ndarray): Samples of shape (N, 21, 3), NaN on frames without a hand, which are skipped
+            labels (array-like): Class name of each sample, NO_GESTURE for an open hand
+            hidden_size (int): Number of hidden units
+            epochs (int): Number of passes over the samples
+            learning_rate (float): Adam step size
+            weight_decay (float): L2 penalty on the weights
+            mirror (bool): Whether to also train on every sample mirrored horizontally, so left and right hands are both recognized
+            seed (int): Seed of the weight initialization
+            options: min_confidence and exit_margin of the classifier
+
+        Returns:
+            GestureClassifier: The trained classifier
+        '''
+        features = landmark_features(landmarks)
+        labels = np.asarray(labels).astype(str)
+        usable = np.all(np.isfinite(features), axis=-1)
+        features, labels = features[usable], labels[usable]
+        if mirror:
+            mirrored = features.reshape(-1, NUM_LANDMARKS, 3).copy()
+            mirrored[..., 0] *= -1  # Relative to the wrist, mirroring only flips the sign of x
+            features = np.concatenate([features, mirrored.reshape(-1, FEATURE_COUNT)])
+            labels = np.concatenate([labels, labels])
+        classes, targets = np.unique(labels, return_inverse=True)
+        if len(classes) < 2:
+            raise ValueError("Training needs samples of at least two classes")
+
+        feature_mean = features.mean(axis=0)
+        # Every feature is in palm units already, so they share one scale: scaling each feature on its own would
+        # blow up the jitter of landmarks that barely move across gestures into as much signal as the thumb tip
+        feature_std = np.full(FEATURE_COUNT, features.std() + 1e-6)
+        inputs = (features - feature_mean) / feature_std
+        one_hot = np.eye(len(classes))[targets]
+        sample_weights = (1.0 / np.bincount(targets))[targets]
+        sample_weights /= sample_weights.sum()  # Every class weighs the same in the loss
+
+        rng = np.random.default_rng(seed)
+        parameters = [
+            rng.normal(0.0, np.sqrt(2.0 / FEATURE_COUNT), (FEATURE_COUNT, hidden_size)), np.zeros(hidden_size),
+            rng.normal(0.0, np.sqrt(2.0 / hidden_size), (hidden_size, len(classes))), np.zeros(len(classes)),
+        ]
+        first_moments = [np.zeros_like(parameter) for parameter in parameters]
+        second_moments = [np.zeros_like(parameter) for parameter in parameters]
+        beta1, beta2 = 0.9, 0.999
+        for step in range(1, epochs + 1):
+            hidden_weights, hidden_bias, output_weights, output_bias = parameters
+            pre_activation = inputs @ hidden_weights + hidden_bias
+            hidden = np.maximum(pre_activation, 0.0)
+            logits = hidden @ output_weights + output_bias
+            logits -= logits.max(axis=1, keepdims=True)
+            probabilities = np.exp(logits)
+            probabilities /= probabilities.sum(axis=1, keepdims=True)
+
+            # Backpropagation of the weighted cross entropy
+            output_gradient = (probabilities - one_hot) * sample_weights[:, None]
+            hidden_gradient = (output_gradient @ output_weights.T) * (pre_activation > 0)
+            gradients = [
+                inputs.T @ hidden_gradient + weight_decay * hidden_weights, hidden_gradient.sum(axis=0),
+                hidden.T @ output_gradient + weight_decay * output_weights, output_gradient.sum(axis=0),
+            ]
+            for parameter, gradient, first_moment, second_moment in zip(parameters, gradients, first_moments, second_moments):
+                first_moment *= beta1
+                first_moment += (1 - beta1) * gradient
+                second_moment *= beta2
+                second_moment += (1 - beta2) * gradient ** 2
+                parameter -= learning_rate * (first_moment / (1 - beta1 ** step)) / (np.sqrt(second_moment / (1 - beta2 ** step)) + 1e-8)
+
+        return cls(classes, feature_mean, feature_std, *parameters, **options)
+
+    def save(self, path):
+        '''Writes the classifier as an .npz file'''
+        np.savez(
+            path, version=CLASSIFIER_FORMAT_VERSION, classes=np.array(self.classes),
+            feature_mean=self.feature_mean, feature_std=self.feature_std,
+            hidden_weights=self.hidden_weights, hidden_bias=self.hidden_bias,
+            output_weights=self.output_weights, output_bias=self.output_bias,
+            min_confidence=self.min_confidence, exit_margin=self.exit_margin
+        )
+
+    @classmethod
+    def load(cls, path):
+        '''
+        Reads a classifier
+
+        Params:
+            path (str): Path of the .npz file
+
+        Returns:
+            GestureClassifier: The classifier
+        '''
+        with np.load(path) as data:
+            if int(data['version']) != CLASSIFIER_FORMAT_VERSION:
+                raise ValueError(f"Unsupported gesture classifier format version: {int(data['version'])}")
+            return cls(
+                data['classes'].tolist(), data['feature_mean'], data['feature_std'],
+                data['hidden_weights'], data['hidden_bias'], data['output_weights'], data['output_bias'],
+                min_confidence=float(data['min_confidence']), exit_margin=float(data['exit_margin'])
+            )
@@ -0,0 +1,84 @@
+# Holds the result of running hand detection once on a frame, so that the controller
+# and the view share a single inference and a single validation per frame
+# Components: HandDetection
+
+from model.hand_landmarks import HandLandmarks
+from utils.gesture_checks import is_valid_hand_position
+
+class HandDetection:
+    def __init__(self, landmarks, hand_landmark=None, is_valid_position=None):
+        '''
+        Initializes the HandDetection. The hand position is validated once, by the controller with its own
+        angle ranges, or with the default ranges when it is read first
+
+        Args:
+            landmarks (HandLandmarks): Detected hand landmarks as a (21, 3) array with handedness, score and timestamp
+            hand_landmark (mediapipe.framework.formats.landmark_pb2.NormalizedLandmarkList): Original mediapipe landmarks,
+                kept for drawing. None for detections that do not come from mediapipe, e.g. replayed sessions
+            is_valid_position (bool): Known outcome of the hand position checks, None to run them
+        '''
+        self.landmarks = landmarks  # (21, 3) array used by every check
+        self.hand_landmark = hand_landmark  # Detected hand landmarks, kept for drawing
+        self.track_id = None  # Stable identity of the hand across frames, assigned by HandTracker in multi-hand mode
+        self.valid_position = is_valid_position  # Outcome of the hand position checks, None until they run
+
+    def validate(self, angle_thresholds=None):
+        '''
+        Runs the hand position checks, and keeps the outcome for the view
+
+        Args:
+            angle_thresholds (numpy.ndarray): Valid angle ranges of the hand angle check, None for the defaults
+
+        Returns:
+            bool: True if the hand position is valid
+        '''
+        self.valid_position = bool(is_valid_hand_position(self.landmarks, angle_thresholds))
+        return self.valid_position
+
+    @property
+    def is_valid_position(self):
+        '''Outcome of the hand position checks, run with the default angle ranges if nobody validated the hand yet'''
+        if self.valid_position is None:
+            self.validate()
+        return self.valid_position
+
+    @classmethod
+    def from_mediapipe(cls, hand_landmark, handedness, score, timestamp=None):
+        '''
+        Creates a HandDetection from mediapipe output, converting the landmarks to NumPy once
+
+        Args:
+            hand_landmark (mediapipe.framework.formats.landmark_pb2.NormalizedLandmarkList): Detected hand landmarks
+            handedness (str): Handedness label reported by mediapipe ('Left' or 'Right')
+            score (float): Confidence score of the handedness classification
+            timestamp (float): Capture time of the frame
+
+        Returns:
+            HandDetection: The detection
+        '''
+        return cls(HandLandmarks.from_mediapipe(hand_landmark, handedness, score, timestamp), hand_landmark)
+
+    def mirrored(self):
+        '''
+        Mirrors the detection horizontally, for frames whose pixels were not flipped. The hand position checks
+        only use y coordinates and angles, which a mirror leaves unchanged, so a known outcome is kept. The mediapipe
+        landmarks are not mirrored and are dropped, so the result cannot be drawn
+
+        Returns:
+            HandDetection: The mirrored detection, with the same track id
+        '''
+        detection = HandDetection(self.landmarks.mirrored(), is_valid_position=self.valid_position)
+        detection.track_id = self.track_id
+        return detection
+
+    @property
+    def handedness(self):
+        return self.landmarks.handedness
+
+    @property
+    def score(self):
+        return self.landmarks.score
+
+    @property
+    def timestamp(self):
+        return self.landmarks.timestamp
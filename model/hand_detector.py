@@ -2,43 +2,214 @@
 # Components: HandDetector
 
 import cv2
-import mediapipe as mp
+import numpy as np
+import time
+from model.hand_detection import HandDetection
+from model.hand_tracker import HandTracker
+from utils.frame_ring import reusable_buffer
+from utils.instrumentation import get_logger
+
+logger = get_logger(__name__)
 
 class HandDetector:
-    def __init__(self, min_detection_confidence=0.9, min_tracking_confidence=0.5):
+    def __init__(self, min_detection_confidence=0.9, min_tracking_confidence=0.5, roi_tracking=True, roi_padding=0.3, roi_size=256, max_num_hands=2):
         '''
         Initializes the HandDetector with specified confidence thresholds
-        
+
         Args:
             min_detection_confidence (float): Minimum confidence value for hand detection
             min_tracking_confidence (float): Minimum confidence value for hand tracking
+            roi_tracking (bool): Whether to run detection on a crop around the previously detected hand
+            roi_padding (float): Padding added on each side of the hand bounding box, relative to its largest side
+            roi_size (int): Side in pixels the region of interest is resized to before detection
+            max_num_hands (int): Maximum number of hands detected on a full frame
         '''
-        self.hands = mp.solutions.hands.Hands(min_detection_confidence=min_detection_confidence, min_tracking_confidence=min_tracking_confidence)  # Initialize the mediapipe hands module with confidence thresholds
-        self.drawing_utils = mp.solutions.drawing_utils  # Utility for drawing hand landmarks
+        import mediapipe as mp  # Imported here, it is the slowest import of the app and is loaded on a startup worker thread
+        self.hands = mp.solutions.hands.Hands(max_num_hands=max_num_hands, min_detection_confidence=min_detection_confidence, min_tracking_confidence=min_tracking_confidence)  # Initialize the mediapipe hands module with confidence thresholds
         self.min_detection_confidence = min_detection_confidence  # Store the minimum detection confidence
-        self.previous_hand_position = (0, 0)  # Initialize the previous hand position
+        self.roi_tracking = roi_tracking
+        self.roi_padding = roi_padding
+        self.roi_size = roi_size
+        # Crops move from frame to frame, so they get their own mediapipe instance to keep its internal tracking consistent
+        self.roi_hands = mp.solutions.hands.Hands(max_num_hands=1, min_detection_confidence=min_detection_confidence, min_tracking_confidence=min_tracking_confidence) if roi_tracking else None
+        self.previous_hand_position = None  # Normalized (x_min, y_min, x_max, y_max) box of the previously detected hand, None when not tracking
+        self.hand_tracker = HandTracker()  # Keeps the identity of each hand in multi-hand mode
+        self.rgb_frame = None  # Reused RGB copy of the full frame handed to mediapipe
+        self.roi_frame = None  # Reused downscaled crop around the tracked hand
+        self.rgb_roi_frame = None  # Reused RGB copy of the crop
+
+    def warm_up(self, width=640, height=480):
+        '''
+        Runs the models once on blank images, so the first camera frame does not pay for their initialization
+
+        Args:
+            width (int): Width of the blank frame in pixels
+            height (int): Height of the blank frame in pixels
+        '''
+        self.hands.process(np.zeros((height, width, 3), dtype=np.uint8))
+        if self.roi_hands is not None:
+            self.roi_hands.process(np.zeros((self.roi_size, self.roi_size, 3), dtype=np.uint8))
 
     def detect_single_hand(self, image):
         '''
-        Detects a single hand in the provided image
-        
+        Detects a single hand in the provided image. Runs once per frame; the returned
+        detection is shared by the controller and the view. While a hand is tracked, only a padded,
+        downscaled crop around its previous position is processed; the full frame is used
+        when no hand is tracked or the hand is lost from the crop
+
+        Args:
+            image (numpy.ndarray): The input image in which to detect hands (BGR format)
+
+        Returns:
+            HandDetection: The detected hand if confidence score is sufficient, else None
+        '''
+        logger.debug("Detecting hands...")  # Debug: Log hand detection function being called
+        timestamp = time.time()
+        detection = None
+        region = self.get_tracking_region(image.shape[1], image.shape[0])
+        if region is not None:
+            detection = self.detect_in_region(image, region, timestamp)
+            if detection is None:
+                logger.debug("Hand lost from the tracking region, falling back to the full frame")  # Debug: log tracking loss
+        if detection is None:
+            detection = self.find_hand(self.hands.process(self.to_rgb(image)), timestamp)  # Process the image using the mediapipe hands module
+
+        self.previous_hand_position = self.get_hand_box(detection) if (detection and self.roi_tracking) else None
+        return detection
+
+    def detect_hands(self, image):
+        '''
+        Detects every hand in the provided image on the full frame and gives each a stable track id.
+        Used in multi-hand mode, where the single-hand region of interest does not apply
+
+        Args:
+            image (numpy.ndarray): The input image in which to detect hands (BGR format)
+
+        Returns:
+            list: HandDetection of every hand with a sufficient confidence score, with track_id set
+        '''
+        timestamp = time.time()
+        detections = self.find_hands(self.hands.process(self.to_rgb(image)), timestamp)
+        logger.debug("Detected %d hands", len(detections))  # Debug: log the number of hands
+        return self.hand_tracker.update(detections, timestamp)
+
+    def to_rgb(self, image):
+        '''
+        Converts the full frame from BGR to RGB into a buffer reused across frames. mediapipe copies its
+        input, so the buffer can be overwritten by the next frame
+
+        Args:
+            image (numpy.ndarray): The input image (BGR format)
+
+        Returns:
+            numpy.ndarray: The image in RGB format
+        '''
+        self.rgb_frame = reusable_buffer(self.rgb_frame, image.shape)
+        return cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=self.rgb_frame)
+
+    def find_hands(self, output, timestamp):
+        '''
+        Picks every hand with a sufficient confidence score from the mediapipe output
+
         Args:
-            image (numpy.ndarray): The input image in which to detect hands
-        
+            output: Result of mediapipe Hands.process
+            timestamp (float): Capture time of the frame
+
+        Returns:
+            list: HandDetection of every hand with a sufficient confidence score, in mediapipe order
+        '''
+        detections = []
+        if not (output.multi_hand_landmarks and output.multi_handedness):
+            return detections
+        # multi_handedness is parallel to multi_hand_landmarks: each hand must read its own classification
+        for hand_landmark, hand_handedness in zip(output.multi_hand_landmarks, output.multi_handedness):
+            if not hand_landmark.landmark:
+                continue
+            classification = hand_handedness.classification[0]
+            confidence_score = classification.score  # Get the confidence score of the detected hand
+            if confidence_score >= self.min_detection_confidence:
+                logger.debug("Confidence score reached: %s, Handedness: %s", confidence_score, classification.label)  # Debug: Log confidence score and handedness
+                detections.append(HandDetection.from_mediapipe(hand_landmark, classification.label, confidence_score, timestamp))
+        return detections
+
+    def find_hand(self, output, timestamp):
+        '''
+        Picks the first hand with a sufficient confidence score from the mediapipe output
+
+        Args:
+            output: Result of mediapipe Hands.process
+            timestamp (float): Capture time of the frame
+
+        Returns:
+            HandDetection: The detected hand if confidence score is sufficient, else None
+        '''
+        detections = self.find_hands(output, timestamp)
+        return detections[0] if detections else None  # Return None if no hands are detected with sufficient confidence
+
+    def get_hand_box(self, detection):
+        '''
+        Computes the normalized bounding box of a detected hand
+
+        Args:
+            detection (HandDetection): The detected hand
+
+        Returns:
+            tuple: Normalized (x_min, y_min, x_max, y_max) box around the landmarks
+        '''
+        points = detection.landmarks.points
+        x_min, y_min = points[:, :2].min(axis=0)
+        x_max, y_max = points[:, :2].max(axis=0)
+        return float(x_min), float(y_min), float(x_max), float(y_max)
+
+    def get_tracking_region(self, width, height):
+        '''
+        Computes the square crop, in pixels, around the previously detected hand
+
+        Args:
+            width (int): Width of the frame in pixels
+            height (int): Height of the frame in pixels
+
+        Returns:
+            tuple: Pixel (left, top, right, bottom) crop clamped to the frame, or None if no hand is tracked
+        '''
+        if self.previous_hand_position is None:
+            return None
+        x_min, y_min, x_max, y_max = self.previous_hand_position
+        center_x = (x_min + x_max) / 2 * width
+        center_y = (y_min + y_max) / 2 * height
+        side = max((x_max - x_min) * width, (y_max - y_min) * height) * (1 + 2 * self.roi_padding)
+        side = int(min(side, width, height))  # A square crop cannot be larger than the frame
+        if side <= 0:
+            return None
+        left = int(np.clip(center_x - side / 2, 0, width - side))
+        top = int(np.clip(center_y - side / 2, 0, height - side))
+        return left, top, left + side, top + side
+
+    def detect_in_region(self, image, region, timestamp):
+        '''
+        Detects the hand in a crop of the image and maps its landmarks back to full-frame normalized coordinates
+
+        Args:
+            image (numpy.ndarray): The full input image (BGR format)
+            region (tuple): Pixel (left, top, right, bottom) crop
+            timestamp (float): Capture time of the frame
+
         Returns:
-            hand_landmark: The detected hand landmark if confidence score is sufficient, else None
+            HandDetection: The detected hand in full-frame coordinates, or None if it was not found in the crop
         '''
-        print("Detecting hands...")  # Debug: Log hand detection function being called
-        rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)  # Convert the image from BGR to RGB
-        output = self.hands.process(rgb_image)  # Process the image using the mediapipe hands module
-        hand_landmarks = output.multi_hand_landmarks  # Get the detected hand landmarks
+        left, top, right, bottom = region
+        height, width = image.shape[:2]
+        self.roi_frame = reusable_buffer(self.roi_frame, (self.roi_size, self.roi_size) + image.shape[2:])
+        self.rgb_roi_frame = reusable_buffer(self.rgb_roi_frame, self.roi_frame.shape)
+        crop = cv2.resize(image[top:bottom, left:right], (self.roi_size, self.roi_size), dst=self.roi_frame, interpolation=cv2.INTER_AREA)  # Downscale the crop to a fixed input size
+        rgb_crop = cv2.cvtColor(crop, cv2.COLOR_BGR2RGB, dst=self.rgb_roi_frame)  # Convert only the small crop from BGR to RGB
+        output = self.roi_hands.process(rgb_crop)
 
-        # Ensure that 'detect_single_hand' returns a single hand landmark
-        if hand_landmarks:
-            for hand_landmark in hand_landmarks:
-                if hand_landmark.landmark and output.multi_handedness:
-                    confidence_score = output.multi_handedness[0].classification[0].score  # Get the confidence score of the detected hand
-                    if confidence_score >= self.min_detection_confidence:
-                        print(f"Confidence score reached: {confidence_score}, Handedness: {output.multi_handedness[0].classification[0].label}")  # Debug: Log confidence score and handedness
-                        return hand_landmark  # Return the first detected hand with sufficient confidence
-        return None  # Return None if no hands are detected with sufficient confidence
+        if output.multi_hand_landmarks:
+            side = right - left
+            for hand_landmark in output.multi_hand_landmarks:
+                for landmark in hand_landmark.landmark:  # Map crop-normalized coordinates back to the full frame
+                    landmark.x = (left + landmark.x * side) / width
+                    landmark.y = (top + landmark.y * side) / height
+                    landmark.z = landmark.z * side / width  # z uses the same scale as x
+        return self.find_hand(output, timestamp)
@@ -0,0 +1,61 @@
+# Gives each hand in view a stable identity across frames, so that two hands keep their own gesture state
+# even when mediapipe lists them in a different order from one frame to the next
+# Components: HandTracker
+
+import numpy as np
+
+class HandTracker:
+    def __init__(self, max_distance=0.2, max_missing=0.5):
+        '''
+        Initializes the HandTracker. Detections are associated with tracks by nearest landmarks: the cost of a
+        pair is the mean distance between their 21 (x, y) landmarks, and the cheapest pairs are matched first
+
+        Args:
+            max_distance (float): Largest mean landmark distance, in normalized coordinates, for a detection to continue a track
+            max_missing (float): Time in seconds a track is kept without a matching detection
+        '''
+        self.max_distance = max_distance
+        self.max_missing = max_missing
+        self.tracks = {}  # Track id -> (landmarks of shape (21, 2), time last seen)
+        self.next_track_id = 0
+
+    def update(self, detections, timestamp):
+        '''
+        Assigns a track id to each detection of a frame, continuing the nearest track or starting a new one
+
+        Args:
+            detections (list): HandDetection of every hand found in the frame; their track_id is set in place
+            timestamp (float): Capture time of the frame
+
+        Returns:
+            list: The same detections
+        '''
+        self.tracks = {track_id: track for track_id, track in self.tracks.items() if timestamp - track[1] <= self.max_missing}
+        assigned = [None] * len(detections)
+
+        if detections and self.tracks:
+            track_ids = list(self.tracks)
+            previous = np.stack([self.tracks[track_id][0] for track_id in track_ids])  # (T, 21, 2)
+            current = np.stack([detection.landmarks.points[:, :2] for detection in detections])  # (D, 21, 2)
+            costs = np.linalg.norm(previous[:, None] - current[None], axis=-1).mean(axis=-1)  # (T, D) mean landmark distance
+            used_tracks = set()
+            for flat_index in np.argsort(costs, axis=None):  # Cheapest pairs first
+                track_index, detection_index = divmod(int(flat_index), len(detections))
+                if costs[track_index, detection_index] > self.max_distance:
+                    break  # Every remaining pair is further apart
+                if track_index in used_tracks or assigned[detection_index] is not None:
+                    continue
+                used_tracks.add(track_index)
+                assigned[detection_index] = track_ids[track_index]
+
+        for detection, track_id in zip(detections, assigned):
+            if track_id is None:
+                track_id = self.next_track_id  # No track close enough, a new hand entered the view
+                self.next_track_id += 1
+            detection.track_id = track_id
+            self.tracks[track_id] = (detection.landmarks.points[:, :2].copy(), timestamp)
+        return detections
+
+    def reset(self):
+        '''Forgets every track'''
+        self.tracks = {}
@@ -0,0 +1,257 @@
+# Runs hand detection for several video streams on a pool of worker processes, so that inference on
+# different streams uses different cores. Frames are handed to the workers through shared memory instead
+# of being pickled: each stream owns one shared frame buffer that its worker reads in place, and only the
+# small landmark arrays travel back through a queue
+# Each stream is pinned to one worker, which keeps that stream's HandDetector: mediapipe and the region of
+# interest tracking follow a hand from frame to frame, so frames of different streams must never share a detector
+# Components: InferencePool, RemoteHandDetector, create_hand_detector
+
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import os
+import queue
+import time
+import numpy as np
+from model.hand_detection import HandDetection
+from model.hand_landmarks import HandLandmarks
+from utils.instrumentation import get_logger
+
+logger = get_logger(__name__)
+
+def create_hand_detector(**options):
+    '''
+    Builds and warms up the HandDetector of a stream inside a worker process
+
+    Args:
+        options: Keyword arguments of HandDetector
+
+    Returns:
+        HandDetector: The detector
+    '''
+    from model.hand_detector import HandDetector  # Imported in the worker, where mediapipe is loaded
+    hand_detector = HandDetector(**options)
+    hand_detector.warm_up()
+    return hand_detector
+
+def _worker_main(stream_ids, detector_factory, tasks, results, ready):
+    '''
+    Runs in a worker process: detects the hands on the frames of its streams until it receives None
+
+    Args:
+        stream_ids (list): Streams pinned to this worker
+        detector_factory (callable): Builds the HandDetector of a stream
+        tasks (multiprocessing.Queue): (stream id, sequence number, shared memory name, frame shape, multi hand) tuples
+        results (dict): Stream id -> multiprocessing.Queue receiving the (sequence number, detections, error) of each frame
+        ready (multiprocessing.Queue): Receives the process id once every detector is loaded
+    '''
+    hand_detectors = {stream_id: detector_factory() for stream_id in stream_ids}
+    buffers = {}  # Stream id -> attached SharedMemory
+    ready.put(os.getpid())
+    try:
+        for stream_id, sequence, name, shape, multi_hand in iter(tasks.get, None):
+            try:
+                shared_frame = buffers.get(stream_id)
+                if shared_frame is None or shared_frame.name != name:  # The stream reallocated its buffer for a larger frame
+                    if shared_frame is not None:
+                        shared_frame.close()
+                    shared_frame = buffers[stream_id] = shared_memory.SharedMemory(name=name)
+                frame = np.ndarray(shape, dtype=np.uint8, buffer=shared_frame.buf)  # Read in place, without a copy
+                if multi_hand:
+                    detections = hand_detectors[stream_id].detect_hands(frame)
+                else:
+                    detection = hand_detectors[stream_id].detect_single_hand(frame)
+                    detections = [detection] if detection else []
+                del frame  # The buffer cannot be closed while a view of it exists
+                results[stream_id].put((sequence, [
+                    (detection.landmarks.points, detection.handedness, detection.score, detection.timestamp, detection.track_id)
+                    for detection in detections
+                ], None))
+            except Exception as e:
+                results[stream_id].put((sequence, [], repr(e)))  # Reported by the stream, the worker keeps serving its other streams
+    finally:
+        for shared_frame in buffers.values():
+            shared_frame.close()
+
+
+class InferencePool:
+    def __init__(self, stream_count, workers=None, detector_factory=create_hand_detector, start_timeout=60.0):
+        '''
+        Initializes the InferencePool. Streams are pinned to workers round robin
+
+        Args:
+            stream_count (int): Number of streams served by the pool
+            workers (int): Number of worker processes, defaults to one per stream up to the number of cores
+            detector_factory (callable): Picklable callable building the HandDetector of a stream in a worker,
+                e.g. functools.partial(create_hand_detector, max_num_hands=4)
+            start_timeout (float): Time in seconds to wait for every worker to load its detectors
+        '''
+        self.stream_count = stream_count
+        self.workers = max(1, min(workers or os.cpu_count() or 1, stream_count))  # More workers than streams would stay idle
+        self.detector_factory = detector_factory
+        self.start_timeout = start_timeout
+        self.context = mp.get_context('spawn')  # Forking a process that already runs threads and mediapipe is unsafe
+        self.task_queues = [self.context.Queue() for _ in range(self.workers)]  # Frames waiting for each worker
+        self.result_queues = {stream_id: self.context.Queue() for stream_id in range(stream_count)}  # Detections of each stream
+        self.processes = []
+
+    def worker_of(self, stream_id):
+        '''Returns the index of the worker a stream is pinned to'''
+        return stream_id % self.workers
+
+    def start(self):
+        '''
+        Starts the worker processes and waits until every detector is loaded
+
+        Raises:
+            RuntimeError: If a worker does not become ready in time
+        '''
+        ready = self.context.Queue()
+        for worker in range(self.workers):
+            stream_ids = [stream_id for stream_id in range(self.stream_count) if self.worker_of(stream_id) == worker]
+            process = self.context.Process(
+                target=_worker_main, name=f"inference-{worker}", daemon=True,
+                args=(stream_ids, self.detector_factory, self.task_queues[worker], self.result_queues, ready)
+            )
+            process.start()
+            self.processes.append(process)
+        deadline = time.monotonic() + self.start_timeout
+        started = 0
+        while started < len(self.processes):
+            try:
+                ready.get(timeout=0.5)
+                started += 1
+            except queue.Empty:
+                if time.monotonic() > deadline or not all(process.is_alive() for process in self.processes):  # A worker failed to load its detectors
+                    self.close()
+                    raise RuntimeError("Inference workers failed to start") from None
+        logger.info("Started %d inference workers for %d streams", self.workers, self.stream_count)  # Log the pool size
+
+    def submit(self, stream_id, sequence, name, shape, multi_hand):
+        '''
+        Queues a frame of a stream, already written to the stream's shared memory, on the stream's worker
+
+        Args:
+            stream_id (int): Index of the stream
+            sequence (int): Number of the frame in the stream, returned with its result
+            name (str): Name of the shared memory holding the frame
+            shape (tuple): Shape of the frame
+            multi_hand (bool): Whether to detect every hand instead of a single one
+        '''
+        self.task_queues[self.worker_of(stream_id)].put((stream_id, sequence, name, shape, multi_hand))
+
+    def result(self, stream_id, timeout=None):
+        '''
+        Waits for the next detections of a stream
+
+        Args:
+            stream_id (int): Index of the stream
+            timeout (float): Maximum time to wait in seconds, None to wait indefinitely
+
+        Returns:
+            tuple: (sequence number, list of (points, handedness, score, timestamp, track_id) tuples, error message or None)
+
+        Raises:
+            queue.Empty: If no result arrived in time
+        '''
+        return self.result_queues[stream_id].get(timeout=timeout)
+
+    def close(self, timeout=5.0):
+        '''
+        Stops the workers, terminating those that do not exit in time. Safe to call more than once
+
+        Args:
+            timeout (float): Time in seconds each worker is given to exit
+        '''
+        for task_queue in self.task_queues:
+            task_queue.put(None)
+        for process in self.processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self.processes = []
+
+
+class RemoteHandDetector:
+    def __init__(self, pool, stream_id, timeout=5.0):
+        '''
+        Initializes the RemoteHandDetector. It is used in place of a HandDetector for one stream and runs the
+        detection on the stream's worker of an InferencePool. Frames are copied once into a shared memory
+        buffer owned by the stream, and each call waits for its own result, so one frame per stream is in flight
+
+        Args:
+            pool (InferencePool): The started inference pool
+            stream_id (int): Index of the stream in the pool
+            timeout (float): Time in seconds to wait for a worker before the frame is counted as without a hand
+        '''
+        self.pool = pool
+        self.stream_id = stream_id
+        self.timeout = timeout
+        self.shared_frame = None  # SharedMemory the frames are written to, allocated for the first frame
+        self.frame_buffer = None  # View of the shared memory, reshaped for the current frame size
+        self.sequence = 0  # Number of the last frame sent, to discard the late result of a frame that timed out
+
+    def get_frame_buffer(self, image):
+        '''
+        Returns a view of the shared memory shaped like the image, allocating a larger block when needed
+
+        Args:
+            image (numpy.ndarray): The frame to send
+
+        Returns:
+            numpy.ndarray: View of the shared memory
+        '''
+        if self.frame_buffer is None or self.frame_buffer.shape != image.shape:
+            if self.shared_frame is None or self.shared_frame.size < image.nbytes:
+                self.close()
+                self.shared_frame = shared_memory.SharedMemory(create=True, size=image.nbytes)
+            self.frame_buffer = np.ndarray(image.shape, dtype=np.uint8, buffer=self.shared_frame.buf)
+        return self.frame_buffer
+
+    def detect(self, image, multi_hand):
+        '''
+        Sends a frame to the stream's worker and rebuilds the detections it returns
+
+        Args:
+            image (numpy.ndarray): The input image (BGR format)
+            multi_hand (bool): Whether to detect every hand instead of a single one
+
+        Returns:
+            list: HandDetection of every detected hand. The mediapipe landmark lists stay in the worker, so
+                hand_landmark is None
+        '''
+        frame_buffer = self.get_frame_buffer(image)
+        np.copyto(frame_buffer, image)
+        self.sequence += 1
+        self.pool.submit(self.stream_id, self.sequence, self.shared_frame.name, image.shape, multi_hand)
+        try:
+            sequence, results, error = self.pool.result(self.stream_id, self.timeout)
+            while sequence != self.sequence:  # Result of an earlier frame that timed out
+                sequence, results, error = self.pool.result(self.stream_id, self.timeout)
+        except queue.Empty:
+            logger.error("Stream %d: no result from its inference worker", self.stream_id)  # Log the lost frame
+            return []
+        if error:
+            logger.error("Stream %d: detection failed in the inference worker: %s", self.stream_id, error)  # Log the worker error
+        detections = []
+        for points, handedness, score, timestamp, track_id in results:
+            detection = HandDetection(HandLandmarks(points, handedness, score, timestamp))
+            detection.track_id = track_id
+            detections.append(detection)
+        return detections
+
+    def detect_single_hand(self, image):
+        detections = self.detect(image, multi_hand=False)
+        return detections[0] if detections else None
+
+    def detect_hands(self, image):
+        return self.detect(image, multi_hand=True)
+
+    def close(self):
+        '''
+        Frees the shared memory of the stream. Safe to call more than once
+        '''
+        self.frame_buffer = None  # The shared memory cannot be closed while a view of it exists
+        if self.shared_frame is not None:
+            self.shared_frame.close()
+            self.shared_frame.unlink()
+            self.shared_frame = None
@@ -0,0 +1,139 @@
+# Decides on which frames hand detection runs, so that a static scene without a hand does not keep a core busy
+# Components: InferenceScheduler
+
+from collections import deque
+import time
+import cv2
+import numpy as np
+from utils.frame_ring import reusable_buffer
+from utils.instrumentation import instrumentation
+
+class InferenceScheduler:
+    def __init__(self, hand_detector, idle_rate=2.0, active_rate=None, idle_after=2.0, motion_threshold=3.0, motion_size=(32, 24)):
+        '''
+        Initializes the InferenceScheduler. It is used in place of the HandDetector: it runs detection at the
+        active rate while a hand was seen recently or the scene moves, and drops to the idle rate otherwise
+
+        Args:
+            hand_detector (HandDetector): Instance of HandDetector that runs the actual inference
+            idle_rate (float): Detections per second while no hand has been seen and the scene is static
+            active_rate (float): Maximum detections per second while active, None to detect on every frame
+            idle_after (float): Time in seconds without a hand after which the scheduler goes idle
+            motion_threshold (float): Mean absolute difference of the downsampled grayscale frames (0-255) counted as motion
+            motion_size (tuple): (width, height) the frame is downsampled to before computing the motion score
+        '''
+        self.hand_detector = hand_detector
+        self.idle_interval = 1.0 / idle_rate
+        self.active_interval = 1.0 / active_rate if active_rate else 0.0
+        self.idle_after = idle_after
+        self.motion_threshold = motion_threshold
+        self.motion_size = motion_size
+
+        self.previous_small_frame = None  # Downsampled grayscale copy of the previous frame
+        self.small_frame = None  # Buffer the current frame is downsampled into, swapped with previous_small_frame after use
+        self.small_color_frame = None  # Buffer of the downsampled frame before grayscale conversion
+        self.difference = None  # Buffer of the absolute difference of the downsampled frames
+        self.last_inference_time = None  # Time detection last ran
+        self.last_hand_time = None  # Time a hand was last detected
+        self.last_detection = None  # Detection held on frames where inference is skipped
+        self.active = False  # Whether the scheduler currently runs at the active rate
+        self.motion_score = 0.0  # Motion score of the latest frame
+        self.frames = 0  # Frames seen
+        self.skipped = 0  # Frames on which inference was skipped
+        self.inference_times = deque()  # Times of the inferences in the last second
+
+    def compute_motion_score(self, frame):
+        '''
+        Computes how much the scene changed since the previous frame on a tiny grayscale copy of the frame
+
+        Args:
+            frame (numpy.ndarray): The input frame (BGR format)
+
+        Returns:
+            float: Mean absolute pixel difference between the downsampled frames
+        '''
+        width, height = self.motion_size
+        self.small_color_frame = reusable_buffer(self.small_color_frame, (height, width) + frame.shape[2:])
+        self.small_frame = reusable_buffer(self.small_frame, (height, width))
+        cv2.resize(frame, self.motion_size, dst=self.small_color_frame, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self.small_color_frame, cv2.COLOR_BGR2GRAY, dst=self.small_frame)
+        small_frame, previous_small_frame = self.small_frame, self.previous_small_frame
+        self.previous_small_frame, self.small_frame = small_frame, previous_small_frame  # The older buffer is reused for the next frame
+        if previous_small_frame is None:
+            return float('inf')  # First frame, always run detection
+        self.difference = reusable_buffer(self.difference, small_frame.shape)
+        return float(np.mean(cv2.absdiff(small_frame, previous_small_frame, dst=self.difference)))
+
+    def detect_single_hand(self, image):
+        '''
+        Runs hand detection on the frame if the schedule allows it, else holds the last detection
+
+        Args:
+            image (numpy.ndarray): The input image in which to detect hands (BGR format)
+
+        Returns:
+            HandDetection: The detected (or held) hand, else None
+        '''
+        return self.schedule(image, self.hand_detector.detect_single_hand, None)
+
+    def detect_hands(self, image):
+        '''
+        Runs multi-hand detection on the frame if the schedule allows it, else holds the last detections
+
+        Args:
+            image (numpy.ndarray): The input image in which to detect hands (BGR format)
+
+        Returns:
+            list: The detected (or held) hands, empty if there is none
+        '''
+        return self.schedule(image, self.hand_detector.detect_hands, [])
+
+    def schedule(self, image, detect, no_hand):
+        '''
+        Runs a detection function on the frame if the schedule allows it
+
+        Args:
+            image (numpy.ndarray): The input image (BGR format)
+            detect (callable): Detection method of the hand detector to run on the image
+            no_hand: Value returned when no hand is held, None or an empty list
+
+        Returns:
+            The result of detect, the held result of the last inference, or no_hand
+        '''
+        now = time.time()
+        self.frames += 1
+        self.motion_score = self.compute_motion_score(image)
+        hand_seen_recently = self.last_hand_time is not None and now - self.last_hand_time < self.idle_after
+        self.active = hand_seen_recently or self.motion_score >= self.motion_threshold
+        interval = self.active_interval if self.active else self.idle_interval
+
+        if self.last_inference_time is not None and now - self.last_inference_time < interval:
+            self.skipped += 1
+            instrumentation.count('inference_skipped')  # Exported with the statistics, so the skip ratio can be monitored live
+            return self.last_detection if hand_seen_recently else no_hand  # Hold the last landmarks between inferences
+
+        self.last_inference_time = now
+        instrumentation.count('inference_runs')
+        self.inference_times.append(now)
+        self.drop_old_inference_times(now)
+        detection = detect(image)
+        if detection:
+            self.last_hand_time = now
+        self.last_detection = detection
+        return detection
+
+    def drop_old_inference_times(self, now):
+        '''Forgets inferences older than one second'''
+        while self.inference_times and self.inference_times[0] <= now - 1.0:
+            self.inference_times.popleft()
+
+    @property
+    def current_rate(self):
+        '''Number of detections run during the last second'''
+        self.drop_old_inference_times(time.time())
+        return len(self.inference_times)
+
+    @property
+    def skip_ratio(self):
+        '''Fraction of frames on which detection was skipped'''
+        return self.skipped / self.frames if self.frames else 0.0
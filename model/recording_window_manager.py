@@ -0,0 +1,44 @@
+# No-op window manager that records the actions it receives instead of performing them, so the
+# controller can run on machines without a window server (e.g. headless Linux)
+# Components: RecordingWindowManager
+
+import time
+
+class RecordingWindowManager:
+    def __init__(self, clock=time.time):
+        '''
+        Initializes the RecordingWindowManager
+
+        Args:
+            clock (callable): Returns the time recorded with each action
+        '''
+        self.clock = clock
+        self.dragging = False  # Mirrors the dragging state of WindowManager
+        self.actions = []  # Recorded (time, action name, arguments) tuples
+
+    def record(self, action, *args):
+        '''Records an action with the current time'''
+        self.actions.append((self.clock(), action, args))
+
+    def close(self):
+        pass
+
+    def pickup_window(self):
+        self.record('pickup_window')
+        self.dragging = True
+
+    def drag_window(self, hand_landmarks):
+        self.record('drag_window', tuple(float(value) for value in hand_landmarks.points[8, :2]))  # Index finger tip (x, y)
+
+    def drop_window(self):
+        self.record('drop_window')
+        self.dragging = False
+
+    def minimize_frontmost_window(self):
+        self.record('minimize_frontmost_window')
+
+    def close_frontmost_window(self):
+        self.record('close_frontmost_window')
+
+    def full_screen_frontmost_window(self):
+        self.record('full_screen_frontmost_window')
@@ -0,0 +1,192 @@
+# Records and loads sessions of per-frame hand landmarks (and optionally compressed frames), so that
+# captured sessions can be replayed headlessly for regression tests and benchmarks
+# A session is a directory of .npy files that are memory-mapped on load:
+#   timestamps.npy   (N,) float64        capture time of each frame
+#   landmarks.npy    (N, 21, 3) float32  landmarks of the detected hand, NaN on frames without a hand
+#   scores.npy       (N,) float32        handedness confidence score, NaN on frames without a hand
+#   handedness.npy   (N,) int8           0 for 'Left', 1 for 'Right', -1 on frames without a hand
+#   frames.npy       (M,) uint8          optional, JPEG-encoded frames stored back to back
+#   frame_offsets.npy (N + 1,) int64     optional, start offset of each frame in frames.npy
+#   metadata.json                        format version, frame count and whether frames are stored
+# Components: SessionRecorder, Session
+
+import json
+import os
+import queue
+import threading
+import cv2
+import numpy as np
+from model.hand_detection import HandDetection
+from model.hand_landmarks import HandLandmarks, NUM_LANDMARKS
+from utils.frame_ring import FrameRing
+from utils.instrumentation import get_logger
+
+logger = get_logger(__name__)
+
+SESSION_FORMAT_VERSION = 1
+HANDEDNESS_LABELS = ['Left', 'Right']  # Index stored in handedness.npy
+_STOP = object()  # Ends the writer thread of a SessionRecorder
+
+class SessionRecorder:
+    def __init__(self, path, save_frames=False, jpeg_quality=80, max_pending_frames=32):
+        '''
+        Initializes the SessionRecorder. Frames are JPEG-encoded on a writer thread, so recording them only costs
+        the caller a copy of the frame
+
+        Args:
+            path (str): Directory the session is saved to
+            save_frames (bool): Whether to store JPEG-compressed frames alongside the landmarks
+            jpeg_quality (int): JPEG quality (0-100) of the stored frames
+            max_pending_frames (int): Frames waiting for the writer thread before add() waits for it to catch up
+        '''
+        self.path = path
+        self.save_frames = save_frames
+        self.jpeg_quality = jpeg_quality
+        self.timestamps = []  # Capture time of each frame
+        self.landmarks = []  # (21, 3) landmarks of each frame, NaN without a hand
+        self.scores = []  # Confidence score of each frame, NaN without a hand
+        self.handedness = []  # Handedness index of each frame, -1 without a hand
+        self.frames = []  # JPEG bytes of each frame, appended by the writer thread
+        self.frame_ring = FrameRing()  # Copies of the frames waiting to be encoded, reused once encoded
+        self.pending_frames = queue.Queue(max_pending_frames)  # Frame copies (or None without a frame) for the writer thread, ended by a stop marker
+        self.writer = None
+        if save_frames:
+            self.writer = threading.Thread(target=self._write_frames, name="session-writer", daemon=True)
+            self.writer.start()
+
+    def add(self, timestamp, detection, frame=None):
+        '''
+        Records one frame
+
+        Args:
+            timestamp (float): Capture time of the frame
+            detection (HandDetection): Detected hand, or None if no hand was found
+            frame (numpy.ndarray): The frame (BGR format), only stored when save_frames is set
+        '''
+        self.timestamps.append(timestamp)
+        if detection:
+            self.landmarks.append(detection.landmarks.points)
+            self.scores.append(np.nan if detection.score is None else detection.score)
+            self.handedness.append(HANDEDNESS_LABELS.index(detection.handedness) if detection.handedness in HANDEDNESS_LABELS else -1)
+        else:
+            self.landmarks.append(np.full((NUM_LANDMARKS, 3), np.nan, dtype=np.float32))
+            self.scores.append(np.nan)
+            self.handedness.append(-1)
+        if self.save_frames:
+            pending = None
+            if frame is not None:
+                pending = self.frame_ring.acquire(frame.shape)
+                np.copyto(pending, frame)  # The caller may reuse its buffer as soon as this returns
+            self.pending_frames.put(pending)
+
+    def _write_frames(self):
+        '''Encodes the recorded frames in order until the stop marker arrives'''
+        while True:
+            frame = self.pending_frames.get()
+            if frame is _STOP:
+                return
+            encoded = np.empty(0, np.uint8)  # Stored for frames without a frame or failing to encode, keeping frames aligned with the landmarks
+            if frame is not None:
+                try:
+                    encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])[1].ravel()
+                except Exception as e:
+                    logger.error("Error Encoding Frame: %s", e)  # Log the error and keep recording
+                self.frame_ring.release(frame)
+            self.frames.append(encoded)
+
+    def save(self):
+        '''
+        Writes the recorded frames to the session directory
+
+        Returns:
+            str: The session directory
+        '''
+        if self.writer is not None:
+            self.pending_frames.put(_STOP)
+            self.writer.join()  # Every frame is encoded
+            self.writer = None
+        os.makedirs(self.path, exist_ok=True)
+        count = len(self.timestamps)
+        np.save(os.path.join(self.path, 'timestamps.npy'), np.array(self.timestamps, dtype=np.float64))
+        np.save(os.path.join(self.path, 'landmarks.npy'), np.array(self.landmarks, dtype=np.float32).reshape(count, NUM_LANDMARKS, 3))
+        np.save(os.path.join(self.path, 'scores.npy'), np.array(self.scores, dtype=np.float32))
+        np.save(os.path.join(self.path, 'handedness.npy'), np.array(self.handedness, dtype=np.int8))
+        if self.save_frames:
+            offsets = np.zeros(count + 1, dtype=np.int64)
+            np.cumsum([len(frame) for frame in self.frames], out=offsets[1:])
+            np.save(os.path.join(self.path, 'frames.npy'), np.concatenate(self.frames) if self.frames else np.empty(0, np.uint8))
+            np.save(os.path.join(self.path, 'frame_offsets.npy'), offsets)
+        with open(os.path.join(self.path, 'metadata.json'), 'w') as file:
+            json.dump({'version': SESSION_FORMAT_VERSION, 'frame_count': count, 'has_frames': self.save_frames}, file)
+        logger.info("Session with %d frames saved to %s", count, self.path)  # Log saved session
+        return self.path
+
+
+class Session:
+    def __init__(self, path):
+        '''
+        Opens a recorded session. Arrays are memory-mapped, so opening is cheap and frames are read on demand
+
+        Args:
+            path (str): Directory of the session
+        '''
+        with open(os.path.join(path, 'metadata.json')) as file:
+            self.metadata = json.load(file)
+        if self.metadata.get('version') != SESSION_FORMAT_VERSION:
+            raise ValueError(f"Unsupported session format version: {self.metadata.get('version')}")
+        self.path = path
+        self.timestamps = np.load(os.path.join(path, 'timestamps.npy'), mmap_mode='r')
+        self.landmarks = np.load(os.path.join(path, 'landmarks.npy'), mmap_mode='r')
+        self.scores = np.load(os.path.join(path, 'scores.npy'), mmap_mode='r')
+        self.handedness = np.load(os.path.join(path, 'handedness.npy'), mmap_mode='r')
+        self.has_frames = self.metadata.get('has_frames', False)
+        if self.has_frames:
+            self.frames = np.load(os.path.join(path, 'frames.npy'), mmap_mode='r')
+            self.frame_offsets = np.load(os.path.join(path, 'frame_offsets.npy'), mmap_mode='r')
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @property
+    def has_hand(self):
+        '''Boolean array, True on frames where a hand was detected'''
+        return ~np.isnan(self.landmarks[:, 0, 0])
+
+    def detection(self, index):
+        '''
+        Rebuilds the detection of a frame
+
+        Args:
+            index (int): Index of the frame
+
+        Returns:
+            HandDetection: The detected hand, or None if no hand was found on that frame
+        '''
+        if np.isnan(self.landmarks[index, 0, 0]):
+            return None
+        handedness = int(self.handedness[index])
+        score = float(self.scores[index])
+        landmarks = HandLandmarks(
+            np.array(self.landmarks[index]),
+            HANDEDNESS_LABELS[handedness] if handedness >= 0 else None,
+            None if np.isnan(score) else score,
+            float(self.timestamps[index])
+        )
+        return HandDetection(landmarks)
+
+    def frame(self, index):
+        '''
+        Decodes the stored frame at an index
+
+        Args:
+            index (int): Index of the frame
+
+        Returns:
+            numpy.ndarray: The frame (BGR format), or None if the session stores no frames
+        '''
+        if not self.has_frames:
+            return None
+        start, end = self.frame_offsets[index], self.frame_offsets[index + 1]
+        if start == end:
+            return None
+        return cv2.imdecode(np.asarray(self.frames[start:end]), cv2.IMREAD_COLOR)
@@ -0,0 +1,98 @@
+# Feeds a recorded session to the GestureController deterministically, at the original speed or as fast as possible
+# Components: ReplaySource, SessionCapture, replay_session
+
+import time
+import numpy as np
+
+class ReplaySource:
+    def __init__(self, session, realtime=False, include_frames=False):
+        '''
+        Initializes the ReplaySource
+
+        Args:
+            session (Session): The recorded session to replay
+            realtime (bool): Whether to wait between frames to reproduce the original timing, else replay as fast as possible
+            include_frames (bool): Whether to decode the stored frames, when the session has them
+        '''
+        self.session = session
+        self.realtime = realtime
+        self.include_frames = include_frames
+        self.current_timestamp = None  # Recorded timestamp of the frame being replayed, usable as a deterministic clock
+
+    def __len__(self):
+        return len(self.session)
+
+    def __iter__(self):
+        '''
+        Yields each recorded frame in order
+
+        Yields:
+            tuple: (timestamp, frame, detection) where frame is None unless frames are included
+                and detection is None on frames without a hand
+        '''
+        start_time = time.perf_counter()
+        first_timestamp = float(self.session.timestamps[0]) if len(self.session) else 0.0
+        for index in range(len(self.session)):
+            timestamp = float(self.session.timestamps[index])
+            if self.realtime:
+                delay = (timestamp - first_timestamp) - (time.perf_counter() - start_time)
+                if delay > 0:
+                    time.sleep(delay)  # Wait until the frame is due
+            self.current_timestamp = timestamp
+            frame = self.session.frame(index) if self.include_frames else None
+            yield timestamp, frame, self.session.detection(index)
+
+
+class SessionCapture:
+    def __init__(self, session, realtime=True):
+        '''
+        Initializes the SessionCapture. It is used in place of a cv2.VideoCapture to feed the stored frames of a
+        session to a pipeline as if they came from a camera. Stored frames are already mirrored
+
+        Args:
+            session (Session): The recorded session, which must store its frames
+            realtime (bool): Whether to deliver frames at the original timing, as a camera would
+        '''
+        if not session.has_frames:
+            raise ValueError(f"Session {session.path} has no stored frames, record it with --record-frames")
+        self.frames = iter(ReplaySource(session, realtime=realtime, include_frames=True))
+
+    def read(self, image=None):
+        '''
+        Returns the next stored frame
+
+        Args:
+            image (numpy.ndarray): Buffer to copy the frame into if it has the frame's size, like cv2.VideoCapture.read
+
+        Returns:
+            tuple: (True, frame) like cv2.VideoCapture.read, or (False, None) at the end of the session
+        '''
+        for _, frame, _ in self.frames:
+            if frame is not None:  # Frames that failed to encode are skipped
+                if image is not None and image.shape == frame.shape:
+                    np.copyto(image, frame)
+                    return True, image
+                return True, frame
+        return False, None
+
+    def release(self):
+        self.frames = iter(())
+
+
+def replay_session(source, gesture_controller):
+    '''
+    Feeds every frame of a replay source to a GestureController using the recorded timestamps,
+    so that the same session always produces the same actions
+
+    Args:
+        source (ReplaySource): The replay source
+        gesture_controller (GestureController): The controller to feed
+
+    Returns:
+        int: Number of frames replayed
+    '''
+    count = 0
+    for timestamp, _, detection in source:
+        gesture_controller.process_gestures(detection, timestamp)
+        count += 1
+    return count
@@ -0,0 +1,215 @@
+# Keeps an index of on-screen window geometry so that picking up a window is a dictionary lookup instead
+# of a scan of the whole window list. The window list comes from a window server backend: Quartz on macOS,
+# or a pure-Python fake so the cache and its invalidation can run on any machine
+# Components: WindowServer, QuartzWindowServer, FakeWindowServer, WindowGeometryCache
+
+import threading
+import time
+from utils.instrumentation import get_logger, instrumentation
+
+logger = get_logger(__name__)
+
+class WindowServer:
+    '''
+    Interface of the window server backends. Windows are (owner pid, layer, (x, y, width, height)) tuples
+    in front-to-back order
+    '''
+    def list_windows(self):
+        '''Returns the on-screen windows, frontmost first'''
+        raise NotImplementedError
+
+    def frontmost_pid(self):
+        '''Returns the process identifier of the frontmost application, or None if there is none'''
+        raise NotImplementedError
+
+
+class QuartzWindowServer(WindowServer):
+    def __init__(self):
+        '''
+        Initializes the QuartzWindowServer. The macOS frameworks are imported here, so that the module
+        can be imported on machines without them
+        '''
+        import AppKit
+        import Quartz
+        self.workspace = AppKit.NSWorkspace.sharedWorkspace()
+        self.quartz = Quartz
+
+    def list_windows(self):
+        window_list = self.quartz.CGWindowListCopyWindowInfo(self.quartz.kCGWindowListOptionOnScreenOnly, self.quartz.kCGNullWindowID)  # On-screen windows, front to back
+        windows = []
+        for window in window_list:
+            bounds = window['kCGWindowBounds']
+            windows.append((window['kCGWindowOwnerPID'], window['kCGWindowLayer'], (bounds['X'], bounds['Y'], bounds['Width'], bounds['Height'])))
+        return windows
+
+    def frontmost_pid(self):
+        active_application = self.workspace.frontmostApplication()  # Get the currently active (frontmost) application
+        return active_application.processIdentifier() if active_application else None
+
+
+class FakeWindowServer(WindowServer):
+    def __init__(self):
+        '''
+        Initializes the FakeWindowServer, an in-memory window server for tests and headless runs
+        '''
+        self.windows = []  # (pid, layer, bounds) tuples, frontmost first
+        self.focused_pid = None  # Pid of the frontmost application
+        self.list_calls = 0  # Number of window list scans, to check how often the cache refreshes
+
+    def add_window(self, pid, bounds, layer=0):
+        '''Opens a window in front of the others and focuses its application'''
+        self.windows.insert(0, (pid, layer, tuple(bounds)))
+        self.focused_pid = pid
+
+    def move_window(self, pid, bounds, layer=0):
+        '''Moves the frontmost window of an application'''
+        for index, (window_pid, window_layer, _) in enumerate(self.windows):
+            if (window_pid, window_layer) == (pid, layer):
+                self.windows[index] = (pid, layer, tuple(bounds))
+                return
+
+    def close_window(self, pid, layer=0):
+        '''Closes the frontmost window of an application'''
+        for index, (window_pid, window_layer, _) in enumerate(self.windows):
+            if (window_pid, window_layer) == (pid, layer):
+                del self.windows[index]
+                return
+
+    def focus(self, pid):
+        '''Brings an application to the front'''
+        self.focused_pid = pid
+
+    def list_windows(self):
+        self.list_calls += 1
+        return list(self.windows)
+
+    def frontmost_pid(self):
+        return self.focused_pid
+
+
+class WindowGeometryCache:
+    def __init__(self, window_server, ttl=1.0, refresh_interval=None, clock=time.monotonic):
+        '''
+        Initializes the WindowGeometryCache. The index maps (owner pid, layer) to the bounds of the frontmost
+        window of that application on that layer. It is rebuilt when older than the TTL, when the frontmost
+        application changes, or when invalidated after an action that closes or resizes a window. With a refresh
+        interval, a background thread rebuilds the index, and lookups only read it: they never scan the window list.
+        The frontmost application is always asked at lookup time, which is cheap, so a pickup right after an
+        application switch grabs the new application's window
+
+        Args:
+            window_server (WindowServer): Backend the window list is read from
+            ttl (float): Time in seconds after which the index is considered stale
+            refresh_interval (float): Time in seconds between two staleness checks on a background thread, which rebuilds
+                the index when it is stale. None to refresh on demand, on the thread of the lookup
+            clock (callable): Returns the current time in seconds
+        '''
+        self.window_server = window_server
+        self.ttl = ttl
+        self.refresh_interval = refresh_interval
+        self.clock = clock
+        self.windows = {}  # (pid, layer) -> (x, y, width, height), replaced as a whole so readers never see a partial index
+        self.refreshed_at = None  # Time of the last refresh, None when invalidated
+        self.focused_pid = None  # Frontmost application when the index was last checked
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def refresh(self):
+        '''Rebuilds the index from the window list'''
+        windows = {}
+        for pid, layer, bounds in self.window_server.list_windows():
+            windows.setdefault((pid, layer), bounds)  # The list is front to back, keep the frontmost window of each application
+        self.windows = windows
+        self.refreshed_at = self.clock()
+        instrumentation.count('window_list_scans')
+        logger.debug("Window geometry refreshed, %d windows", len(windows))  # Debug: log refresh
+
+    def update_window(self, pid, bounds, layer=0):
+        '''
+        Records the new bounds of a window moved by an action, keeping the rest of the index valid
+
+        Args:
+            pid (int): Process identifier of the window owner
+            bounds (tuple): New (x, y, width, height) of the window
+            layer (int): Window layer, 0 for normal windows
+        '''
+        windows = dict(self.windows)  # Replaced as a whole, like a refresh
+        windows[(pid, layer)] = tuple(bounds)
+        self.windows = windows
+
+    def invalidate(self):
+        '''Marks the index as stale, so the next lookup refreshes it'''
+        self.refreshed_at = None
+
+    def is_stale(self):
+        '''Returns True if the index was invalidated or is older than the TTL'''
+        return self.refreshed_at is None or self.clock() - self.refreshed_at > self.ttl
+
+    def check_focus(self):
+        '''
+        Invalidates the index if the frontmost application changed since the last check
+
+        Returns:
+            int: Process identifier of the frontmost application
+        '''
+        pid = self.window_server.frontmost_pid()
+        if pid != self.focused_pid:
+            self.focused_pid = pid
+            self.invalidate()
+        return pid
+
+    def lookup(self, pid, layer=0):
+        '''
+        Returns the bounds of the frontmost window of an application. Without a background thread, the index is
+        refreshed first if it is stale
+
+        Args:
+            pid (int): Process identifier of the window owner
+            layer (int): Window layer, 0 for normal windows
+
+        Returns:
+            tuple: (x, y, width, height) of the window, or None if the application has no window on that layer
+        '''
+        if self.thread is None and self.is_stale():
+            self.refresh()
+        return self.windows.get((pid, layer))
+
+    def frontmost_window(self, layer=0):
+        '''
+        Returns the bounds of the frontmost window of the frontmost application
+
+        Args:
+            layer (int): Window layer, 0 for normal windows
+
+        Returns:
+            tuple: (x, y, width, height) of the window, or None if there is none
+        '''
+        pid = self.check_focus()
+        if pid is None:
+            return None
+        return self.lookup(pid, layer)
+
+    def start(self):
+        '''Builds the index and starts refreshing it on a background thread, so lookups on the hot path never scan'''
+        if self.refresh_interval is None or self.thread is not None:
+            return
+        self.check_focus()
+        self.refresh()
+        self.thread = threading.Thread(target=self._run, name="window-geometry", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        '''Stops the background thread'''
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def _run(self):
+        while not self.stop_event.wait(self.refresh_interval):
+            try:
+                self.check_focus()  # Invalidates the index when the frontmost application changed
+                if self.is_stale():
+                    self.refresh()
+            except Exception as e:
+                logger.error("Error Refreshing Window Geometry: %s", e)  # Log any error and keep the thread alive
@@ -1,115 +1,169 @@
 # Manages the data logic and interactions with the data
 # Components: WindowManager
 
-import pyautogui
-from AppKit import NSWorkspace, NSRunningApplication
-from Quartz import CGWindowListCopyWindowInfo, kCGWindowListOptionOnScreenOnly, kCGNullWindowID
 import time
+from model.drag_motion import DragMotion
+from model.window_geometry import WindowGeometryCache
+from utils.instrumentation import get_logger
+
+logger = get_logger(__name__)
 
 class WindowManager:
-    def __init__(self):
+    def __init__(self, drag_rate=60.0, drag_dead_zone=3.0, backend=None, title_bar_height=22, geometry_ttl=1.0, geometry_refresh_interval=None):
+        '''
+        Initializes the WindowManager. It decides where and what to actuate; the backend performs the OS calls
+
+        Args:
+            drag_rate (float): Maximum number of cursor moves per second while dragging
+            drag_dead_zone (float): Minimum cursor displacement in pixels for a drag move to be sent
+            backend (ActuationBackend): Backend that performs the window commands, usually wrapped in an ActuationQueue
+                so they never block the caller. Defaults to the macOS backend, loaded on first use
+            title_bar_height (int): Height in pixels of the window title bar grabbed on pickup
+            geometry_ttl (float): Time in seconds the cached window geometry is trusted
+            geometry_refresh_interval (float): Time in seconds between two background focus checks of the window geometry,
+                None to check and refresh on demand on the calling thread
+        '''
         self.dragging = False  # Initialize dragging state to False
+        self.drag_rate = drag_rate
+        self.drag_dead_zone = drag_dead_zone
+        self.drag_motion = None  # Smooths and rate limits drag moves, created with the screen geometry on first use
+        if backend is None:
+            from model.actuation_backend import MacOSBackend  # Loaded lazily, it needs pyautogui and AppKit
+            backend = MacOSBackend()
+        self.backend = backend
+        self.title_bar_height = title_bar_height
+        self.held_window = None  # (owner pid, bounds, pickup position) of the window being dragged
+        self.drag_position = None  # Latest cursor position sent while dragging
+        self.window_geometry = WindowGeometryCache(backend.window_server, ttl=geometry_ttl, refresh_interval=geometry_refresh_interval)  # Index of window bounds by owner pid and layer
+        self.window_geometry.start()
+
+    def close(self):
+        '''
+        Stops the background refresh of the window geometry
+        '''
+        self.window_geometry.stop()
+
+    def get_drag_motion(self):
+        '''
+        Returns the drag motion filter, measuring the screen geometry only the first time
+
+        Returns:
+            DragMotion: The drag motion filter
+        '''
+        if self.drag_motion is None:
+            self.drag_motion = DragMotion(self.backend.screen_size(), max_rate=self.drag_rate, dead_zone=self.drag_dead_zone)  # Screen size is cached here
+        return self.drag_motion
+
+    def refresh_screen_geometry(self):
+        '''
+        Forgets the cached screen and window geometry, e.g. after a display change, so they are measured again on next use
+        '''
+        self.drag_motion = None
+        self.window_geometry.invalidate()
 
     def get_active_window_info(self):
         '''
-        Retrieves information about the currently active window
+        Retrieves the bounds of the currently active window from the window geometry cache
         
         Returns:
-            dict: Information about the active window if found, else None
+            tuple: (x, y, width, height) of the active window at layer 0 if found, else None
         '''
-        options = kCGWindowListOptionOnScreenOnly  # Option to list only on-screen windows
-        window_list = CGWindowListCopyWindowInfo(options, kCGNullWindowID)  # Retrieve the list of all on-screen windows
-        active_application = NSWorkspace.sharedWorkspace().frontmostApplication()  # Get the currently active (frontmost) application
-        active_application_pid = active_application.processIdentifier()  # Get the process identifier (PID) of the active application
-
-        for window in window_list:
-            if window['kCGWindowOwnerPID'] == active_application_pid and window['kCGWindowLayer'] == 0:
-                return window # Return the active window if it matches the PID and is at layer 0
-        return None # Return None if no matching window is found
+        return self.window_geometry.frontmost_window(layer=0)
 
     def pickup_window(self):
         '''
         Initiates the action to pick up (click and hold) the frontmost window for dragging
         '''
         try:
-            window_info = self.get_active_window_info()  # Retrieve information about the active window
+            window_info = self.get_active_window_info()  # Retrieve the bounds of the active window
             if not window_info:
                 return  # Exit if no active window information is available
 
-            window_left_edge = window_info['kCGWindowBounds']['X']  # Get the X coordinate of the window's left edge
-            window_top_edge = window_info['kCGWindowBounds']['Y']  # Get the Y coordinate of the window's top edge
-            window_width = window_info['kCGWindowBounds']['Width']  # Get the width of the window
-
-            estimated_title_bar_height = 22  # Estimate for the height of the window title bar
+            window_left_edge, window_top_edge, window_width, _ = window_info  # Window position and width
             center_x_of_window = window_left_edge + window_width // 2  # Calculate the X coordinate of the window's center
-            title_bar_center_y = window_top_edge + estimated_title_bar_height // 2  # Calculate the Y coordinate of the title bar's center
+            title_bar_center_y = window_top_edge + self.title_bar_height // 2  # Calculate the Y coordinate of the title bar's center
 
-            pyautogui.moveTo(center_x_of_window, title_bar_center_y)  # Move the mouse to the calculated center of the title bar
-            time.sleep(0.1)  # Brief pause to ensure the move action completes
-            pyautogui.mouseDown()  # Simulate mouse down action to pick up the window
-            print("Mouse down click")  # Debug: Log mouse down action
+            self.backend.pickup(center_x_of_window, title_bar_center_y)  # Press the mouse on the center of the title bar to pick up the window
+            self.held_window = (self.window_geometry.focused_pid, window_info, (center_x_of_window, title_bar_center_y))  # Pid read by this pickup's lookup
+            self.drag_position = None
+            logger.debug("Mouse down click")  # Debug: Log mouse down action
+            self.get_drag_motion().reset()  # Start the drag with a fresh filter
             self.dragging = True  # Set dragging state to True
-            print(f"Dragging state {self.dragging}")  # Debug: Log dragging state
+            logger.debug("Dragging state %s", self.dragging)  # Debug: Log dragging state
         except Exception as e:
-            print(f"Error Picking Up Window: {e}") # Debug: Log any error that occurs during pickup a window
+            logger.error("Error Picking Up Window: %s", e) # Log any error that occurs during pickup a window
 
-    def drag_window(self, hand_landmark):
+    def drag_window(self, hand_landmarks):
         '''
-        Drags the window based on the movement of the hand landmark.
+        Drags the window based on the movement of the hand landmark. The index fingertip is smoothed with a
+        One-Euro filter, and moves are rate limited and skipped when smaller than the dead zone
         
         Args:
-            hand_landmark: The detected hand landmarks used to calculate the new window position.
+            hand_landmarks (HandLandmarks): The detected hand landmarks used to calculate the new window position.
         '''
-        screen_width, screen_height = pyautogui.size()
-        index_finger_tip = hand_landmark.landmark[8]
         try:
-            if index_finger_tip is not None:
-                x = int(index_finger_tip.x * screen_width)
-                y = int(index_finger_tip.y * screen_height)
-                pyautogui.moveTo(x, y)
-                print("Dragging window")  # Debug: Log dragging window action
+            index_finger_tip = hand_landmarks.points[8]  # Index finger tip (x, y, z)
+            timestamp = hand_landmarks.timestamp if hand_landmarks.timestamp is not None else time.time()
+            position = self.get_drag_motion().update(index_finger_tip, timestamp)
+            if position is not None:
+                self.backend.drag(*position)
+                self.drag_position = position
+                logger.debug("Dragging window")  # Debug: Log dragging window action
         except Exception as e:
-            print(f"Error Dragging Window: {e}") # Debug: Log any error that occurs during dragging a window
+            logger.error("Error Dragging Window: %s", e) # Log any error that occurs during dragging a window
 
     def drop_window(self):
         '''
         Releases the click to drop the window at the current position
         '''
         try:
-            pyautogui.mouseUp() # Simulate mouse up action to drop the window
-            print("Mouse up release click")  # Debug: Log mouse up action
+            self.backend.drop() # Release the mouse to drop the window
+            self.move_held_window()  # The window moved with the cursor
+            logger.debug("Mouse up release click")  # Debug: Log mouse up action
             self.dragging = False  # Reset dragging state
-            print(f"Dragging state {self.dragging}")  # Debug: Logs dragging state false
+            logger.debug("Dragging state %s", self.dragging)  # Debug: Logs dragging state false
         except Exception as e:
-            print(f"Error Dropping Window: {e}") # Debug: Log any error that occurs during dropping a window
+            logger.error("Error Dropping Window: %s", e) # Log any error that occurs during dropping a window
+
+    def move_held_window(self):
+        '''
+        Moves the dropped window in the window geometry index by the cursor displacement since pickup, so the next
+        pickup finds it without scanning the window list again
+        '''
+        if self.held_window is None:
+            return
+        pid, (window_left_edge, window_top_edge, window_width, window_height), (pickup_x, pickup_y) = self.held_window
+        if self.drag_position is not None:
+            drop_x, drop_y = self.drag_position
+            self.window_geometry.update_window(pid, (window_left_edge + drop_x - pickup_x, window_top_edge + drop_y - pickup_y, window_width, window_height))
+        self.held_window = None
 
     def minimize_frontmost_window(self):
         '''
         Minimizes the frontmost window
         '''
         try:
-            active_application = NSWorkspace.sharedWorkspace().frontmostApplication() # Get the currently active (frontmost) application
-            if not active_application:
-                return # Exit if there is no active application
-            application_reference = NSRunningApplication.runningApplicationWithProcessIdentifier_(active_application.processIdentifier()) # Get a reference to the active application using its process identifier (PID)
-            application_reference.hide() # Hide (minimize) the active application
+            self.backend.minimize() # Hide (minimize) the active application
+            self.window_geometry.invalidate()  # Its windows left the screen
         except Exception as e:
-            print(f"Error Minimizing Window: {e}") # Debug: Log any error that occurs during minimization
+            logger.error("Error Minimizing Window: %s", e) # Log any error that occurs during minimization
 
     def close_frontmost_window(self):
         '''
         Closes the frontmost window
         '''
         try:
-            pyautogui.hotkey('command', 'w') # Simulate pressing 'command + w' to close the window
+            self.backend.close() # Close the frontmost window
+            self.window_geometry.invalidate()  # The window is gone
         except Exception as e:
-            print(f"Error Closing Window: {e}") # Debug: Log any error that occurs during window closing
+            logger.error("Error Closing Window: %s", e) # Log any error that occurs during window closing
 
     def full_screen_frontmost_window(self):
         '''
         Toggles the frontmost window to full screen
         '''
         try:
-            pyautogui.hotkey('fn', 'f') # Simulate pressing 'fn + f' to toggle full screen mode
+            self.backend.full_screen() # Toggle full screen mode
+            self.window_geometry.invalidate()  # The window was resized
         except Exception as e:
-            print(f"Error Entering Full Screen: {e}") # Debug: Log any error that occurs during full screen toggle
+            logger.error("Error Entering Full Screen: %s", e) # Log any error that occurs during full screen toggle
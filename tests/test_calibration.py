@@ -0,0 +1,34 @@
+# Tests that a calibration profile only changes the controllers it is given to
+# Components: test functions
+
+import numpy as np
+from controller.calibration import fit_profile
+from controller.gesture_controller import GestureController
+from model.hand_detection import HandDetection
+from model.hand_landmarks import HandLandmarks
+from model.recording_window_manager import RecordingWindowManager
+from tools.calibrate import synthetic_samples
+from tools.synthetic_hands import open_hand
+
+def strict_profile():
+    '''Returns a fitted profile whose angle ranges reject every hand'''
+    profile = fit_profile(*synthetic_samples())
+    profile['angle_thresholds'] = [[179.9, 180.0], [179.9, 180.0]]
+    return profile
+
+def test_profile_angle_ranges_only_apply_to_their_controller():
+    calibrated = GestureController(None, RecordingWindowManager(), profile=strict_profile())
+    default = GestureController(None, RecordingWindowManager())
+    calibrated_detection = HandDetection(HandLandmarks(open_hand(), 'Right', 1.0, 0.0))
+    default_detection = HandDetection(HandLandmarks(open_hand(), 'Right', 1.0, 0.0))
+    calibrated.process_gestures(calibrated_detection, 0.0)
+    default.process_gestures(default_detection, 0.0)
+    assert not calibrated_detection.is_valid_position
+    assert default_detection.is_valid_position
+    assert default.hands[0].valid_gesture_flag and not calibrated.hands[0].valid_gesture_flag
+
+def test_fit_profile_does_not_depend_on_earlier_profiles():
+    landmarks, labels = synthetic_samples()
+    before = fit_profile(landmarks, labels)
+    GestureController(None, RecordingWindowManager(), profile=strict_profile())
+    assert fit_profile(landmarks, labels) == before
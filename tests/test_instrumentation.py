@@ -0,0 +1,73 @@
+# Tests of the lock-free instrumentation ring buffer under concurrent writers
+# Components: test functions
+
+import sys
+import threading
+import numpy as np
+from utils.instrumentation import Instrumentation, StatsFlusher
+
+def test_concurrent_registration_gives_distinct_ids():
+    instrumentation = Instrumentation()
+    instrumentation.enable()
+    names = [f"counter_{index}" for index in range(200)]
+    barrier = threading.Barrier(8)
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # Switch threads as often as possible to interleave the registrations
+
+    def register():
+        barrier.wait()
+        for name in names:
+            instrumentation.count(name)
+
+    try:
+        threads = [threading.Thread(target=register) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(switch_interval)
+    assert sorted(instrumentation.metric_ids) == sorted(names)
+    assert [instrumentation.metric_ids[name] for name in instrumentation.metric_names] == list(range(len(names)))
+    assert StatsFlusher(instrumentation).snapshot()['counters'] == {name: 8 for name in names}
+
+def test_drains_every_event_once_while_writers_run():
+    instrumentation = Instrumentation(capacity=1 << 16)
+    instrumentation.enable()
+    flusher = StatsFlusher(instrumentation)
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # Switch threads as often as possible to interleave writers and the reader
+    writing = True
+
+    def write(name):
+        for _ in range(20000):
+            instrumentation.count(name)
+
+    def read():
+        while writing:
+            flusher.snapshot()
+
+    try:
+        writers = [threading.Thread(target=write, args=(name,)) for name in ('capture', 'inference', 'actuation')]
+        reader = threading.Thread(target=read)
+        reader.start()
+        for thread in writers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        writing = False
+        reader.join()
+    finally:
+        sys.setswitchinterval(switch_interval)
+    snapshot = flusher.snapshot()
+    assert snapshot['lost_events'] == 0
+    assert snapshot['counters'] == {'capture': 20000, 'inference': 20000, 'actuation': 20000}
+
+def test_overwritten_events_are_counted_as_lost():
+    instrumentation = Instrumentation(capacity=8)
+    instrumentation.enable()
+    for _ in range(20):
+        instrumentation.count('frames')
+    metrics, values, lost = instrumentation.drain()
+    assert (len(values), lost) == (8, 12)
+    assert len(instrumentation.drain()[1]) == 0
@@ -0,0 +1,86 @@
+# Tests of the actuation queue and the pipeline shutdown against the in-memory actuation backend
+# Components: SlowPickupBackend, StillCapture, NoHandDetector, test functions
+
+import itertools
+import time
+import numpy as np
+from controller.gesture_controller import GestureController
+from controller.pipeline import ActuationQueue, GesturePipeline
+from model.actuation_backend import InMemoryBackend
+from model.window_geometry import FakeWindowServer
+from model.window_manager import WindowManager
+
+class SlowPickupBackend(InMemoryBackend):
+    '''Backend whose pickup is still running when the pipeline is asked to stop'''
+    def pickup(self, x, y):
+        time.sleep(0.2)
+        super().pickup(x, y)
+
+
+class StillCapture:
+    '''Capture delivering black frames'''
+    def read(self, image=None):
+        time.sleep(0.01)
+        return True, np.zeros((48, 64, 3), np.uint8)
+
+    def release(self):
+        pass
+
+
+class NoHandDetector:
+    def detect_single_hand(self, frame):
+        return None
+
+
+def test_actuation_queue_runs_only_the_newest_of_consecutive_drags():
+    backend = InMemoryBackend(clock=itertools.count().__next__)  # Each command is stamped with its execution order
+    actuation_queue = ActuationQueue(backend)
+    actuation_queue.pickup(500, 11)
+    for x in (600, 700, 800):
+        actuation_queue.drag(x, 300)
+    actuation_queue.drop()
+    actuation_queue.drag(900, 300)  # A drag after another command is not merged into the earlier ones
+    while actuation_queue.execute_next(0):
+        pass
+    assert backend.commands == [(0, 'pickup', (500, 11)), (1, 'drag', (800, 300)), (2, 'drop', ()), (3, 'drag', (900, 300))]
+    assert actuation_queue.coalesced == 2
+
+def create_pipeline(backend):
+    actuation_queue = ActuationQueue(backend)
+    window_manager = WindowManager(backend=actuation_queue)
+    gesture_controller = GestureController(NoHandDetector(), window_manager)
+    pipeline = GesturePipeline(StillCapture(), NoHandDetector(), gesture_controller, actuation_queue, None)
+    return pipeline, window_manager, gesture_controller
+
+def test_stop_executes_pending_commands():
+    server = FakeWindowServer()
+    server.add_window(1, (0, 0, 800, 600))
+    backend = SlowPickupBackend(window_server=server)
+    pipeline, window_manager, _ = create_pipeline(backend)
+    pipeline.start()
+    window_manager.pickup_window()
+    window_manager.drop_window()
+    pipeline.stop()
+    assert [command for _, command, _ in backend.commands] == ['pickup', 'drop']
+
+def test_stop_mid_drag_releases_the_mouse():
+    server = FakeWindowServer()
+    server.add_window(1, (0, 0, 800, 600))
+    backend = SlowPickupBackend(window_server=server)
+    pipeline, window_manager, gesture_controller = create_pipeline(backend)
+    pipeline.start()
+    window_manager.pickup_window()
+    gesture_controller.dragging = True  # As set by the pickup gesture
+    pipeline.stop()
+    assert [command for _, command, _ in backend.commands] == ['pickup', 'drop']
+    assert not gesture_controller.dragging
+
+def test_stop_ends_the_window_geometry_refresh():
+    backend = InMemoryBackend()
+    actuation_queue = ActuationQueue(backend)
+    window_manager = WindowManager(backend=actuation_queue, geometry_refresh_interval=0.01)
+    pipeline = GesturePipeline(StillCapture(), NoHandDetector(), GestureController(NoHandDetector(), window_manager), actuation_queue, None)
+    pipeline.start()
+    refresh_thread = window_manager.window_geometry.thread
+    pipeline.stop()
+    assert not refresh_thread.is_alive()
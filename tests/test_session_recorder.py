@@ -0,0 +1,20 @@
+# Tests of session recording with frames encoded on the writer thread
+# Components: test functions
+
+import numpy as np
+from model.session_recorder import Session, SessionRecorder
+
+def test_frames_are_encoded_in_order_from_reused_buffers(tmp_path):
+    recorder = SessionRecorder(str(tmp_path / 'session'), save_frames=True, jpeg_quality=95)
+    buffer = np.empty((48, 64, 3), np.uint8)
+    for index in range(40):
+        buffer[:] = index * 5  # The caller overwrites its buffer right after each add
+        recorder.add(float(index), None, buffer if index % 10 else None)
+    session = Session(recorder.save())
+    assert len(session) == 40
+    for index in range(40):
+        frame = session.frame(index)
+        if index % 10 == 0:
+            assert frame is None
+        else:
+            assert abs(int(np.median(frame)) - index * 5) <= 2
@@ -0,0 +1,51 @@
+# Tests of the parallel startup when it is aborted with 'Escape'
+# Components: FakeWebcam, SilentView, test functions
+
+import threading
+from controller import startup
+from controller.startup import StartupLoader
+from utils.instrumentation import StartupTimer
+
+class FakeWebcam:
+    def __init__(self):
+        self.released = threading.Event()
+
+    def isOpened(self):
+        return True
+
+    def read(self):
+        return False, None
+
+    def release(self):
+        self.released.set()
+
+
+class SilentView:
+    def show_message(self, message, frame=None):
+        pass
+
+
+def test_webcam_opened_after_escape_is_released(monkeypatch):
+    monkeypatch.setattr(startup.cv2, 'waitKey', lambda delay: 27)  # 'Escape' on the first poll
+    monkeypatch.setattr(startup.cv2, 'destroyAllWindows', lambda: None)
+    camera_may_open = threading.Event()
+    webcam = FakeWebcam()
+
+    def open_webcam():
+        camera_may_open.wait()
+        return webcam
+
+    assert StartupLoader(SilentView(), StartupTimer()).run(open_webcam, {'model': lambda: None}) is None
+    camera_may_open.set()  # The camera finishes opening after the abort
+    assert webcam.released.wait(5)
+
+def test_webcam_opened_before_escape_is_released(monkeypatch):
+    monkeypatch.setattr(startup.cv2, 'waitKey', lambda delay: 27)
+    monkeypatch.setattr(startup.cv2, 'destroyAllWindows', lambda: None)
+    webcam = FakeWebcam()
+    model_may_load = threading.Event()
+    try:
+        assert StartupLoader(SilentView(), StartupTimer()).run(lambda: webcam, {'model': model_may_load.wait}) is None
+    finally:
+        model_may_load.set()
+    assert webcam.released.wait(5)
@@ -0,0 +1,110 @@
+# Tests of the window geometry cache and its invalidation against the in-memory window server
+# Components: FakeClock, test functions
+
+import numpy as np
+from model.actuation_backend import InMemoryBackend
+from model.hand_landmarks import HandLandmarks, NUM_LANDMARKS
+from model.window_geometry import FakeWindowServer, WindowGeometryCache
+from model.window_manager import WindowManager
+
+class FakeClock:
+    '''Clock advanced by hand, so TTL expiry does not depend on the speed of the machine'''
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def hand_at(x, y):
+    '''Returns landmarks whose index fingertip is at a normalized (x, y) position'''
+    points = np.zeros((NUM_LANDMARKS, 3), dtype=np.float32)
+    points[8, :2] = x, y
+    return HandLandmarks(points, 'Right', 1.0, 0.0)
+
+def test_lookup_within_ttl_does_not_rescan():
+    server = FakeWindowServer()
+    server.add_window(1, (0, 0, 800, 600))
+    clock = FakeClock()
+    cache = WindowGeometryCache(server, ttl=1.0, clock=clock)
+    assert cache.lookup(1) == (0, 0, 800, 600)
+    clock.now = 0.9
+    assert cache.lookup(1) == (0, 0, 800, 600)
+    assert server.list_calls == 1
+
+def test_lookup_after_ttl_rescans():
+    server = FakeWindowServer()
+    server.add_window(1, (0, 0, 800, 600))
+    clock = FakeClock()
+    cache = WindowGeometryCache(server, ttl=1.0, clock=clock)
+    cache.lookup(1)
+    server.move_window(1, (100, 50, 800, 600))
+    clock.now = 1.5
+    assert cache.lookup(1) == (100, 50, 800, 600)
+    assert server.list_calls == 2
+
+def test_focus_change_invalidates():
+    server = FakeWindowServer()
+    server.add_window(1, (0, 0, 800, 600))
+    server.add_window(2, (200, 100, 400, 300))
+    cache = WindowGeometryCache(server, clock=FakeClock())
+    assert cache.frontmost_window() == (200, 100, 400, 300)
+    assert cache.frontmost_window() == (200, 100, 400, 300)
+    assert server.list_calls == 1
+    server.focus(1)
+    assert cache.frontmost_window() == (0, 0, 800, 600)
+    assert server.list_calls == 2
+
+def test_frontmost_window_per_pid_and_layer():
+    server = FakeWindowServer()
+    server.add_window(1, (0, 0, 800, 600))
+    server.add_window(1, (10, 20, 300, 200))  # Opened later, so in front of the first one
+    server.add_window(1, (0, 0, 1920, 25), layer=25)  # Status bar item of the same application
+    server.add_window(2, (500, 500, 100, 100))
+    cache = WindowGeometryCache(server, clock=FakeClock())
+    assert cache.lookup(1) == (10, 20, 300, 200)
+    assert cache.lookup(1, layer=25) == (0, 0, 1920, 25)
+    assert cache.lookup(2) == (500, 500, 100, 100)
+    assert cache.lookup(3) is None
+
+def test_action_invalidates():
+    server = FakeWindowServer()
+    server.add_window(1, (200, 100, 400, 300))
+    backend = InMemoryBackend(window_server=server)
+    window_manager = WindowManager(backend=backend)
+    window_manager.pickup_window()
+    window_manager.drop_window()
+    window_manager.full_screen_frontmost_window()
+    server.move_window(1, (0, 0, 1920, 1080))
+    window_manager.pickup_window()
+    assert server.list_calls == 2
+    assert backend.commands[-1][1:] == ('pickup', (960, 11))
+
+def test_drop_updates_moved_window_without_rescan():
+    server = FakeWindowServer()
+    server.add_window(1, (100, 100, 800, 600))
+    backend = InMemoryBackend(screen_size=(1920, 1080), window_server=server)
+    window_manager = WindowManager(backend=backend)
+    window_manager.pickup_window()
+    assert backend.commands[-1][1:] == ('pickup', (500, 111))
+    window_manager.drag_window(hand_at(0.5, 0.5))  # Cursor to (960, 540)
+    window_manager.drop_window()
+    window_manager.pickup_window()
+    assert backend.commands[-1][1:] == ('pickup', (960, 540))
+    assert window_manager.window_geometry.lookup(1) == (560, 529, 800, 600)
+    assert server.list_calls == 1
+
+def test_background_refresh_keeps_scans_off_the_caller():
+    server = FakeWindowServer()
+    server.add_window(1, (0, 0, 800, 600))
+    server.add_window(2, (200, 100, 400, 300))
+    cache = WindowGeometryCache(server, ttl=0.0, refresh_interval=3600.0)
+    cache.start()
+    try:
+        assert server.list_calls == 1  # Built once when started
+        server.focus(1)
+        assert cache.frontmost_window() == (0, 0, 800, 600)  # Focus read at lookup time, bounds from the cached index
+        assert cache.lookup(2) == (200, 100, 400, 300)
+        assert server.list_calls == 1
+    finally:
+        cache.stop()
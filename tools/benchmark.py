@@ -0,0 +1,259 @@
+# Benchmarks the gesture pipeline end to end on a synthetic or recorded landmark stream, with MediaPipe
+# inference and OS actuation mocked, so our own per-frame cost can be measured on any machine
+# Reports frames per second, per-stage latency percentiles and gesture-to-action latency, writes them as
+# JSON and compares them against a stored baseline
+# Usage: python -m tools.benchmark [--session SESSION_DIR] [--output results.json] [--baseline baseline.json]
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import types
+from types import SimpleNamespace
+from unittest import mock
+import numpy as np
+
+STAGES = ['detect', 'validation', 'rules', 'controller', 'actuation', 'frame']
+# Backend command issued by each WindowManager action, to match executed commands to the rules that fired them
+ACTION_COMMANDS = {
+    'pickup_window': 'pickup', 'drop_window': 'drop', 'minimize_frontmost_window': 'minimize',
+    'close_frontmost_window': 'close', 'full_screen_frontmost_window': 'full_screen'
+}
+PERCENTILES = [50, 95, 99]
+
+class FakeHandsFeed:
+    '''Holds the mediapipe output the mocked Hands instances return for the current frame'''
+    output = SimpleNamespace(multi_hand_landmarks=None, multi_handedness=None)
+
+class FakeHands:
+    '''Stands in for mediapipe.solutions.hands.Hands, returning the prepared output of the current frame'''
+    def __init__(self, **kwargs):
+        pass
+
+    def process(self, image):
+        return FakeHandsFeed.output
+
+def install_mocks():
+    '''
+    Replaces mediapipe, pyautogui, AppKit and Quartz with mocks. Must run before the model modules are imported
+    '''
+    mediapipe = types.ModuleType('mediapipe')
+    mediapipe.solutions = SimpleNamespace(
+        hands=SimpleNamespace(Hands=FakeHands, HAND_CONNECTIONS=()),
+        drawing_utils=SimpleNamespace(draw_landmarks=lambda *args, **kwargs: None)
+    )
+    pyautogui = mock.MagicMock()
+    pyautogui.size.return_value = (1920, 1080)
+    appkit = mock.MagicMock()
+    appkit.NSWorkspace.sharedWorkspace.return_value.frontmostApplication.return_value.processIdentifier.return_value = 1
+    quartz = mock.MagicMock()
+    quartz.CGWindowListCopyWindowInfo.return_value = [
+        {'kCGWindowOwnerPID': 1, 'kCGWindowLayer': 0, 'kCGWindowBounds': {'X': 100, 'Y': 100, 'Width': 800, 'Height': 600}}
+    ]
+    sys.modules.update({'mediapipe': mediapipe, 'pyautogui': pyautogui, 'AppKit': appkit, 'Quartz': quartz})
+
+def mediapipe_output(points, handedness='Right', score=0.99):
+    '''
+    Builds a mediapipe-like output for one frame
+
+    Params:
+        points (numpy.ndarray): Landmarks of shape (21, 3), NaN when no hand is in view
+        handedness (str): Handedness label
+        score (float): Handedness confidence score
+
+    Returns:
+        SimpleNamespace: Object with the multi_hand_landmarks and multi_handedness fields read by HandDetector
+    '''
+    if np.isnan(points).any():
+        return SimpleNamespace(multi_hand_landmarks=None, multi_handedness=None)
+    landmark_list = SimpleNamespace(landmark=[SimpleNamespace(x=float(x), y=float(y), z=float(z)) for x, y, z in points])
+    classification = SimpleNamespace(classification=[SimpleNamespace(label=handedness, score=score)])
+    return SimpleNamespace(multi_hand_landmarks=[landmark_list], multi_handedness=[classification])
+
+def load_stream(args):
+    '''Loads the landmark stream to benchmark, from a recorded session or synthetic'''
+    if args.session:
+        from model.session_recorder import Session
+        session = Session(args.session)
+        return np.array(session.timestamps), np.array(session.landmarks), f"session:{args.session}"
+    from tools.synthetic_hands import synthetic_session
+    timestamps, landmarks, _ = synthetic_session(cycles=args.cycles, seed=args.seed)
+    return timestamps, landmarks, f"synthetic:cycles={args.cycles},seed={args.seed}"
+
+def summarize(samples_ms):
+    '''Computes the mean and percentiles of a list of latencies in milliseconds'''
+    if not len(samples_ms):
+        return None
+    values = np.percentile(samples_ms, PERCENTILES)
+    summary = {f"p{percentile}_ms": round(float(value), 4) for percentile, value in zip(PERCENTILES, values)}
+    summary['mean_ms'] = round(float(np.mean(samples_ms)), 4)
+    summary['count'] = len(samples_ms)
+    return summary
+
+def run_benchmark(timestamps, landmarks, resolution):
+    '''
+    Drives the detector, controller and window manager over every frame of the stream
+
+    Params:
+        timestamps (numpy.ndarray): Capture time of each frame, in seconds
+        landmarks (numpy.ndarray): Landmarks of shape (N, 21, 3), NaN on frames without a hand
+        resolution (tuple): (width, height) of the frames handed to the detector
+
+    Returns:
+        dict: Per-stage latencies in ms, gesture-to-action latencies in ms, executed actions and the wall time
+    '''
+    from controller.gesture_controller import GestureController
+    from controller.pipeline import ActuationQueue
+    from model.actuation_backend import MacOSBackend
+    from model.hand_detector import HandDetector
+    from model.window_manager import WindowManager
+    from utils.gesture_checks import is_valid_hand_position
+
+    # Mocked inference cannot follow a moving crop, so region of interest tracking is disabled
+    hand_detector = HandDetector(roi_tracking=False)
+    actuation_queue = ActuationQueue(MacOSBackend())
+    gesture_controller = GestureController(hand_detector, WindowManager(backend=actuation_queue))
+    rule_engine = gesture_controller.rule_engine
+    rule_indices = {ACTION_COMMANDS[rule.action]: index for index, rule in enumerate(rule_engine.rules)}
+
+    frame = np.zeros((resolution[1], resolution[0], 3), dtype=np.uint8)
+    outputs = [mediapipe_output(points) for points in landmarks]  # Built ahead so the mock costs nothing while timed
+    stage_times = {stage: [] for stage in STAGES}
+    actions = []  # (frame index, command name, completion time)
+    frame_starts = np.zeros(len(timestamps))
+
+    wall_start = time.perf_counter()
+    for index, output in enumerate(outputs):
+        FakeHandsFeed.output = output
+        start = frame_starts[index] = time.perf_counter()
+        detection = hand_detector.detect_single_hand(frame)
+        detected = time.perf_counter()
+        if detection:  # Timed on their own; detect and controller already include them
+            detection.landmarks.timestamp = float(timestamps[index])  # The detector stamps wall-clock time; drag filtering must run on stream time
+            is_valid_hand_position(detection.landmarks)
+            validated = time.perf_counter()
+            rule_engine.evaluate(detection.landmarks)
+            evaluated = time.perf_counter()
+            stage_times['validation'].append((validated - detected) * 1000)
+            stage_times['rules'].append((evaluated - validated) * 1000)
+        controller_start = time.perf_counter()
+        gesture_controller.process_gestures(detection, float(timestamps[index]))
+        controlled = time.perf_counter()
+        while True:  # Execute the queued commands, as the actuation worker would
+            command = actuation_queue.execute_next(0)
+            if command is None:
+                break
+            actions.append((index, command, time.perf_counter()))
+        end = time.perf_counter()
+
+        stage_times['detect'].append((detected - start) * 1000)
+        stage_times['controller'].append((controlled - controller_start) * 1000)
+        stage_times['actuation'].append((end - controlled) * 1000)
+        stage_times['frame'].append((end - start) * 1000)
+    wall_time = time.perf_counter() - wall_start
+
+    # Gesture-to-action latency: stream time from the first frame of the matching run of the gesture to the
+    # frame that fired it (the debounce), plus the processing time until the action completed
+    matches = rule_engine.evaluate(landmarks) > 0
+    latencies = []
+    for index, action, completed in actions:
+        rule_index = rule_indices.get(action)
+        if rule_index is None:
+            continue  # Drag moves are continuous, not triggered by a gesture onset
+        onset = index
+        while onset > 0 and matches[onset - 1, rule_index]:
+            onset -= 1
+        latencies.append((timestamps[index] - timestamps[onset]) * 1000 + (completed - frame_starts[index]) * 1000)
+
+    return {'stage_times': stage_times, 'latencies': latencies, 'actions': actions, 'wall_time': wall_time}
+
+def build_report(result, source, frame_count, resolution):
+    '''Turns the raw benchmark measurements into the JSON report'''
+    action_counts = {}
+    for _, action, _ in result['actions']:
+        action_counts[action] = action_counts.get(action, 0) + 1
+    return {
+        'source': source,
+        'frames': frame_count,
+        'resolution': list(resolution),
+        'fps': round(frame_count / result['wall_time'], 2),
+        'stages': {stage: summarize(times) for stage, times in result['stage_times'].items()},
+        'gesture_to_action': summarize(result['latencies']),
+        'actions': action_counts,
+        'environment': {'python': platform.python_version(), 'numpy': np.__version__, 'machine': platform.machine()},
+    }
+
+def compare_to_baseline(report, baseline, tolerance):
+    '''
+    Compares a report against a baseline report
+
+    Params:
+        report (dict): The current report
+        baseline (dict): The stored baseline report
+        tolerance (float): Allowed relative slowdown, e.g. 0.25 for 25%
+
+    Returns:
+        list: Descriptions of the metrics that regressed
+    '''
+    regressions = []
+    if report['fps'] < baseline['fps'] * (1 - tolerance):
+        regressions.append(f"fps {report['fps']} < baseline {baseline['fps']}")
+    pairs = [(f"{stage} p95", report['stages'].get(stage), baseline['stages'].get(stage)) for stage in STAGES]
+    pairs.append(('gesture_to_action p95', report['gesture_to_action'], baseline.get('gesture_to_action')))
+    for name, current, previous in pairs:
+        if current and previous and current['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{name} {current['p95_ms']:.3f} ms > baseline {previous['p95_ms']:.3f} ms")
+    return regressions
+
+def print_report(report):
+    '''Prints the report as a table'''
+    print(f"Source: {report['source']}, {report['frames']} frames at {report['resolution'][0]}x{report['resolution'][1]}")
+    print(f"Throughput: {report['fps']} frames/s")
+    print(f"{'stage':<20}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    rows = list(report['stages'].items()) + [('gesture_to_action', report['gesture_to_action'])]
+    for name, summary in rows:
+        if summary:
+            print(f"{name:<20}{summary['p50_ms']:>10.3f}{summary['p95_ms']:>10.3f}{summary['p99_ms']:>10.3f}")
+    print(f"Actions: {report['actions']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark gesture latency and per-stage throughput with mocked MediaPipe and pyautogui")
+    parser.add_argument("--session", help="Recorded session directory to replay, defaults to a synthetic stream")
+    parser.add_argument("--cycles", type=int, default=10, help="Gesture script repetitions of the synthetic stream")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic stream")
+    parser.add_argument("--resolution", default="640x480", help="Frame size handed to the detector, WIDTHxHEIGHT")
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    parser.add_argument("--baseline", help="Compare against this baseline report and exit with status 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown against the baseline")
+    parser.add_argument("--update-baseline", action="store_true", help="Overwrite the baseline file with this run")
+    args = parser.parse_args()
+
+    install_mocks()
+    resolution = tuple(int(value) for value in args.resolution.lower().split('x'))
+    timestamps, landmarks, source = load_stream(args)
+    result = run_benchmark(timestamps, landmarks, resolution)
+    report = build_report(result, source, len(timestamps), resolution)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    if args.baseline:
+        if args.update_baseline or not os.path.exists(args.baseline):
+            with open(args.baseline, 'w') as file:
+                json.dump(report, file, indent=2)
+            print(f"Baseline written to {args.baseline}")
+            return
+        with open(args.baseline) as file:
+            regressions = compare_to_baseline(report, json.load(file), args.tolerance)
+        if regressions:
+            print("Regressions against the baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("No regression against the baseline")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# Calibrates the gesture thresholds to a user: collects labeled landmark samples of an open hand and of
+# each gesture from the webcam, fits the thresholds and saves them as a profile loaded with app.py --profile
+# Usage: python -m tools.calibrate --output profile.json [--save-samples samples.npz]
+#        python -m tools.calibrate --output profile.json --samples samples.npz  (refit saved samples)
+
+import argparse
+import time
+import numpy as np
+from controller.calibration import OPEN_HAND_LABEL, fit_profile, save_profile
+
+# Label and instruction of each calibration step, in the order they are performed
+CALIBRATION_STEPS = [
+    (OPEN_HAND_LABEL, "Open hand, palm facing the camera"),
+    ('close', "Pinch thumb and pinky tips"),
+    ('minimize', "Pinch thumb and ring finger tips"),
+    ('full_screen', "Pinch thumb and middle finger tips"),
+    ('pickup', "Pinch thumb and index finger tips"),
+]
+
+def collect_samples(webcam, hand_detector, main_view, samples_per_step=60, settle_time=2.0):
+    '''
+    Guides the user through every calibration step and records the landmarks of each frame with a hand
+
+    Params:
+        webcam (cv2.VideoCapture): Opened webcam
+        hand_detector (HandDetector): Instance of HandDetector
+        main_view (MainView): Instance of MainView showing the instructions
+        samples_per_step (int): Number of samples recorded for each step
+        settle_time (float): Time in seconds given to take the pose before recording starts
+
+    Returns:
+        tuple: (landmarks (N, 21, 3), labels (N,)), or None if 'Escape' was pressed
+    '''
+    import cv2
+    landmarks, labels = [], []
+    for label, instruction in CALIBRATION_STEPS:
+        step_start = time.time()
+        recorded = 0
+        while recorded < samples_per_step:
+            ret, frame = webcam.read()
+            if not ret:
+                raise RuntimeError("Failed to capture image")
+            frame = cv2.flip(frame, 1)  # Mirrored like the app
+            detection = hand_detector.detect_single_hand(frame)
+            settling = time.time() - step_start < settle_time
+            if detection and not settling:
+                landmarks.append(detection.landmarks.points)
+                labels.append(label)
+                recorded += 1
+            status = "get ready" if settling else f"{recorded}/{samples_per_step}"
+            main_view.show_message(f"{instruction} ({status})", frame)
+            if cv2.waitKey(1) == 27:
+                return None
+    return np.stack(landmarks), np.array(labels)
+
+def synthetic_samples(seed=0):
+    '''Builds labeled samples from the synthetic stream, for trying calibration without a camera'''
+    from tools.synthetic_hands import synthetic_session
+    _, landmarks, labels = synthetic_session(cycles=4, seed=seed)
+    step_labels = {'drag': 'pickup', 'drop': OPEN_HAND_LABEL}  # A dragging hand pinches, a dropping hand is open
+    return landmarks, np.array([step_labels.get(label, label) for label in labels])
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit per-user gesture thresholds from labeled landmark samples")
+    parser.add_argument("--output", required=True, help="Profile JSON file to write")
+    parser.add_argument("--samples", help="Fit previously saved samples (.npz) instead of collecting new ones")
+    parser.add_argument("--save-samples", help="Also save the collected samples (.npz), to refit them later")
+    parser.add_argument("--count", type=int, default=60, help="Samples recorded for each calibration step")
+    parser.add_argument("--synthetic", action="store_true", help="Use synthetic samples instead of the webcam")
+    args = parser.parse_args()
+
+    if args.samples:
+        with np.load(args.samples) as samples:
+            landmarks, labels = samples['landmarks'], samples['labels']
+    elif args.synthetic:
+        landmarks, labels = synthetic_samples()
+    else:
+        import cv2
+        from model.hand_detector import HandDetector
+        from view.main_view import MainView
+        webcam = cv2.VideoCapture(0)
+        try:
+            collected = collect_samples(webcam, HandDetector(), MainView(), samples_per_step=args.count)
+        finally:
+            webcam.release()
+            cv2.destroyAllWindows()
+        if collected is None:
+            print("Calibration cancelled")
+            return
+        landmarks, labels = collected
+
+    if args.save_samples:
+        np.savez_compressed(args.save_samples, landmarks=landmarks, labels=labels)
+    profile = fit_profile(landmarks, labels)
+    save_profile(profile, args.output)
+
+    print(f"Palm size: {profile['palm_size']} (image units), samples: {profile['samples']}")
+    for name, fitted in profile['rules'].items():
+        constraints = ", ".join(f"{a}-{b} {operator} {threshold}" for a, b, operator, threshold in fitted['distances'])
+        print(f"{name:<14}{constraints}  (palm units)")
+    print(f"Angle ranges: {profile['angle_thresholds']}")
+    print(f"Profile written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+# Replays a recorded session through the GestureController without a camera or window server and
+# prints the window actions it would have performed
+# Usage: python -m tools.replay SESSION_DIR [--realtime] [--profile profile.json] [--classifier classifier.npz]
+
+import argparse
+from controller.calibration import load_profile
+from controller.gesture_controller import GestureController
+from model.gesture_classifier import GestureClassifier
+from model.recording_window_manager import RecordingWindowManager
+from model.session_recorder import Session
+from model.session_replay import ReplaySource, replay_session
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded gesture session headlessly")
+    parser.add_argument("session", help="Directory of the recorded session")
+    parser.add_argument("--realtime", action="store_true", help="Reproduce the original frame timing instead of replaying as fast as possible")
+    parser.add_argument("--profile", help="Calibration profile to replay with instead of the default thresholds")
+    parser.add_argument("--classifier", help="Gesture classifier to replay with instead of the threshold rules")
+    args = parser.parse_args()
+
+    profile = load_profile(args.profile) if args.profile else None
+    classifier = GestureClassifier.load(args.classifier) if args.classifier else None
+    session = Session(args.session)
+    source = ReplaySource(session, realtime=args.realtime)
+    window_manager = RecordingWindowManager(clock=lambda: source.current_timestamp)  # Actions are stamped with the recorded frame time
+    gesture_controller = GestureController(None, window_manager, profile=profile, classifier=classifier)
+    replay_session(source, gesture_controller)
+
+    start = float(session.timestamps[0]) if len(session) else 0.0
+    for action_time, action, action_args in window_manager.actions:
+        print(f"{action_time - start:8.3f}s  {action}{action_args if action_args else ''}")
+    print(f"{len(session)} frames, {int(session.has_hand.sum())} with a hand, {len(window_manager.actions)} actions")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# Generates synthetic landmark streams of a hand performing scripted gestures, for benchmarks
+# and experiments on machines without a camera
+# Components: open_hand, synthetic_session
+
+import numpy as np
+from model.hand_landmarks import NUM_LANDMARKS
+
+# Fingertip pinched by the thumb tip for each gesture
+GESTURE_FINGERTIPS = {'close': 20, 'minimize': 16, 'full_screen': 12, 'pickup': 8}
+
+def open_hand():
+    '''
+    Builds an open right hand, palm facing the camera with the fingers pointing up, that passes every
+    hand position check
+
+    Returns:
+        numpy.ndarray: Landmarks of shape (21, 3)
+    '''
+    points = np.zeros((NUM_LANDMARKS, 3), dtype=np.float32)
+    points[0] = (0.50, 0.90, 0.0)  # Wrist
+    points[1:5] = [(0.42, 0.85, 0.0), (0.36, 0.78, 0.0), (0.31, 0.71, 0.0), (0.28, 0.66, 0.0)]  # Thumb CMC, MCP, IP and tip
+    for mcp, x in zip((5, 9, 13, 17), (0.44, 0.50, 0.56, 0.62)):
+        points[mcp:mcp + 4] = [(x, 0.65 - 0.1 * joint, 0.0) for joint in range(4)]  # MCP, PIP, DIP and tip of each finger
+    return points
+
+def synthetic_session(cycles=10, fps=30.0, noise=0.002, seed=0):
+    '''
+    Generates a stream where the hand appears, rests, performs each gesture in turn and disappears.
+    A pickup is followed by a drag and a drop
+
+    Params:
+        cycles (int): Number of times the gesture script is repeated
+        fps (float): Frame rate of the stream
+        noise (float): Standard deviation of the landmark jitter, in normalized coordinates
+        seed (int): Seed of the random generator
+
+    Returns:
+        tuple: (timestamps (N,) float64, landmarks (N, 21, 3) float32 with NaN on frames without a hand,
+            labels (N,) list of the gesture performed on each frame, '' when none)
+    '''
+    rng = np.random.default_rng(seed)
+    base = open_hand()
+    frames, labels = [], []
+
+    def add(points, label, count=1):
+        for _ in range(count):
+            frames.append(points + rng.normal(0, noise, points.shape).astype(np.float32))
+            labels.append(label)
+
+    for _ in range(cycles):
+        add(np.full_like(base, np.nan), '', 10)  # No hand in view
+        add(base, '', 20)  # Hand resting open
+        for gesture, fingertip in GESTURE_FINGERTIPS.items():
+            pinch = base.copy()
+            pinch[4] = base[fingertip] + (0.0, 0.01, 0.0)  # Thumb tip touching, just below, the fingertip
+            add(pinch, gesture, 15)
+            if gesture == 'pickup':
+                for step in range(30):  # Drag the pinched hand to the right
+                    add(pinch + (0.005 * step, 0.0, 0.0), 'drag')
+                dropped = base + (0.15, 0.0, 0.0)
+                add(dropped, 'drop', 10)  # Open the hand to drop the window
+            add(base, '', 20)
+
+    timestamps = np.arange(len(frames), dtype=np.float64) / fps
+    return timestamps, np.stack(frames).astype(np.float32), labels
@@ -0,0 +1,89 @@
+# Trains the gesture classifier used by app.py --classifier from labeled landmarks: recorded sessions of a
+# single gesture, samples saved by tools.calibrate, or the synthetic stream. Reports the accuracy on held
+# out samples and the inference time
+# Usage: python -m tools.train_classifier --output classifier.npz --session open=sessions/open --session close=sessions/close ...
+#        python -m tools.train_classifier --output classifier.npz --samples samples.npz
+
+import argparse
+import time
+import numpy as np
+from model.gesture_classifier import NO_GESTURE, GestureClassifier
+from model.session_recorder import Session
+
+OPEN_HAND_NAME = 'open'  # Label given on the command line to sessions of an open hand
+
+def session_samples(specification):
+    '''
+    Loads the frames with a hand of a session where a single gesture is performed
+
+    Params:
+        specification (str): 'label=SESSION_DIR', where label is a gesture name or 'open' for an open hand
+
+    Returns:
+        tuple: (landmarks (N, 21, 3), labels (N,))
+    '''
+    label, separator, path = specification.partition('=')
+    if not separator:
+        raise argparse.ArgumentTypeError(f"Expected label=SESSION_DIR, got '{specification}'")
+    session = Session(path)
+    landmarks = np.array(session.landmarks[session.has_hand])
+    return landmarks, np.full(len(landmarks), NO_GESTURE if label == OPEN_HAND_NAME else label)
+
+def split(landmarks, labels, validation_share, seed=0):
+    '''Shuffles the samples and splits off a share of them for validation'''
+    order = np.random.default_rng(seed).permutation(len(landmarks))
+    validation_count = int(len(order) * validation_share)
+    validation, training = order[:validation_count], order[validation_count:]
+    return (landmarks[training], labels[training]), (landmarks[validation], labels[validation])
+
+def inference_time_us(classifier, landmarks, batch_size, repeats=200):
+    '''Measures the mean time in microseconds to classify one hand, alone or in batches'''
+    batch = landmarks[:batch_size] if batch_size > 1 else landmarks[0]
+    start = time.perf_counter()
+    for _ in range(repeats):
+        classifier.predict_proba(batch)
+    return (time.perf_counter() - start) / repeats / (len(batch) if batch_size > 1 else 1) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the gesture classifier from labeled landmarks")
+    parser.add_argument("--output", required=True, help="Classifier .npz file to write")
+    parser.add_argument("--session", action="append", default=[], metavar="LABEL=SESSION_DIR", help="Recorded session of one gesture, 'open' for an open hand; repeat for every gesture")
+    parser.add_argument("--samples", action="append", default=[], help="Labeled samples (.npz) saved by tools.calibrate --save-samples")
+    parser.add_argument("--synthetic", action="store_true", help="Add samples of the synthetic stream")
+    parser.add_argument("--hidden", type=int, default=32, help="Number of hidden units")
+    parser.add_argument("--epochs", type=int, default=400, help="Number of training passes over the samples")
+    parser.add_argument("--min-confidence", type=float, default=0.6, help="Confidence above which a gesture holds")
+    parser.add_argument("--validation", type=float, default=0.2, help="Share of the samples held out to measure the accuracy")
+    args = parser.parse_args()
+
+    parts = [session_samples(specification) for specification in args.session]
+    for path in args.samples:
+        with np.load(path) as samples:
+            parts.append((samples['landmarks'], samples['labels']))
+    if args.synthetic:
+        from tools.calibrate import synthetic_samples
+        parts.append(synthetic_samples())
+    if not parts:
+        parser.error("No training samples: pass --session, --samples or --synthetic")
+    landmarks = np.concatenate([part[0] for part in parts]).astype(np.float32)
+    labels = np.concatenate([np.asarray(part[1]).astype(str) for part in parts])
+    has_hand = ~np.isnan(landmarks).any(axis=(1, 2))
+    landmarks, labels = landmarks[has_hand], labels[has_hand]
+
+    (train_landmarks, train_labels), (validation_landmarks, validation_labels) = split(landmarks, labels, args.validation)
+    classifier = GestureClassifier.train(train_landmarks, train_labels, hidden_size=args.hidden, epochs=args.epochs, min_confidence=args.min_confidence)
+    if len(validation_landmarks):
+        predicted = np.array(classifier.classes)[classifier.predict(validation_landmarks)]
+        for name in classifier.classes:
+            mask = validation_labels == name
+            print(f"{name or OPEN_HAND_NAME:<14}{int(mask.sum()):6d} samples  accuracy {np.mean(predicted[mask] == name) if mask.any() else float('nan'):.3f}")
+        print(f"Validation accuracy: {np.mean(predicted == validation_labels):.3f}")
+    # The deployed classifier learns from every sample
+    classifier = GestureClassifier.train(landmarks, labels, hidden_size=args.hidden, epochs=args.epochs, min_confidence=args.min_confidence)
+    classifier.save(args.output)
+
+    print(f"Inference: {inference_time_us(classifier, landmarks, 1):.1f} us per hand, {inference_time_us(classifier, landmarks, 64):.2f} us per hand in batches of 64")
+    print(f"Classifier written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# Reuses image buffers across frames, so the capture path does not allocate a full frame for every frame
+# it reads, flips or converts. Every allocation it cannot avoid is counted in the instrumentation as 'frame_allocations'
+# Components: FrameRing, reusable_buffer
+
+from collections import deque
+import threading
+import numpy as np
+from utils.instrumentation import instrumentation
+
+def reusable_buffer(buffer, shape, dtype=np.uint8):
+    '''
+    Returns a buffer to use as the dst of an OpenCV call, allocating a new one only when the shape changes
+
+    Params:
+        buffer (numpy.ndarray): The buffer used on the previous frame, or None
+        shape (tuple): Shape the buffer must have
+        dtype (numpy.dtype): Type the buffer must have
+
+    Returns:
+        numpy.ndarray: The buffer, or a new one if it did not match
+    '''
+    if buffer is not None and buffer.shape == shape and buffer.dtype == dtype:
+        return buffer
+    instrumentation.count('frame_allocations')
+    return np.empty(shape, dtype)
+
+
+class FrameRing:
+    def __init__(self, size=4):
+        '''
+        Initializes the FrameRing, a pool of preallocated frame buffers. A buffer is acquired by the capture
+        thread, travels with its frame through the pipeline and is released by the last stage using it, so a
+        buffer is never overwritten while a stage still reads it. The ring grows when every buffer is in use
+
+        Params:
+            size (int): Number of buffers allocated when the frame size becomes known
+        '''
+        self.size = size
+        self.shape = None  # Shape of the buffers, set by the first frame
+        self.free = deque()  # Buffers not used by any stage
+        self.lock = threading.Lock()
+        self.allocations = 0  # Number of buffers allocated, including the preallocated ones
+
+    def acquire(self, shape):
+        '''
+        Takes a free buffer for a frame
+
+        Params:
+            shape (tuple): Shape of the frame
+
+        Returns:
+            numpy.ndarray: A buffer of that shape, owned by the caller until released
+        '''
+        with self.lock:
+            if shape != self.shape:  # First frame or new resolution: buffers of the old size are dropped as they are released
+                self.shape = shape
+                self.free = deque(np.empty(shape, np.uint8) for _ in range(self.size))
+                self.allocations += self.size
+                instrumentation.count('frame_allocations', self.size)
+            if self.free:
+                return self.free.popleft()
+            self.allocations += 1
+        instrumentation.count('frame_allocations')
+        return np.empty(shape, np.uint8)
+
+    def release(self, frame):
+        '''
+        Returns a buffer to the ring once no stage uses it anymore. Frames of another size are dropped
+
+        Params:
+            frame (numpy.ndarray): The buffer
+        '''
+        with self.lock:
+            if frame.shape == self.shape:
+                self.free.append(frame)
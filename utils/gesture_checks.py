@@ -1,28 +1,64 @@
 # This module contains helper functions for additional landmark checks for hand gesture detection
+# Every check is vectorized: it accepts a single hand as HandLandmarks or a (21, 3) array, or a batch
+# of hands as an (N, 21, 3) array, and returns a boolean (or an array of N booleans)
+
+import numpy as np
+
+PIP_LANDMARKS = [6, 10, 14, 18]  # Index, middle, ring and pinky PIP landmarks
+MCP_LANDMARKS = [5, 9, 13, 17]  # Index, middle, ring and pinky MCP landmarks
+OTHER_FINGERTIPS = [20, 16, 12]  # Pinky, ring and middle tip landmarks
+ANGLE_TRIPLETS = np.array([
+    [9, 10, 12],  # Middle finger PIP, DIP and tip
+    [1, 2, 3],  # Thumb CMC, MCP and IP
+])
+ANGLE_THRESHOLDS = np.array([
+    [150, 180],  # Middle finger pointing up extended <-> flexed
+    [160, 180],  # Thumb finger extended <-> flexed
+])  # Default valid ranges in degrees; a calibration profile brings its own, passed explicitly to the checks
+MIDDLE_FINGER_CHAIN = [12, 10, 9, 0]  # Middle tip, DIP, PIP and wrist, from top to bottom
+PALM_LANDMARKS = [0, 9]  # Wrist and middle finger MCP, whose distance measures the size of the hand in the image
+
+def as_points(hand):
+    '''
+    Returns the landmark coordinates of one or more hands as a float32 array
+
+    Params:
+        hand (HandLandmarks or numpy.ndarray): A single hand or an (N, 21, 3) batch of hands
+
+    Returns:
+        numpy.ndarray: Landmark coordinates of shape (21, 3) or (N, 21, 3)
+    '''
+    return np.asarray(getattr(hand, 'points', hand), dtype=np.float32)
 
-import math
+def palm_size(hand):
+    '''
+    Measures the size of the hand in the image as the distance from the wrist to the middle finger MCP,
+    using the x and y coordinates. Dividing distances by it makes them independent of hand size and camera distance
+
+    Params:
+        hand (HandLandmarks or numpy.ndarray): A single hand or an (N, 21, 3) batch of hands
+
+    Returns:
+        numpy.ndarray: Palm size, a scalar or an array of N sizes
+    '''
+    points = as_points(hand)
+    return np.linalg.norm(points[..., PALM_LANDMARKS[0], :2] - points[..., PALM_LANDMARKS[1], :2], axis=-1)
 
 def additional_landmark_checks(hand):
     '''
     Checks if the thumb tip is positioned below or slightly above other fingertips
-    by comparing the vertical position (y-coordinate) of the thumb tip landmark 
+    by comparing the vertical position (y-coordinate) of the thumb tip landmark
     with the vertical positions of the tips of the pinky, ring, and middle fingers
-    
+
     Params:
-        hand (mediapipe Hands.Hand): Detected hand object containing landmarks
+        hand (HandLandmarks or numpy.ndarray): A single hand or an (N, 21, 3) batch of hands
 
     Returns:
         bool: True if the thumb tip is positioned below or up to a threshold above other fingertips, False otherwise
     '''
-    pinky_tip = hand.landmark[20]  # Pinky tip landmark
-    ring_tip = hand.landmark[16]   # Ring tip landmark
-    middle_tip = hand.landmark[12] # Middle tip landmark
-    thumb_tip = hand.landmark[4]   # Thumb tip landmark
-
+    y = as_points(hand)[..., 1]
     # Condition to ensure that the thumb is positioned below or slightly above other fingertips
-    if thumb_tip.y < pinky_tip.y or thumb_tip.y < ring_tip.y or thumb_tip.y < middle_tip.y:
-        return False
-    return True
+    return np.all(y[..., 4:5] >= y[..., OTHER_FINGERTIPS], axis=-1)
 
 def pips_above_mcps(hand):
     '''
@@ -30,101 +66,72 @@ def pips_above_mcps(hand):
     In MediaPipe's coordinate system, a lower y-value corresponds to a higher position in the image
 
     Params:
-        hand (mediapipe Hands.Hand): Detected hand object containing landmarks
+        hand (HandLandmarks or numpy.ndarray): A single hand or an (N, 21, 3) batch of hands
 
     Returns:
         bool: True if all PIP landmarks are positioned above MCP landmarks, False otherwise
     '''
-    finger_pip_mcp_landmarks = {
-        'index': (hand.landmark[6], hand.landmark[5]),  # Index PIP and MCP
-        'middle': (hand.landmark[10], hand.landmark[9]),  # Middle PIP and MCP
-        'ring': (hand.landmark[14], hand.landmark[13]),  # Ring PIP and MCP
-        'pinky': (hand.landmark[18], hand.landmark[17])  # Pinky PIP and MCP
-    }
-
-    for finger, (pip, mcp) in finger_pip_mcp_landmarks.items():
-        if pip.y >= mcp.y:
-            print(f'{finger.capitalize()} PIP is below MCP. Ignoring gestures')  # Debug: log
-            return False
-    print("All PIP landmarks are above MCP landmarks")  # Debug: log
-    return True
+    y = as_points(hand)[..., 1]
+    return np.all(y[..., PIP_LANDMARKS] < y[..., MCP_LANDMARKS], axis=-1)
 
 def calculate_angle(point1, point2, point3):
     '''
-    Helper function to calculate the angle between three points
+    Helper function to calculate the angle at point2 between three points, using their x and y coordinates
 
     Params:
-        point1: The first point (landmark)
-        point2: The second point (landmark)
-        point3: The third point (landmark)
+        point1 (numpy.ndarray): The first point(s), with x and y in the last axis
+        point2 (numpy.ndarray): The second point(s), the vertex of the angle
+        point3 (numpy.ndarray): The third point(s)
 
     Returns:
-        float: The angle in degrees between the three points.
+        numpy.ndarray: The angle(s) in degrees between the three points. NaN where two points coincide
     '''
-    a = (point1.x - point2.x)**2 + (point1.y - point2.y)**2
-    b = (point3.x - point2.x)**2 + (point3.y - point2.y)**2
-    c = (point1.x - point3.x)**2 + (point1.y - point3.y)**2
-
-    cos_angle = (a + b - c) / (2 * math.sqrt(a) * math.sqrt(b))
-    cos_angle = max(min(cos_angle, 1.0), -1.0)  # Ensure the cosine value is within the valid range [-1, 1]
-
-    angle = math.degrees(math.acos(cos_angle))
-    return angle
-
-def hand_angle_validation(hand_landmarks):
+    vector1 = point1[..., :2] - point2[..., :2]
+    vector2 = point3[..., :2] - point2[..., :2]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cos_angle = np.sum(vector1 * vector2, axis=-1) / (np.linalg.norm(vector1, axis=-1) * np.linalg.norm(vector2, axis=-1))
+    cos_angle = np.clip(cos_angle, -1.0, 1.0)  # Ensure the cosine value is within the valid range [-1, 1]
+    return np.degrees(np.arccos(cos_angle))
+
+def hand_angle_validation(hand, angle_thresholds=None):
     '''
     Validate hand angle to check if the palm is facing the camera and the middle finger is pointing up
 
     Params:
-        hand_landmarks (mediapipe.framework.formats.landmark_pb2.NormalizedLandmarkList): Detected hand landmarks
+        hand (HandLandmarks or numpy.ndarray): A single hand or an (N, 21, 3) batch of hands
+        angle_thresholds (numpy.ndarray): [min_degrees, max_degrees] of each ANGLE_TRIPLETS angle, e.g. from a
+            calibration profile. None for the default ANGLE_THRESHOLDS
 
     Returns:
         bool: True if the hand angle is valid, False otherwise
     '''
-    wrist_landmark = hand_landmarks.landmark[0]  # Store wrist landmark
-    middle_finger_pip_landmark = hand_landmarks.landmark[9]  # Store middle finger PIP landmark
-    middle_finger_dip_landmark = hand_landmarks.landmark[10]  # Store middle finger DIP landmark
-    middle_finger_tip_landmark = hand_landmarks.landmark[12]  # Store middle finger tip landmark
-    thumb_cmc_landmark = hand_landmarks.landmark[1]  # Store thumb CMC landmark
-    thumb_mcp_landmark = hand_landmarks.landmark[2]  # Store thumb MCP landmark
-    thumb_ip_landmark = hand_landmarks.landmark[3]  # Store thumb IP landmark
-
-    # Check if the wrist landmark is positioned below the middle finger tip landmark
-    if wrist_landmark.y < middle_finger_tip_landmark.y:
-        print("Invalid hand position. Wrist is above the middle finger tip")
-        return False
-
-    # Calculate the angle between the middle finger PIP, DIP, and tip landmarks
-    middle_finger_angle = calculate_angle(
-        middle_finger_pip_landmark,
-        middle_finger_dip_landmark,
-        middle_finger_tip_landmark
-    )
+    points = as_points(hand)
 
-    # Calculate the angle between the thumb CMC, MCP, and IP landmarks
-    thumb_angle = calculate_angle(
-        thumb_cmc_landmark,
-        thumb_mcp_landmark,
-        thumb_ip_landmark
+    # Calculate the middle finger (PIP, DIP, tip) and thumb (CMC, MCP, IP) angles in one pass
+    angles = calculate_angle(
+        points[..., ANGLE_TRIPLETS[:, 0], :],
+        points[..., ANGLE_TRIPLETS[:, 1], :],
+        points[..., ANGLE_TRIPLETS[:, 2], :]
     )
+    # Check if both angles are within their valid ranges (NaN angles compare as invalid)
+    thresholds = ANGLE_THRESHOLDS if angle_thresholds is None else angle_thresholds
+    angles_valid = np.all((thresholds[:, 0] <= angles) & (angles <= thresholds[:, 1]), axis=-1)
 
-    print(f"Middle finger angle: {middle_finger_angle}")  # Debug: log middle finger angle value
-    print(f"Thumb angle: {thumb_angle}")  # Debug: log thumb finger angle value
+    # Middle finger tip above DIP above PIP above wrist; this also rejects a wrist positioned above the middle finger tip
+    y = points[..., MIDDLE_FINGER_CHAIN, 1]
+    middle_finger_aligned = np.all(y[..., :-1] < y[..., 1:], axis=-1)
 
-    middle_finger_angle_threshold = (150, 180)  # Middle finger pointing up extended <-> flexed
-    thumb_angle_threshold = (160, 180)  # Thumb finger extended <-> flexed 
-    
-    # Check if the middle finger angle is within the valid range
-    is_middle_finger_valid = middle_finger_angle_threshold[0] <= middle_finger_angle <= middle_finger_angle_threshold[1]
-    # Check if the thumb finger angle is within the valid range
-    is_thumb_valid = thumb_angle_threshold[0] <= thumb_angle <= thumb_angle_threshold[1]
+    return angles_valid & middle_finger_aligned
 
-    print(f"Middle finger valid: {is_middle_finger_valid}")  # Debug: log validation status
-    print(f"Thumb valid: {is_thumb_valid}")  # Debug: log validation status
+def is_valid_hand_position(hand, angle_thresholds=None):
+    '''
+    Runs every hand position check required before gestures are accepted
 
-    middle_finger_aligned = (
-        middle_finger_tip_landmark.y < middle_finger_dip_landmark.y < middle_finger_pip_landmark.y < wrist_landmark.y
-    )
-    print(f"Middle finger aligned: {middle_finger_aligned}")  # Debug: log alignment status
+    Params:
+        hand (HandLandmarks or numpy.ndarray): A single hand or an (N, 21, 3) batch of hands
+        angle_thresholds (numpy.ndarray): Valid angle ranges of the hand angle check, None for the defaults
 
-    return is_middle_finger_valid and is_thumb_valid and middle_finger_aligned
+    Returns:
+        bool: True if the PIP, thumb tip and hand angle checks all pass, False otherwise
+    '''
+    return pips_above_mcps(hand) & additional_landmark_checks(hand) & hand_angle_validation(hand, angle_thresholds)
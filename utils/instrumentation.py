@@ -0,0 +1,321 @@
+# This module contains the hot-path instrumentation: leveled logging, per-stage timers and counters
+# Timers and counters are written to a preallocated ring buffer without taking a lock and are aggregated
+# by a background thread that exports periodic JSON snapshots or Prometheus text files
+# Components: get_logger, configure_logging, Instrumentation, StatsFlusher, StartupTimer, instrumentation
+
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+import numpy as np
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+def get_logger(name):
+    '''
+    Returns the logger of a module. Debug messages must use lazy %-style arguments, so that a disabled
+    level costs a single level check and no string formatting
+
+    Params:
+        name (str): Name of the module, usually __name__
+
+    Returns:
+        logging.Logger: The logger
+    '''
+    return logging.getLogger(name)
+
+def configure_logging(level="WARNING"):
+    '''
+    Configures the root logger
+
+    Params:
+        level (str): Minimum level of the messages to output, e.g. 'DEBUG', 'INFO' or 'WARNING'
+    '''
+    logging.basicConfig(level=getattr(logging, level.upper()), format=LOG_FORMAT)
+
+
+class _NullTimer:
+    '''Timer returned while instrumentation is disabled, it does nothing'''
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+class _StageTimer:
+    '''Context manager that records the time spent in a stage'''
+    __slots__ = ('instrumentation', 'metric', 'start')
+
+    def __init__(self, instrumentation, metric):
+        self.instrumentation = instrumentation
+        self.metric = metric
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.instrumentation.record(self.metric, time.perf_counter() - self.start)
+        return False
+
+
+class Instrumentation:
+    def __init__(self, capacity=65536):
+        '''
+        Initializes the Instrumentation. It starts disabled, so timers and counters cost a single attribute check
+
+        Params:
+            capacity (int): Number of events the ring buffer holds between two flushes
+        '''
+        self.enabled = False
+        self.capacity = capacity
+        self.metric_ids = {}  # Metric name -> id stored in the ring buffer
+        self.metric_names = []  # Metric id -> name
+        self.metric_kinds = []  # Metric id -> 'timer' or 'counter'
+        self.registration_lock = threading.Lock()  # Serializes the rare registration of a new metric
+        self.event_metrics = np.zeros(capacity, dtype=np.int32)  # Metric id of each event
+        self.event_values = np.zeros(capacity, dtype=np.float64)  # Duration in seconds (timers) or increment (counters)
+        self.event_sequences = np.full(capacity, -1, dtype=np.int64)  # Sequence number of the event held by each slot, -1 while it is written
+        self.sequence = itertools.count()  # Next event sequence number; next() is atomic under the GIL, so writers need no lock
+        self.read = 0  # Sequence number of the first event not aggregated yet
+
+    def enable(self):
+        '''Starts recording timers and counters'''
+        self.enabled = True
+
+    def metric_id(self, name, kind):
+        '''Returns the id of a metric, registering it on first use'''
+        metric = self.metric_ids.get(name)
+        if metric is None:
+            with self.registration_lock:
+                metric = self.metric_ids.get(name)
+                if metric is None:
+                    metric = len(self.metric_names)
+                    self.metric_names.append(name)
+                    self.metric_kinds.append(kind)
+                    self.metric_ids[name] = metric  # Published last, so an event never refers to an id without a name
+        return metric
+
+    def timer(self, stage):
+        '''
+        Returns a context manager that records the time spent in a stage
+
+        Params:
+            stage (str): Name of the stage, e.g. 'detect'
+        '''
+        if not self.enabled:
+            return _NULL_TIMER
+        return _StageTimer(self, self.metric_id(stage, 'timer'))
+
+    def count(self, counter, increment=1):
+        '''
+        Increments a counter
+
+        Params:
+            counter (str): Name of the counter, e.g. 'frames'
+            increment (int): Amount to add
+        '''
+        if self.enabled:
+            self.record(self.metric_id(counter, 'counter'), increment)
+
+    def record(self, metric, value):
+        '''Writes one event to the ring buffer, stamping its slot with the event's sequence number once complete'''
+        sequence = next(self.sequence)
+        index = sequence % self.capacity
+        self.event_sequences[index] = -1  # Readers skip the slot while it is rewritten
+        self.event_metrics[index] = metric
+        self.event_values[index] = value
+        self.event_sequences[index] = sequence
+
+    def drain(self):
+        '''
+        Returns the events written since the previous drain. Events overwritten before being drained are counted as lost.
+        Draining stops at the first event still being written; it is returned by the next drain
+
+        Returns:
+            tuple: (metric ids, values, number of lost events)
+        '''
+        newest = int(self.event_sequences.max())
+        start = max(self.read, newest - self.capacity + 1)
+        sequences = np.arange(start, newest + 1)
+        indices = sequences % self.capacity
+        stamps = self.event_sequences[indices]
+        metrics, values = self.event_metrics[indices], self.event_values[indices]
+        complete = (stamps == sequences) & (self.event_sequences[indices] == sequences)  # Stamped before and after the copy, so not torn
+        incomplete = np.flatnonzero(~complete)
+        count = int(incomplete[0]) if len(incomplete) else len(sequences)
+        lost = start - self.read
+        self.read = start + count
+        return metrics[:count], values[:count], lost
+
+
+class StatsFlusher:
+    def __init__(self, instrumentation, json_path=None, prometheus_path=None, interval=5.0, prefix="gesture"):
+        '''
+        Initializes the StatsFlusher, which periodically aggregates the ring buffer on a background thread
+
+        Params:
+            instrumentation (Instrumentation): The instrumentation to flush
+            json_path (str): File the JSON snapshot is written to, None to skip
+            prometheus_path (str): File the Prometheus text exposition is written to, None to skip
+            interval (float): Time in seconds between two flushes
+            prefix (str): Prefix of the Prometheus metric names
+        '''
+        self.instrumentation = instrumentation
+        self.json_path = json_path
+        self.prometheus_path = prometheus_path
+        self.interval = interval
+        self.prefix = prefix
+        self.counters = {}  # Counter name -> total since start
+        self.stages = {}  # Stage name -> count and sum since start, and percentiles of the latest interval with events
+        self.lost_events = 0  # Events overwritten before being aggregated
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="stats-flusher", daemon=True)
+
+    def start(self):
+        '''Enables the instrumentation and starts flushing'''
+        self.instrumentation.enable()
+        self.thread.start()
+
+    def stop(self):
+        '''Stops the background thread after a last flush'''
+        self.stop_event.set()
+        if self.thread.is_alive():
+            self.thread.join()
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            self.flush()
+        self.flush()
+
+    def snapshot(self):
+        '''
+        Aggregates the events written since the previous snapshot
+
+        Returns:
+            dict: Counter totals since start, and per-stage timing statistics in seconds: count and sum since start,
+                mean and percentiles over the latest interval in which the stage ran
+        '''
+        metrics, values, lost = self.instrumentation.drain()
+        self.lost_events += lost
+        names = self.instrumentation.metric_names
+        kinds = self.instrumentation.metric_kinds
+        for metric in np.unique(metrics):
+            metric_values = values[metrics == metric]
+            if kinds[metric] == 'counter':
+                self.counters[names[metric]] = self.counters.get(names[metric], 0) + int(metric_values.sum())
+            else:
+                p50, p95, p99 = np.percentile(metric_values, [50, 95, 99])
+                previous = self.stages.get(names[metric], {'count': 0, 'sum': 0.0})
+                self.stages[names[metric]] = {
+                    'count': previous['count'] + int(len(metric_values)), 'sum': previous['sum'] + float(metric_values.sum()),
+                    'mean': float(metric_values.mean()), 'p50': float(p50), 'p95': float(p95), 'p99': float(p99)
+                }
+        return {
+            'time': time.time(), 'interval': self.interval, 'counters': dict(self.counters),
+            'stages': {stage: dict(stats) for stage, stats in self.stages.items()}, 'lost_events': self.lost_events
+        }
+
+    def flush(self):
+        '''Takes a snapshot and writes it to the configured files'''
+        snapshot = self.snapshot()
+        if self.json_path:
+            write_atomically(self.json_path, json.dumps(snapshot, indent=2))
+        if self.prometheus_path:
+            write_atomically(self.prometheus_path, self.to_prometheus(snapshot))
+        return snapshot
+
+    def to_prometheus(self, snapshot):
+        '''
+        Formats a snapshot in the Prometheus text exposition format
+
+        Params:
+            snapshot (dict): Snapshot returned by snapshot()
+
+        Returns:
+            str: The exposition text
+        '''
+        lines = []
+        for name, total in sorted(snapshot['counters'].items()):
+            metric = f"{self.prefix}_{name}_total"
+            lines += [f"# TYPE {metric} counter", f"{metric} {total}"]
+        metric = f"{self.prefix}_stage_seconds"
+        lines.append(f"# TYPE {metric} summary")
+        for stage, stats in sorted(snapshot['stages'].items()):
+            for quantile in ('p50', 'p95', 'p99'):
+                lines.append(f'{metric}{{stage="{stage}",quantile="0.{quantile[1:]}"}} {stats[quantile]:.9f}')
+            lines.append(f'{metric}_sum{{stage="{stage}"}} {stats["sum"]:.9f}')
+            lines.append(f'{metric}_count{{stage="{stage}"}} {stats["count"]}')
+        lines += [f"# TYPE {self.prefix}_lost_events_total counter", f"{self.prefix}_lost_events_total {snapshot['lost_events']}"]
+        return "\n".join(lines) + "\n"
+
+def write_atomically(path, text):
+    '''Writes a file through a temporary file, so readers never see a partial snapshot'''
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, 'w') as file:
+        file.write(text)
+    os.replace(temporary_path, path)
+
+
+class StartupTimer:
+    def __init__(self, started=None):
+        '''
+        Initializes the StartupTimer, which records when each startup phase began and ended. Phases may run
+        in parallel on different threads
+
+        Params:
+            started (float): time.perf_counter() value taken when the process started, defaults to now
+        '''
+        self.started = time.perf_counter() if started is None else started
+        self.phases = []  # (name, start, end) in seconds since the process started
+        self.lock = threading.Lock()
+
+    def record(self, name, start, end):
+        '''Records a phase from two time.perf_counter() values'''
+        with self.lock:
+            self.phases.append((name, start - self.started, end - self.started))
+
+    def phase(self, name):
+        '''Returns a context manager that records the phase it wraps'''
+        return _StartupPhase(self, name)
+
+    def mark(self, name):
+        '''Records a milestone, e.g. the first displayed frame, as a phase lasting since the process started'''
+        self.record(name, self.started, time.perf_counter())
+
+    def report(self):
+        '''
+        Formats the recorded phases, ordered by start time
+
+        Returns:
+            str: One line per phase with its start, end and duration in milliseconds
+        '''
+        with self.lock:
+            phases = sorted(self.phases, key=lambda phase: phase[1])
+        lines = [f"{'phase':<14}{'start ms':>10}{'end ms':>10}{'took ms':>10}"]
+        for name, start, end in phases:
+            lines.append(f"{name:<14}{start * 1000:>10.1f}{end * 1000:>10.1f}{(end - start) * 1000:>10.1f}")
+        return "\n".join(lines)
+
+class _StartupPhase:
+    '''Context manager that records a startup phase'''
+    __slots__ = ('startup_timer', 'name', 'start')
+
+    def __init__(self, startup_timer, name):
+        self.startup_timer = startup_timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.startup_timer.record(self.name, self.start, time.perf_counter())
+        return False
+
+
+instrumentation = Instrumentation()  # Process-wide instance used by every stage
@@ -0,0 +1,66 @@
+# This module contains a bounded, thread-safe queue in which the newest item always wins
+# Components: LatestQueue
+
+from collections import deque
+import threading
+
+class LatestQueue:
+    def __init__(self, maxsize=1, on_drop=None):
+        '''
+        Initializes the LatestQueue. When the queue is full, putting a new item drops the oldest one
+        instead of blocking the producer, so consumers never fall behind on stale items
+
+        Params:
+            maxsize (int): Maximum number of items held before the oldest is dropped
+            on_drop (callable): Called with each dropped item, e.g. to recycle its frame buffer
+        '''
+        self.items = deque(maxlen=maxsize)  # Bounded storage, the deque discards the oldest item when full
+        self.condition = threading.Condition()  # Wakes up consumers waiting for an item
+        self.closed = False  # Set once the queue is closed during shutdown
+        self.dropped = 0  # Number of stale items dropped so far
+        self.on_drop = on_drop
+
+    def put(self, item):
+        '''
+        Adds an item to the queue, dropping the oldest item if the queue is full
+
+        Params:
+            item: The item to enqueue
+
+        Returns:
+            bool: True if an older item had to be dropped, False otherwise
+        '''
+        with self.condition:
+            dropped = len(self.items) == self.items.maxlen
+            if dropped:
+                self.dropped += 1  # The deque drops the oldest item on append
+                if self.on_drop:
+                    self.on_drop(self.items[0])
+            self.items.append(item)
+            self.condition.notify()
+            return dropped
+
+    def get(self, timeout=None):
+        '''
+        Removes and returns the oldest item in the queue, waiting for one if it is empty
+
+        Params:
+            timeout (float): Maximum time to wait in seconds, or None to wait until an item arrives or the queue is closed
+
+        Returns:
+            The oldest item, or None if the timeout expired or the queue was closed
+        '''
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.items or self.closed, timeout):
+                return None
+            if not self.items:
+                return None  # Queue closed and drained
+            return self.items.popleft()
+
+    def close(self):
+        '''
+        Closes the queue and wakes up every waiting consumer
+        '''
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
@@ -0,0 +1,76 @@
+# This module contains the One-Euro filter, an adaptive low-pass filter for noisy pointer input
+# It smooths heavily when the hand is almost still (removing jitter) and lightly when it moves fast (keeping latency low)
+# Components: OneEuroFilter
+
+import math
+import numpy as np
+
+def smoothing_factor(cutoff, elapsed):
+    '''
+    Computes the exponential smoothing factor for a cutoff frequency
+
+    Params:
+        cutoff (float or numpy.ndarray): Cutoff frequency in Hz
+        elapsed (float): Time since the previous sample in seconds
+
+    Returns:
+        float or numpy.ndarray: Smoothing factor between 0 and 1
+    '''
+    time_constant = 1.0 / (2 * math.pi * cutoff)
+    return 1.0 / (1.0 + time_constant / elapsed)
+
+class OneEuroFilter:
+    def __init__(self, min_cutoff=1.0, beta=0.007, derivative_cutoff=1.0):
+        '''
+        Initializes the OneEuroFilter. Every coordinate of the input is filtered independently
+
+        Params:
+            min_cutoff (float): Cutoff frequency in Hz when the input is still, lower removes more jitter
+            beta (float): How fast the cutoff rises with speed, higher reduces lag during fast motion
+            derivative_cutoff (float): Cutoff frequency in Hz used to smooth the speed estimate
+        '''
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.derivative_cutoff = derivative_cutoff
+        self.reset()
+
+    def reset(self):
+        '''Forgets the filter history, the next sample passes through unchanged'''
+        self.previous_value = None  # Last filtered value
+        self.previous_derivative = None  # Last filtered speed
+        self.previous_time = None  # Time of the last sample
+
+    def __call__(self, value, timestamp):
+        '''
+        Filters one sample
+
+        Params:
+            value (numpy.ndarray): The raw sample, e.g. an (x, y) position
+            timestamp (float): Time of the sample in seconds
+
+        Returns:
+            numpy.ndarray: The filtered sample
+        '''
+        value = np.asarray(value, dtype=np.float64)
+        if self.previous_value is None:
+            self.previous_value = value
+            self.previous_derivative = np.zeros_like(value)
+            self.previous_time = timestamp
+            return value
+
+        elapsed = timestamp - self.previous_time
+        if elapsed <= 0:
+            return self.previous_value  # Repeated or out of order sample
+
+        derivative = (value - self.previous_value) / elapsed
+        derivative_factor = smoothing_factor(self.derivative_cutoff, elapsed)
+        derivative = self.previous_derivative + derivative_factor * (derivative - self.previous_derivative)
+
+        cutoff = self.min_cutoff + self.beta * np.abs(derivative)  # Faster motion -> higher cutoff -> less smoothing
+        factor = smoothing_factor(cutoff, elapsed)
+        filtered = self.previous_value + factor * (value - self.previous_value)
+
+        self.previous_value = filtered
+        self.previous_derivative = derivative
+        self.previous_time = timestamp
+        return filtered
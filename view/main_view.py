@@ -2,76 +2,121 @@
 # sends user commands to the controller to reflect actions based on their gestures
 # Components: Methods for displaying video feed, drawing landmarks and additional visual feedback
 
-from utils.gesture_checks import pips_above_mcps, additional_landmark_checks, hand_angle_validation
 import cv2
+import numpy as np
+from utils.instrumentation import get_logger
+
+logger = get_logger(__name__)
+
+WINDOW_NAME = "Hand Gesture Control"
 
 class MainView:
-    def __init__(self, hand_detector, window_manager, gesture_controller):
+    def __init__(self, hand_detector=None, window_manager=None, gesture_controller=None):
         '''
-        Initialize the MainView object.
+        Initialize the MainView object. The components are only needed by run(); the pipeline only uses the
+        display methods, so the view can be created before they are loaded
 
         Params:
             hand_detector (HandDetector): Instance of HandDetector for detecting hand landmarks
             window_manager (WindowManager): Instance of WindowManager for managing windows
             gesture_controller (GestureController): Instance of GestureController for handling gestures
         '''
-        self.cap = cv2.VideoCapture(0)  # Open the webcam
-        if not self.cap.isOpened():
-            raise ValueError("Could not open webcam")
-        
         self.hand_detector = hand_detector
         self.window_manager = window_manager
         self.gesture_controller = gesture_controller
+        self.drawing_utils = None  # Utility for drawing hand landmarks, loaded with mediapipe when the first hand is drawn
+        self.hand_connections = None  # Landmark pairs joined when drawing a hand
+
+    def load_drawing_utils(self):
+        '''
+        Imports the mediapipe drawing utilities. Deferred so that the preview can open before mediapipe is loaded
+        '''
+        import mediapipe as mp
+        self.drawing_utils = mp.solutions.drawing_utils
+        self.hand_connections = mp.solutions.hands.HAND_CONNECTIONS
 
-    def display_frame(self, frame):
+    def display_frame(self, frame, detection):
         '''
         Display a frame on the screen with detected hand landmarks and visual feedback
 
         Params:
             frame (numpy.ndarray): Frame from the webcam feed (BGR format)
+            detection (HandDetection): Detection result shared with the controller for this frame, or None if no hand was found
         '''
-        # Convert frame to RGB format
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        self.display_hands(frame, [detection] if detection else [])
 
-        # Process the frame for hand landmarks
-        hand_landmarks = self.hand_detector.detect_single_hand(rgb_frame)
+    def display_hands(self, frame, detections):
+        '''
+        Display a frame on the screen with the landmarks and visual feedback of every detected hand
 
-        if hand_landmarks:
-            self.draw_feedback(frame, hand_landmarks)
+        Params:
+            frame (numpy.ndarray): Frame from the webcam feed (BGR format)
+            detections (list): Detection results shared with the controller for this frame
+        '''
+        for line, detection in enumerate(detections):
+            if detection.hand_landmark is not None:  # Replayed detections have no mediapipe landmarks to draw
+                if self.drawing_utils is None:
+                    self.load_drawing_utils()
+                # Draw landmarks on detected hand in 'frame' by using the 'drawing_utils' object
+                self.drawing_utils.draw_landmarks(frame, detection.hand_landmark, self.hand_connections)
+            self.draw_feedback(frame, detection, line)
 
-        cv2.imshow("Hand Gesture Control", frame)
+        cv2.imshow(WINDOW_NAME, frame)
 
-    def draw_feedback(self, image, hand_landmarks):
+    def draw_feedback(self, image, detection, line=0):
         '''
         Draw visual feedback on the image based on gesture validity
 
         Params:
             image (numpy.ndarray): Frame image to draw feedback on (BGR format)
-            hand_landmarks (mediapipe Hands.Hand): Detected hand landmarks
+            detection (HandDetection): Detection result holding the hand position validation outcome
+            line (int): Line of the feedback text, one per hand
         '''
-        # Write visual text feedback whether hand position is valid. (Coordinates, style, size, Green text, thickness)
-        if pips_above_mcps(hand_landmarks) and additional_landmark_checks(hand_landmarks) and hand_angle_validation(hand_landmarks):
-            cv2.putText(image, "Valid Hand Position", (50, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-        else:
-            cv2.putText(image, "Invalid Hand Position", (50, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2) 
+        label = "Valid Hand Position" if detection.is_valid_position else "Invalid Hand Position"
+        if detection.track_id is not None:
+            label = f"Hand {detection.track_id}: {label}"  # Tell tracked hands apart
+        color = (0, 255, 0) if detection.is_valid_position else (0, 0, 255)  # Green when valid, red otherwise
+        # Write visual text feedback whether hand position is valid. (Coordinates, style, size, color, thickness)
+        cv2.putText(image, label, (50, 50 + 40 * line), cv2.FONT_HERSHEY_SIMPLEX, 1, color, 2)
 
-    def run(self):
+    def show_message(self, text, frame=None, size=(640, 480)):
+        '''
+        Display a status message, e.g. while the app is starting
+
+        Params:
+            text (str): Message to write on the frame
+            frame (numpy.ndarray): Frame to write the message on (BGR format), or None for a blank frame
+            size (tuple): (width, height) of the blank frame
+        '''
+        if frame is None:
+            frame = np.zeros((size[1], size[0], 3), dtype=np.uint8)
+        cv2.putText(frame, text, (50, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+        cv2.imshow(WINDOW_NAME, frame)
+
+    def run(self, webcam):
         '''
         Start capturing frames from the webcam, process gestures, and display feedback.
+
+        Params:
+            webcam (cv2.VideoCapture): Opened webcam to capture frames from
         '''
+        if not webcam.isOpened():
+            raise ValueError("Could not open webcam")
+
         while True:
-            ret, frame = self.cap.read()
+            ret, frame = webcam.read()
             if not ret:
-                print("Failed to capture frame")
+                logger.error("Failed to capture frame")
                 break
 
-            # Process gestures for the current frame
-            self.gesture_controller.process_gestures(frame)
+            # Detect the hand once and share the result between the controller and the view
+            detection = self.hand_detector.detect_single_hand(frame)
+            self.gesture_controller.process_gestures(detection)
 
-            self.display_frame(frame)
+            self.display_frame(frame, detection)
 
             if cv2.waitKey(1) & 0xFF == ord('q'):  # Exit on pressing 'q'
                 break
 
-        self.cap.release()  # Release webcam
+        webcam.release()  # Release webcam
         cv2.destroyAllWindows()  # Close all OpenCV windows